@@ -0,0 +1,53 @@
+"""
+Running state for clean.py's incremental mode.
+
+A full clean saves the DATE_TIME watermark plus everything needed to clean later rows
+the same way: per-neighbourhood and per-hour counts, the Incident_Ward distribution
+and the imputer medians. `clean.py --incremental` then only reads rows newer than the
+watermark, adds them to the running totals and appends them to the cleaned dataset.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+STATE_PATH = 'clean_state.json'
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def counts_to_dict(counts):
+    return {str(k): int(v) for k, v in counts.sort_index().items()}
+
+
+def counts_from_dict(counts, numeric=False):
+    """Stored {value: count} as a Series; numeric values come back from their JSON string keys"""
+    counts = pd.Series(counts, dtype='int64')
+    if numeric:
+        counts.index = pd.to_numeric(counts.index)
+    return counts
+
+
+def median_from_counts(counts):
+    """Median of a {value: count} distribution (dict or Series), as pandas would compute it"""
+    counts = pd.Series(counts, dtype='int64')
+    values = pd.to_numeric(counts.index).to_numpy(dtype=float)
+    weights = counts.to_numpy()
+    order = np.argsort(values)
+    values, cumulative = values[order], np.cumsum(weights[order])
+    n = cumulative[-1]
+    lower = values[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, n // 2, side='right')]
+    return (lower + upper) / 2
+
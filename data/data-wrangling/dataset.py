@@ -0,0 +1,72 @@
+"""
+The merged incident dataset written by main.py and read by clean.py.
+
+Stored as Parquet partitioned by year and EVENT_TYPE (hive layout, e.g.
+final_parquet/year=2019/EVENT_TYPE=crime/part-0.parquet), so dtypes and categoricals
+survive the hand-off. Readers load only the columns they ask for, and a date range
+prunes whole year partitions and then row groups by their DATE_TIME statistics.
+"""
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DATASET_PATH = 'final_parquet'
+PARTITION_COLUMNS = ['year', 'EVENT_TYPE']
+# Hive directory names are plain text, so the partition types are declared for readers
+PARTITIONING = ds.HivePartitioning.discover(schema=pa.schema([
+    ('year', pa.int16()),
+    ('EVENT_TYPE', pa.dictionary(pa.int32(), pa.string())),
+]))
+
+# Text columns with few distinct values, stored dictionary-encoded
+CATEGORICAL_COLUMNS = [
+    'EVENT_TYPE', 'NEIGHBOURHOOD_CLEAN', 'OFFENCE', 'MCI_CATEGORY',
+    'Initial_CAD_Event_Type', 'Final_Incident_Type', 'INJURY_COLLISIONS', 'PEDESTRIAN', 'AUTOMOBILE',
+]
+
+
+def write_dataset(df, path=DATASET_PATH, append=False):
+    """Write the merged frame as a partitioned dataset; replaces any existing one unless append"""
+    df = df.copy(deep=False)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    df['year'] = df['DATE_TIME'].dt.year.astype('Int16')
+
+    if not append and os.path.exists(path):
+        shutil.rmtree(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(table, path, partition_cols=PARTITION_COLUMNS,
+                        basename_template='part-{{i}}-{}.parquet'.format(pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')))
+
+
+def _date_filters(start, end):
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        filters += [('year', '>=', start.year), ('DATE_TIME', '>=', start)]
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters += [('year', '<=', end.year), ('DATE_TIME', '<', end)]
+    return filters or None
+
+
+def read_dataset(path=DATASET_PATH, columns=None, start=None, end=None):
+    """
+    Load the dataset, optionally only `columns` and rows with start <= DATE_TIME < end.
+    Text columns come back as categoricals and year as Int16.
+    """
+    table = pq.read_table(path, columns=columns, filters=_date_filters(start, end), partitioning=PARTITIONING)
+    return table.to_pandas()
+
+
+def iter_batches(path=DATASET_PATH, columns=None, start=None, end=None, batch_size=100_000):
+    """Same rows, in the same order, as read_dataset, as record batches of at most batch_size rows"""
+    filters = _date_filters(start, end)
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+    return dataset.to_batches(columns=columns, batch_size=batch_size,
+                              filter=pq.filters_to_expression(filters) if filters else None)
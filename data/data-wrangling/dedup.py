@@ -0,0 +1,130 @@
+"""
+Near-duplicate incidents in the merged dataset.
+
+One incident can be in the data more than once: repeated rows in an export, or a
+police collision that also shows up as a vehicle-fire call. Rows are duplicates if
+they are in the same event family, at most `window` apart in time and at most
+`distance_m` metres apart. Clusters are chained, so A ~ B ~ C is one incident.
+
+  1. Rows with the same MERGE_KEY, time bucket (of `window`) and family hash to one
+     key and collapse onto its first row.
+  2. Those rows are sorted by family and time and swept: row i is compared with
+     row i + 1, i + 2, ... only while they are in the same family and within the
+     window, so there is no all-pairs comparison.
+
+Both steps need times of day. The crime and collision exports only have a date
+(OCC_DATE), so all of a day's incidents share one timestamp and any two within
+`distance_m` would look like one. Rows of an event type with no time of day are
+therefore only merged with exact repeats (equal in every column).
+
+main.py keeps one row per cluster (see KEEP_ORDER), so clean.py and the counts it
+derives see each incident once.
+"""
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from neighbourhoods import KM_PER_DEGREE_LAT, KM_PER_DEGREE_LON
+
+DISTANCE_M = 50
+WINDOW = pd.Timedelta(minutes=30)
+
+# Event types that can report the same incident share a family; fire calls for
+# burning vehicles are often the same incident as a police collision report
+FAMILIES = {'collision': 'traffic', 'crime': 'crime', 'fire': 'fire'}
+VEHICLE_FIRE_PATTERN = r'vehicle|\bVEF\b'
+
+# The row kept for a cluster: the first event type in this order, then the earliest
+KEEP_ORDER = ['collision', 'crime', 'fire']
+
+
+def event_family(df):
+    family = df['EVENT_TYPE'].astype(str).map(FAMILIES).fillna(df['EVENT_TYPE'].astype(str))
+    if 'Initial_CAD_Event_Type' in df.columns:
+        vehicle = (df['EVENT_TYPE'] == 'fire') & df['Initial_CAD_Event_Type'].astype('string').str.contains(
+            VEHICLE_FIRE_PATTERN, case=False, na=False, regex=True)
+        family = family.mask(vehicle, FAMILIES['collision'])
+    return family.to_numpy(dtype=object)
+
+
+def has_time_of_day(df):
+    """Rows of an event type whose DATE_TIME values are not all at midnight"""
+    dated = df['DATE_TIME'].notna()
+    clock = dated & (df['DATE_TIME'] != df['DATE_TIME'].dt.normalize())
+    timed_types = df.loc[clock.to_numpy(), 'EVENT_TYPE'].astype(str).unique()
+    return (dated & df['EVENT_TYPE'].astype(str).isin(timed_types)).to_numpy()
+
+
+def duplicate_clusters(df, distance_m=DISTANCE_M, window=WINDOW):
+    """Cluster id of each row; rows with the same id are one incident"""
+    n = len(df)
+    family = pd.factorize(event_family(df))[0]
+    timed = has_time_of_day(df)
+    times = df['DATE_TIME'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    window = max(int(pd.Timedelta(window).value), 1)
+    rows = np.flatnonzero(timed)
+
+    # 0. Date-only rows: exact repeats only
+    dates = np.flatnonzero(df['DATE_TIME'].notna().to_numpy() & ~timed)
+    repeats = df.iloc[dates].groupby(list(df.columns), dropna=False, sort=False, observed=True).ngroup().to_numpy()
+    _, first = np.unique(repeats, return_index=True)
+    sources, targets = [dates], [dates[first][repeats]]
+
+    # 1. Same (MERGE_KEY, time bucket, family): collapse onto the first such row
+    key = pd.MultiIndex.from_arrays([df['MERGE_KEY'].to_numpy()[rows], times[rows] // window, family[rows]])
+    codes = pd.factorize(key)[0]
+    _, first = np.unique(codes, return_index=True)
+    sources.append(rows)
+    targets.append(rows[first][codes])
+    reps = np.sort(rows[first])
+
+    # 2. Sweep the representatives in (family, time) order
+    order = reps[np.lexsort((times[reps], family[reps]))]
+    lat = df['LAT_R'].to_numpy(dtype=np.float64)
+    lon = df['LON_R'].to_numpy(dtype=np.float64)
+    limit = (distance_m / 1000) ** 2
+    for step in range(1, len(order)):
+        a, b = order[:-step], order[step:]
+        candidate = (family[a] == family[b]) & (times[b] - times[a] <= window)
+        if not candidate.any():
+            break  # sorted, so no pair further apart can be within the window either
+        a, b = a[candidate], b[candidate]
+        dist2 = ((lat[a] - lat[b]) * KM_PER_DEGREE_LAT) ** 2 + ((lon[a] - lon[b]) * KM_PER_DEGREE_LON) ** 2
+        close = dist2 <= limit
+        sources.append(a[close])
+        targets.append(b[close])
+
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
+
+def deduplicate(df, distance_m=DISTANCE_M, window=WINDOW):
+    """
+    One row per incident, in the original order, and a report of what was merged:
+    rows in / out, clusters with more than one row, merged rows per event type and
+    clusters that mixed event types
+    """
+    clusters = duplicate_clusters(df, distance_m, window)
+    event_type = df['EVENT_TYPE'].astype(str).to_numpy()
+    priority = pd.Series(event_type).map({t: i for i, t in enumerate(KEEP_ORDER)}).fillna(len(KEEP_ORDER)).to_numpy()
+    times = df['DATE_TIME'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+    order = np.lexsort((np.arange(len(df)), times, priority, clusters))
+    _, first = np.unique(clusters[order], return_index=True)
+    keep = np.zeros(len(df), dtype=bool)
+    keep[order[first]] = True
+
+    sizes = np.bincount(clusters)
+    merged = pd.Series(event_type[~keep]).value_counts()
+    types_per_cluster = pd.DataFrame({'cluster': clusters, 'type': event_type}).groupby('cluster')['type'].nunique()
+    report = {
+        'rows': len(df),
+        'kept': int(keep.sum()),
+        'merged': int((~keep).sum()),
+        'clusters': int((sizes > 1).sum()),
+        'merged_by_type': {t: int(c) for t, c in merged.items()},
+        'mixed_type_clusters': int((types_per_cluster > 1).sum()),
+    }
+    return df[keep], report
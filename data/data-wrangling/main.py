@@ -1,39 +1,29 @@
-import pandas as pd
-
-
-fire = pd.read_csv("data/fire_data.csv")
-crime = pd.read_csv("data/crime_data.csv")
-collision = pd.read_csv("data/collision_data.csv")
-
-print(len(fire),len(crime),len(collision))
+import argparse
 
+import pandas as pd
 
+from dataset import DATASET_PATH, write_dataset
+from dedup import DISTANCE_M, WINDOW, deduplicate
+from sources import clean_neighbourhood, read_source
 
-# renaming long and lat columsn
-fire = fire.rename(columns={
-    "Latitude": "LAT",
-    "Longitude": "LON"
-})
+parser = argparse.ArgumentParser(description='Merge the fire, crime and collision exports into one dataset')
+parser.add_argument('--dedup-distance', type=float, default=DISTANCE_M,
+                    help='Rows of one event family can be one incident if at most this many metres apart')
+parser.add_argument('--dedup-minutes', type=float, default=WINDOW.total_seconds() / 60,
+                    help='... and at most this many minutes apart')
+parser.add_argument('--keep-duplicates', action='store_true', help='Skip the de-duplication step')
+args = parser.parse_args()
 
-crime = crime.rename(columns={
-    "LAT_WGS84": "LAT",
-    "LONG_WGS84": "LON"
-})
 
-collision = collision.rename(columns={
-    "LAT_WGS84": "LAT",
-    "LONG_WGS84": "LON"
-})
+# =========================
+# 1. READ SOURCES
+# =========================
+# Declared columns and dtypes per export (see sources.py)
+fire = read_source("fire")
+crime = read_source("crime")
+collision = read_source("collision")
 
-# cleaning neightbourhood data if present, uses regular expressions
-def clean_neighbourhood(col):
-    return (
-        col.astype(str)
-           .str.lower()
-           .str.strip()
-           .str.replace(r"\(\d+\)", "", regex=True)
-           .str.replace("  ", " ", regex=False)
-    )
+print(len(fire),len(crime),len(collision))
 
 # fire doesn't always have neighbourhood, so guard it
 if "NEIGHBOURHOOD_158" in crime.columns:
@@ -44,17 +34,8 @@ if "NEIGHBOURHOOD_158" in collision.columns:
 
 # rounding coordinates
 for df in [fire, crime, collision]:
-    df["LAT_R"] = pd.to_numeric(df["LAT"], errors="coerce").round(4)
-    df["LON_R"] = pd.to_numeric(df["LON"], errors="coerce").round(4)
-
-# have a general time
-fire["DATE_TIME"] = pd.to_datetime(fire["TFS_Alarm_Time"], errors="coerce")
-crime["DATE_TIME"] = pd.to_datetime(crime["OCC_DATE"], errors="coerce")
-collision["DATE_TIME"] = pd.to_datetime(collision["OCC_DATE"], errors="coerce")
-
-# format uniformly
-for df in [fire, crime, collision]:
-    df["DATE_TIME"] = df["DATE_TIME"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df["LAT_R"] = df["LAT"].round(4)
+    df["LON_R"] = df["LON"].round(4)
 
 # =========================
 # 6. ADD EVENT TYPE LABEL
@@ -101,7 +82,21 @@ combined = combined.dropna(subset=["LAT_R","LON_R"])
 # remove (0,0) junk
 combined = combined[(combined["LAT_R"] != 0) & (combined["LON_R"] != 0)]
 
-# save final files
-combined.to_csv("final.csv", index=False)
-
-print("Finished. Rows:", len(combined))
+# =========================
+# 9. DE-DUPLICATE
+# =========================
+# Repeated rows and cross-source reports of one incident (see dedup.py) would
+# otherwise be counted twice by clean.py
+if not args.keep_duplicates:
+    combined, report = deduplicate(combined, distance_m=args.dedup_distance,
+                                   window=pd.Timedelta(minutes=args.dedup_minutes))
+    print(f"De-duplicated: {report['rows']} → {report['kept']} rows "
+          f"({report['merged']} merged into {report['clusters']} incidents, "
+          f"{report['mixed_type_clusters']} across event types)")
+    for event_type, count in report['merged_by_type'].items():
+        print(f"  {event_type}: {count} rows merged")
+
+# save as a Parquet dataset partitioned by year / EVENT_TYPE (see dataset.py)
+write_dataset(combined, DATASET_PATH)
+
+print("Finished. Rows:", len(combined), "→", DATASET_PATH)
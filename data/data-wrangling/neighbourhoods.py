@@ -0,0 +1,110 @@
+"""
+Neighbourhoods for rows that have none, from the nearest labelled incidents.
+
+Fire records carry no NEIGHBOURHOOD_158, so they reach clean.py as 'unknown'. Crime
+and collision rows do have one, and they cover the city densely. Their points,
+counted per rounded coordinate (LAT_ROUNDED / LON_ROUNDED) and neighbourhood, are
+the reference. Each rounded point is labelled with its most frequent neighbourhood
+and put in a KD-tree. Every distinct unknown point is then labelled by a majority
+vote of its k nearest reference points, with ties going to the nearest. The tree is
+queried on all cores. Points with no reference point within MAX_DISTANCE_KM stay
+'unknown'.
+
+The counts add up across batches and runs, so chunked and in-memory cleaning
+assign the same neighbourhoods. They are saved in neighbourhood_points.parquet for
+`clean.py --incremental`.
+"""
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+POINTS_PATH = 'neighbourhood_points.parquet'
+POINT_COLUMNS = ['LAT_ROUNDED', 'LON_ROUNDED', 'NEIGHBOURHOOD_CLEAN']
+
+UNKNOWN = 'unknown'
+# Labels that say nothing about where a point is, so they are not used as references
+NOT_A_PLACE = (UNKNOWN, 'nsa')
+
+K_NEIGHBOURS = 5
+MAX_DISTANCE_KM = 1.0
+# Degrees → km around Toronto, so tree distances are (nearly) ground distances
+KM_PER_DEGREE_LAT = 111.2
+KM_PER_DEGREE_LON = KM_PER_DEGREE_LAT * math.cos(math.radians(43.7))
+
+
+def point_counts(df):
+    """
+    Rows per (LAT_ROUNDED, LON_ROUNDED, NEIGHBOURHOOD_CLEAN) for labelled rows, and
+    rows per (LAT_ROUNDED, LON_ROUNDED) for the 'unknown' ones
+    """
+    unknown = (df['NEIGHBOURHOOD_CLEAN'] == UNKNOWN).to_numpy()
+    labelled = ~df['NEIGHBOURHOOD_CLEAN'].isin(NOT_A_PLACE).to_numpy()
+    return (df.loc[labelled, POINT_COLUMNS].value_counts(sort=False),
+            df.loc[unknown, POINT_COLUMNS[:2]].value_counts(sort=False))
+
+
+def _xy(lat, lon):
+    return np.column_stack([np.asarray(lat, dtype=np.float64) * KM_PER_DEGREE_LAT,
+                            np.asarray(lon, dtype=np.float64) * KM_PER_DEGREE_LON])
+
+
+class NeighbourhoodIndex:
+    """KD-tree over the reference points, each labelled with its majority neighbourhood"""
+
+    def __init__(self, points):
+        points = points[points > 0]
+        self.size = 0
+        if not len(points):
+            return
+        # Most frequent neighbourhood per point; ties go to the first name
+        majority = (points.rename('count').reset_index()
+                    .sort_values(['count', 'NEIGHBOURHOOD_CLEAN'], ascending=[False, True], kind='stable')
+                    .drop_duplicates(POINT_COLUMNS[:2])
+                    .sort_values(POINT_COLUMNS[:2]))
+        self.labels, self.codes = np.unique(majority['NEIGHBOURHOOD_CLEAN'].to_numpy(dtype=str),
+                                            return_inverse=True)
+        self.tree = cKDTree(_xy(majority['LAT_ROUNDED'], majority['LON_ROUNDED']))
+        self.size = len(majority)
+
+    def assign(self, lat, lon, k=K_NEIGHBOURS, max_km=MAX_DISTANCE_KM, workers=-1):
+        """Neighbourhood of each point by majority of its k nearest references ('unknown' if none)"""
+        n = len(lat)
+        if not self.size or not n:
+            return np.full(n, UNKNOWN, dtype=object)
+        k = min(k, self.size)
+        _, nearest = self.tree.query(_xy(lat, lon), k=k, distance_upper_bound=max_km, workers=workers)
+        nearest = nearest.reshape(n, k)
+        found = nearest < self.size  # missing neighbours come back as index self.size
+        votes = np.where(found, self.codes[np.minimum(nearest, self.size - 1)], -1)
+
+        # Each neighbour's label count among the k; argmax takes the nearest of the tied labels
+        tally = ((votes[:, :, None] == votes[:, None, :]) & found[:, None, :]).sum(axis=2)
+        tally[~found] = 0
+        winner = votes[np.arange(n), tally.argmax(axis=1)]
+
+        result = np.full(n, UNKNOWN, dtype=object)
+        result[winner >= 0] = self.labels[winner[winner >= 0]]
+        return result
+
+
+def assignments(points, unknown, **kwargs):
+    """Neighbourhood for every unknown point, as a Series on the (LAT_ROUNDED, LON_ROUNDED) index"""
+    index = unknown.index
+    if not len(index):
+        return pd.Series(dtype=object)
+    labels = NeighbourhoodIndex(points).assign(index.get_level_values(0), index.get_level_values(1), **kwargs)
+    return pd.Series(labels, index=index)
+
+
+def load_points(path=POINTS_PATH):
+    """The saved reference counts, or None"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path).set_index(POINT_COLUMNS)['count']
+
+
+def save_points(points, path=POINTS_PATH):
+    points.sort_index().rename('count').reset_index().to_parquet(path, index=False)
@@ -0,0 +1,436 @@
+"""
+The cleaning steps of clean.py, split by what they need to know about the data.
+
+  parse_dates / prepare   row by row: temporal features, coordinate filter, fills,
+                          binary flags, EVENT_SUBTYPE
+  summarize / fit_stats   the global statistics: Incident_Ward median, vocabularies,
+                          neighbourhood / hourly counts, imputer medians, scaler moments,
+                          neighbourhoods for unknown points (neighbourhoods.py)
+  finish                  row by row again, given those statistics
+
+clean.py runs them on one in-memory frame. run_chunked runs them on record batches
+in two passes over a process pool and streams the result to disk, so memory is
+bounded by the batch size. Every statistic is accumulated so that it does not depend
+on how rows are split into batches, which keeps the two outputs byte-identical.
+"""
+import collections
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from clean_state import counts_from_dict, median_from_counts
+from neighbourhoods import UNKNOWN, assignments, point_counts
+from subtypes import classify_subtypes
+from vocab import codes, extend
+from zones import zones
+
+# Columns clean.py reads; MERGE_KEY and the partition year are never needed
+READ_COLUMNS = [
+    'LAT_R', 'LON_R', 'DATE_TIME', 'EVENT_TYPE', 'NEIGHBOURHOOD_CLEAN', 'Incident_Ward',
+    'INJURY_COLLISIONS', 'PEDESTRIAN', 'AUTOMOBILE', 'OFFENCE', 'MCI_CATEGORY',
+    'Initial_CAD_Event_Type', 'Final_Incident_Type',
+]
+
+ML_FEATURES = [
+    # Temporal
+    'year', 'month', 'day', 'day_of_week', 'hour', 'is_weekend', 'is_night',
+    'quarter', 'season_encoded',
+
+    # Geographic
+    'LAT_R', 'LON_R', 'lat_zone', 'lon_zone', 'distance_from_center',
+    'NEIGHBOURHOOD_CLEAN_encoded', 'neighbourhood_incident_count',
+    'Incident_Ward',
+
+    # Event type (hierarchical)
+    'EVENT_TYPE_encoded',        # Main: 0=collision, 1=crime, 2=fire
+    'EVENT_SUBTYPE_encoded',     # Grouped sub-category: 0-20
+
+    # Event specific details
+    'INJURY_COLLISIONS', 'PEDESTRIAN', 'AUTOMOBILE',
+    'MCI_CATEGORY_encoded',
+
+    # Derived
+    'hourly_incident_rate'
+]
+
+SUBTYPE_LABELS = {
+    0: 'Collision-Other',
+    1: 'Collision-Injury-Pedestrian',
+    2: 'Collision-Injury-Vehicle',
+    3: 'Collision-NoInjury-Pedestrian',
+    4: 'Collision-NoInjury-Vehicle',
+    5: 'Crime-Other',
+    6: 'Crime-Assault-Simple',
+    7: 'Crime-Assault-Weapon-Aggravated',
+    8: 'Crime-Assault-BodilyHarm',
+    9: 'Crime-Assault-PeaceOfficer',
+    10: 'Crime-AutoTheft',
+    11: 'Crime-BreakAndEnter',
+    12: 'Crime-Robbery-Weapon',
+    13: 'Crime-Robbery-Business',
+    14: 'Crime-Robbery-Other',
+    15: 'Crime-Theft-Other',
+    16: 'Fire-Other',
+    17: 'Fire-Residential',
+    18: 'Fire-Vehicle',
+    19: 'Fire-Outdoor-Rubbish',
+    20: 'Fire-Alarm-Commercial'
+}
+
+# Encoded through the append-only vocabularies (vocab.py)
+ENCODED_COLUMNS = ['EVENT_TYPE', 'NEIGHBOURHOOD_CLEAN', 'season', 'MCI_CATEGORY']
+# Only continuous geographic features are scaled
+SCALED_FEATURES = ['LAT_R', 'LON_R', 'distance_from_center']
+# The only numeric columns that can still be missing (from an unparseable DATE_TIME);
+# every other one is filled or derived from non-missing values
+IMPUTED_COLUMNS = ['year', 'month', 'day', 'day_of_week', 'hour', 'quarter', 'hourly_incident_rate']
+
+TORONTO_CENTER = (43.65, -79.38)
+SEASONS = {12: 'Winter', 1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring',
+           6: 'Summer', 7: 'Summer', 8: 'Summer'}
+
+
+def parse_dates(df):
+    """Plain object columns (Parquet text arrives as categoricals) and a datetime DATE_TIME"""
+    df = df.copy()
+    for col in df.select_dtypes(include='category').columns:
+        df[col] = df[col].astype(object)
+    df['DATE_TIME'] = pd.to_datetime(df['DATE_TIME'], format='ISO8601', errors='coerce')
+    return df
+
+
+def prepare(df, rules):
+    """Every cleaning step that only looks at the row itself"""
+    # Temporal features
+    df['year'] = df['DATE_TIME'].dt.year
+    df['month'] = df['DATE_TIME'].dt.month
+    df['day'] = df['DATE_TIME'].dt.day
+    df['day_of_week'] = df['DATE_TIME'].dt.dayofweek  # 0=Monday, 6=Sunday
+    df['hour'] = df['DATE_TIME'].dt.hour
+    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
+    df['is_night'] = df['hour'].between(22, 6).astype(int)  # 10pm-6am
+    df['season'] = df['month'].map(SEASONS).fillna('Fall')
+    df['quarter'] = df['DATE_TIME'].dt.quarter
+
+    # Remove rows with invalid coordinates (0,0 or NaN)
+    df = df[~((df['LAT_R'] == 0) & (df['LON_R'] == 0))]
+    df = df.dropna(subset=['LAT_R', 'LON_R'])
+
+    # Round coordinates for privacy/generalization
+    df['LAT_ROUNDED'] = df['LAT_R'].round(3)
+    df['LON_ROUNDED'] = df['LON_R'].round(3)
+
+    # Geographic zones on the fixed Toronto grid (zones.py, shared with ml/geogrid.py)
+    df['lat_zone'], df['lon_zone'] = zones(df['LAT_R'].to_numpy(), df['LON_R'].to_numpy())
+
+    # Clean neighbourhood names
+    df['NEIGHBOURHOOD_CLEAN'] = df['NEIGHBOURHOOD_CLEAN'].fillna('Unknown')
+    df['NEIGHBOURHOOD_CLEAN'] = df['NEIGHBOURHOOD_CLEAN'].str.strip().str.lower()
+
+    # Event-specific fills
+    collision_mask = df['EVENT_TYPE'] == 'collision'
+    for col in ['INJURY_COLLISIONS', 'PEDESTRIAN', 'AUTOMOBILE']:
+        df.loc[collision_mask, col] = df.loc[collision_mask, col].fillna('NO')
+    crime_mask = df['EVENT_TYPE'] == 'crime'
+    for col in ['OFFENCE', 'MCI_CATEGORY']:
+        df.loc[crime_mask, col] = df.loc[crime_mask, col].fillna('Unknown')
+    fire_mask = df['EVENT_TYPE'] == 'fire'
+    for col in ['Initial_CAD_Event_Type', 'Final_Incident_Type']:
+        df.loc[fire_mask, col] = df.loc[fire_mask, col].fillna('Unknown')
+
+    # Binary encoding for yes/no columns
+    for col in ['INJURY_COLLISIONS', 'PEDESTRIAN', 'AUTOMOBILE']:
+        if col in df.columns:
+            df[col] = df[col].map({'YES': 1, 'NO': 0, 'yes': 1, 'no': 0, 'N/R': 0})
+            df[col] = df[col].fillna(0).astype(int)
+
+    # Event type and grouped sub-category (event_subtype_rules.json)
+    df['EVENT_TYPE'] = df['EVENT_TYPE'].fillna('Unknown')
+    df['EVENT_SUBTYPE_encoded'] = classify_subtypes(df, rules)
+    df['EVENT_SUBTYPE_label'] = df['EVENT_SUBTYPE_encoded'].map(SUBTYPE_LABELS)
+
+    for col in ENCODED_COLUMNS:
+        df[col] = df[col].fillna('Unknown')
+
+    # Distance from city center
+    df['distance_from_center'] = np.sqrt(
+        (df['LAT_R'] - TORONTO_CENTER[0])**2 +
+        (df['LON_R'] - TORONTO_CENTER[1])**2
+    )
+    return df
+
+
+def summarize(df):
+    """This batch's share of the global statistics (small, except the scaler input)"""
+    points, unknown = point_counts(df)
+    return {
+        'rows': len(df),
+        'ward_counts': df['Incident_Ward'].value_counts(),
+        'values': {col: df[col].astype(str).unique() for col in ENCODED_COLUMNS},
+        'neighbourhood_counts': df.loc[df['NEIGHBOURHOOD_CLEAN'] != UNKNOWN, 'NEIGHBOURHOOD_CLEAN'].value_counts(),
+        'neighbourhood_points': points,
+        'unknown_points': unknown,
+        'hourly_counts': df['hour'].value_counts(),
+        'imputed_counts': {col: df[col].value_counts() for col in IMPUTED_COLUMNS if col in df.columns},
+        'scaled': np.ascontiguousarray(df[SCALED_FEATURES].to_numpy(dtype=np.float64)),
+    }
+
+
+class Moments:
+    """
+    Column means and variances accumulated over fixed blocks of rows, merged in order
+    (Chan et al.), so the floats come out the same however the rows were batched
+    """
+
+    BLOCK = 65536
+
+    def __init__(self):
+        self.n = 0
+        self.mean = self.m2 = 0.0
+        self._pending = []
+        self._pending_rows = 0
+
+    def update(self, values):
+        self._pending.append(values)
+        self._pending_rows += len(values)
+        if self._pending_rows < self.BLOCK:
+            return
+        values = np.concatenate(self._pending)
+        full = len(values) - len(values) % self.BLOCK
+        for start in range(0, full, self.BLOCK):
+            self._merge(values[start:start + self.BLOCK])
+        self._pending = [values[full:]]
+        self._pending_rows = len(values) - full
+
+    def finalize(self):
+        if self._pending_rows:
+            self._merge(np.concatenate(self._pending))
+        self._pending, self._pending_rows = [], 0
+        return self
+
+    def _merge(self, block):
+        n = len(block)
+        mean = block.mean(axis=0)
+        m2 = ((block - mean) ** 2).sum(axis=0)
+        if self.n == 0:
+            self.n, self.mean, self.m2 = n, mean, m2
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+    def scaler(self, columns):
+        """A fitted StandardScaler with these moments"""
+        scaler = StandardScaler()
+        scaler.n_features_in_ = len(columns)
+        scaler.feature_names_in_ = np.array(columns, dtype=object)
+        scaler.n_samples_seen_ = self.n
+        scaler.mean_ = self.mean
+        scaler.var_ = self.m2 / self.n
+        scaler.scale_ = np.where(scaler.var_ == 0, 1.0, np.sqrt(scaler.var_))
+        return scaler
+
+
+def _sum_counts(counts):
+    counts = [c for c in counts if len(c)]
+    if not counts:
+        return pd.Series(dtype='int64')
+    levels = list(range(counts[0].index.nlevels))
+    return pd.concat(counts).groupby(level=levels if len(levels) > 1 else 0, sort=False).sum()
+
+
+def fit_stats(summaries, vocabularies, state=None, scaler=None, moments=None, points=None):
+    """
+    Global statistics from the batch summaries, in row order. `moments` may already
+    hold the scaler input, otherwise it is taken from the summaries. With an
+    incremental `state`, counts add to its running totals (and to the neighbourhood
+    reference `points` of earlier runs) and the medians and `scaler` of the full run
+    are kept. New category values are appended to `vocabularies`.
+    """
+    summaries = [s for s in summaries if s['rows']]
+    stats = {'rows': sum(s['rows'] for s in summaries)}
+
+    ward = [s['ward_counts'] for s in summaries]
+    neighbourhood = [s['neighbourhood_counts'] for s in summaries]
+    hourly = [s['hourly_counts'] for s in summaries]
+    if state is not None:
+        ward.insert(0, counts_from_dict(state['ward_counts'], numeric=True))
+        neighbourhood.insert(0, counts_from_dict(state['neighbourhood_counts']))
+        hourly.insert(0, counts_from_dict(state['hourly_counts'], numeric=True))
+    stats['ward_counts'] = _sum_counts(ward)
+    stats['ward_median'] = median_from_counts(stats['ward_counts']) if len(stats['ward_counts']) else None
+    stats['hourly_counts'] = _sum_counts(hourly)
+
+    # Unknown neighbourhoods from the nearest labelled points; their rows count
+    # towards the neighbourhood they are given
+    reference = [s['neighbourhood_points'] for s in summaries]
+    if points is not None:
+        reference.insert(0, points)
+    stats['neighbourhood_points'] = _sum_counts(reference)
+    unknown = _sum_counts([s['unknown_points'] for s in summaries])
+    stats['neighbourhood_assignments'] = assignments(stats['neighbourhood_points'], unknown)
+    if len(unknown):
+        neighbourhood.append(unknown.groupby(stats['neighbourhood_assignments'], sort=False).sum())
+    stats['neighbourhood_counts'] = _sum_counts(neighbourhood)
+
+    stats['added'] = {}
+    for col in ENCODED_COLUMNS:
+        values = set().union(*(s['values'][col] for s in summaries))
+        if col == 'NEIGHBOURHOOD_CLEAN':
+            values = (values - {UNKNOWN}) | set(stats['neighbourhood_assignments'])
+        stats['added'][col] = extend(vocabularies, col, values)
+    stats['vocabularies'] = vocabularies
+
+    if state is not None:
+        stats['medians'] = state['medians']
+        stats['scaler'] = scaler
+        return stats
+
+    medians = {}
+    for col in IMPUTED_COLUMNS[:-1]:
+        counts = _sum_counts([s['imputed_counts'][col] for s in summaries])
+        if len(counts):
+            medians[col] = median_from_counts(counts)
+    # Each row carries its hour's count, so that count is weighted by itself
+    hourly_rates = stats['hourly_counts'].to_numpy()
+    if len(hourly_rates):
+        medians['hourly_incident_rate'] = median_from_counts(pd.Series(hourly_rates, index=hourly_rates))
+    stats['medians'] = medians
+
+    if moments is None:
+        moments = Moments()
+        for s in summaries:
+            moments.update(s['scaled'])
+    stats['scaler'] = moments.finalize().scaler(SCALED_FEATURES)
+    return stats
+
+
+def finish(df, stats):
+    """The steps that need the global statistics; returns every column"""
+    unknown = (df['NEIGHBOURHOOD_CLEAN'] == UNKNOWN).to_numpy()
+    if unknown.any():
+        points = pd.MultiIndex.from_arrays([df.loc[unknown, 'LAT_ROUNDED'], df.loc[unknown, 'LON_ROUNDED']])
+        df.loc[unknown, 'NEIGHBOURHOOD_CLEAN'] = stats['neighbourhood_assignments'].reindex(points).to_numpy()
+
+    # Incident_Ward: median ward, or 0 if no ward is known
+    if stats['ward_median'] is None:
+        df['Incident_Ward'] = 0
+    else:
+        df['Incident_Ward'] = df['Incident_Ward'].fillna(stats['ward_median'])
+
+    for col in ENCODED_COLUMNS:
+        df[col + '_encoded'] = codes(stats['vocabularies'], col, df[col].astype(str))
+
+    df['neighbourhood_incident_count'] = df['NEIGHBOURHOOD_CLEAN'].map(stats['neighbourhood_counts'])
+    df['hourly_incident_rate'] = df['hour'].map(stats['hourly_counts'])
+
+    # Remaining missing values: numeric medians, 'Unknown' for text
+    numerical_cols = df.select_dtypes(include=[np.number]).columns
+    df[numerical_cols] = df[numerical_cols].astype(float).fillna(stats['medians'])
+    for col in df.select_dtypes(include=['object']).columns:
+        df[col] = df[col].fillna('Unknown')
+
+    df[SCALED_FEATURES] = stats['scaler'].transform(df[SCALED_FEATURES])
+    return df
+
+
+def event_reference(df):
+    return df[['EVENT_TYPE', 'EVENT_TYPE_encoded', 'EVENT_SUBTYPE_label', 'EVENT_SUBTYPE_encoded']].drop_duplicates()
+
+
+# ============================================
+# CHUNKED, MULTI-PROCESS RUN
+# ============================================
+_worker = {}
+
+
+def _init_worker(rules, stats=None):
+    _worker['rules'], _worker['stats'] = rules, stats
+
+
+def _summarize_batch(batch):
+    df = parse_dates(batch.to_pandas())
+    watermark = df['DATE_TIME'].max()
+    summary = summarize(prepare(df, _worker['rules']))
+    summary['watermark'] = watermark
+    return summary
+
+
+def _clean_batch(item):
+    index, batch = item
+    df = finish(prepare(parse_dates(batch.to_pandas()), _worker['rules']), _worker['stats'])
+    return {
+        'csv': df[ML_FEATURES].to_csv(index=False, header=index == 0),
+        'event_reference': event_reference(df),
+        'subtype_counts': df['EVENT_SUBTYPE_encoded'].value_counts(),
+        'event_counts': df['EVENT_TYPE'].value_counts(),
+    }
+
+
+def _ordered(pool, fn, items, window):
+    """fn over items on the pool, results in order, at most `window` batches in flight"""
+    if pool is None:
+        yield from map(fn, items)
+        return
+    pending = collections.deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _pool(workers, rules, stats=None):
+    if workers <= 1:
+        _init_worker(rules, stats)
+        return None
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(rules, stats))
+
+
+def run_chunked(batches, vocabularies, rules, out_path, workers=None):
+    """
+    Clean the record batches from `batches()` (called once per pass) into out_path.
+    Pass 1 summarizes every batch into the global statistics, pass 2 cleans the batches
+    in parallel and appends them to the CSV in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = 2 * workers
+
+    pool = _pool(workers, rules)
+    try:
+        summaries, watermarks, moments = [], [], Moments()
+        for summary in _ordered(pool, _summarize_batch, batches(), window):
+            watermarks.append(summary.pop('watermark'))
+            moments.update(summary.pop('scaled'))
+            summaries.append(summary)
+        stats = fit_stats(summaries, vocabularies, moments=moments)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    del summaries
+    stats['watermark'] = max((w for w in watermarks if pd.notna(w)), default=pd.NaT)
+
+    references, subtype_counts, event_counts = [], [], []
+    pool = _pool(workers, rules, stats)
+    try:
+        with open(out_path, 'w', newline='') as f:
+            for result in _ordered(pool, _clean_batch, enumerate(batches()), window):
+                f.write(result['csv'])
+                references.append(result['event_reference'])
+                subtype_counts.append(result['subtype_counts'])
+                event_counts.append(result['event_counts'])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    stats['event_reference'] = pd.concat(references).drop_duplicates()
+    stats['subtype_counts'] = _sum_counts(subtype_counts)
+    stats['event_counts'] = _sum_counts(event_counts).sort_values(ascending=False)
+    stats['batches'] = len(watermarks)
+    return stats
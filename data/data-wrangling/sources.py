@@ -0,0 +1,84 @@
+"""
+The three raw open-data exports main.py merges, and how each is read.
+
+Only the columns kept in main.py's fire_core / crime_core / collision_core are read.
+Text fields with few distinct values load as categoricals, and times are parsed once
+with an explicit format and stay datetime64. Numeric fields are coerced rather than
+declared: the exports occasionally hold junk such as "None" or "" in a coordinate,
+which becomes NaN (and is dropped with the other invalid coordinates) instead of
+failing the read.
+
+Missing neighbourhood names stay missing (NaN) through clean_neighbourhood, so
+clean.py fills them as 'unknown' and neighbourhoods.py can assign them from their
+coordinates. Before, they were turned into the literal name "nan".
+"""
+import numpy as np
+import pandas as pd
+
+SCHEMAS = {
+    "fire": {
+        "path": "data/fire_data.csv",
+        "dtypes": {
+            "TFS_Alarm_Time": "string",
+            "Initial_CAD_Event_Type": "category",
+            "Final_Incident_Type": "category",
+        },
+        "numeric": ["Latitude", "Longitude", "Incident_Ward"],
+        "time_column": "TFS_Alarm_Time",
+        "rename": {"Latitude": "LAT", "Longitude": "LON"},
+    },
+    "crime": {
+        "path": "data/crime_data.csv",
+        "dtypes": {
+            "OCC_DATE": "string",
+            "OFFENCE": "category",
+            "MCI_CATEGORY": "category",
+            "NEIGHBOURHOOD_158": "category",
+        },
+        "numeric": ["LAT_WGS84", "LONG_WGS84"],
+        "time_column": "OCC_DATE",
+        "rename": {"LAT_WGS84": "LAT", "LONG_WGS84": "LON"},
+    },
+    "collision": {
+        "path": "data/collision_data.csv",
+        "dtypes": {
+            "OCC_DATE": "string",
+            "INJURY_COLLISIONS": "category",
+            "PEDESTRIAN": "category",
+            "AUTOMOBILE": "category",
+            "NEIGHBOURHOOD_158": "category",
+        },
+        "numeric": ["LAT_WGS84", "LONG_WGS84"],
+        "time_column": "OCC_DATE",
+        "rename": {"LAT_WGS84": "LAT", "LONG_WGS84": "LON"},
+    },
+}
+
+# The open-data exports write ISO 8601 times ("2014-06-20T04:00:00", or date only)
+TIME_FORMAT = "ISO8601"
+
+
+def read_source(name, path=None):
+    """Read one export with its declared columns and dtypes; DATE_TIME is datetime64"""
+    schema = SCHEMAS[name]
+    dtypes, numeric = schema["dtypes"], schema["numeric"]
+    # Numeric columns are left to the parser: float64 when clean, object when they hold junk
+    df = pd.read_csv(path or schema["path"], usecols=lambda col: col in dtypes or col in numeric, dtype=dtypes)
+    for col in numeric:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    df["DATE_TIME"] = pd.to_datetime(df.pop(schema["time_column"]), format=TIME_FORMAT, errors="coerce")
+    return df.rename(columns=schema["rename"])
+
+
+def clean_neighbourhood(col):
+    """Lower-cased names without the "(NN)" suffix, from a categorical column; missing stays missing"""
+    # Clean the ~160 distinct names once, then index by category code (-1, missing, picks the NaN)
+    names = (
+        pd.Series(col.cat.categories.astype(str))
+           .str.lower()
+           .str.strip()
+           .str.replace(r"\(\d+\)", "", regex=True)
+           .str.replace("  ", " ", regex=False)
+    )
+    cleaned = np.append(names.to_numpy(dtype=object), np.nan)
+    return pd.Series(cleaned[col.cat.codes.to_numpy()], index=col.index, dtype="category")
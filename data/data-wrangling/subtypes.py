@@ -0,0 +1,74 @@
+"""
+EVENT_SUBTYPE classification from the rule table in event_subtype_rules.json.
+
+The OFFENCE / CAD / incident-type columns have a few thousand distinct combinations
+across 1M+ rows, so rules are evaluated once per unique key tuple and the result is
+mapped back onto every row through the group codes. The same function classifies a
+full dataset or a batch of new rows.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'event_subtype_rules.json')
+
+
+def load_rules(path=RULES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _condition(frame, condition):
+    values = frame[condition['column']]
+    if 'pattern' in condition:
+        # A column with no text in this batch (all missing) is float, which has no .str
+        matched = values.astype('string').str.contains(condition['pattern'], case=False, na=False, regex=True)
+    else:
+        matched = values == condition['equals']
+    return matched.fillna(False).to_numpy(dtype=bool)
+
+
+def _matches(frame, rule):
+    mask = np.ones(len(frame), dtype=bool)
+    for condition in rule.get('all', []):
+        mask &= _condition(frame, condition)
+    if rule.get('any'):
+        mask &= np.logical_or.reduce([_condition(frame, c) for c in rule['any']])
+    for condition in rule.get('none', []):
+        mask &= ~_condition(frame, condition)
+    return mask
+
+
+def classify_unique(frame, rules):
+    """Subtype code for every row of a (small) frame of distinct key tuples"""
+    event_type = frame['EVENT_TYPE'].to_numpy()
+    subtypes = np.full(len(frame), rules['fallback'], dtype=np.int64)
+    defaults = np.full(len(frame), -1, dtype=np.int64)
+    for name, default in rules['defaults'].items():
+        rows = event_type == name
+        subtypes[rows] = default
+        defaults[rows] = default
+
+    for rule in rules['rules']:
+        mask = (event_type == rule['event_type']) & _matches(frame, rule)
+        if rule.get('only_if_default'):
+            mask &= subtypes == defaults
+        subtypes[mask] = rule['subtype']
+    return subtypes
+
+
+def classify_subtypes(df, rules=None):
+    """EVENT_SUBTYPE_encoded for every row of df, as an int64 array"""
+    rules = rules or load_rules()
+    columns = [col for col in rules['key_columns'] if col in df.columns]
+    keys = df[columns].copy()
+    for col in set(rules['key_columns']) - set(columns):
+        keys[col] = pd.Series(pd.NA, index=keys.index, dtype='string')
+
+    groups = keys.groupby(columns, dropna=False, sort=False)
+    codes = groups.ngroup().to_numpy()
+    # With sort=False, group numbers follow first appearance, as do the first rows
+    unique = keys.loc[groups.head(1).index].reset_index(drop=True)
+    return classify_unique(unique, rules)[codes]
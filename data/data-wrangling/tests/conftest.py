@@ -0,0 +1,8 @@
+"""
+The data-wrangling modules import each other by name (they run as scripts from this
+directory), so put it on sys.path. Run from here with `python -m pytest tests`.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+"""Near-duplicate incident clusters (dedup.py)."""
+import pandas as pd
+
+from dedup import deduplicate, duplicate_clusters
+
+# ~0.0001° is ~11 m north-south around Toronto
+BASE_LAT, BASE_LON = 43.65, -79.38
+
+
+def incidents(rows):
+    """rows: (event type, minutes after 12:00, metres north of BASE_LAT, CAD type)"""
+    df = pd.DataFrame(rows, columns=['EVENT_TYPE', 'minutes', 'north_m', 'Initial_CAD_Event_Type'])
+    df['DATE_TIME'] = pd.Timestamp('2024-01-13 12:00') + pd.to_timedelta(df.pop('minutes'), unit='min')
+    df['LAT_R'] = BASE_LAT + df.pop('north_m') / 111_200
+    df['LON_R'] = BASE_LON
+    df['MERGE_KEY'] = df['LAT_R'].round(4).astype(str) + '_' + df['LON_R'].astype(str)
+    return df
+
+
+def test_clusters_chain_within_family():
+    df = incidents([
+        ('crime', 0, 0, None),
+        ('crime', 20, 40, None),     # 40 m / 20 min from the first
+        ('crime', 40, 80, None),     # 80 m from the first, but chained through the second
+        ('crime', 200, 0, None),     # same place, hours later
+        ('fire', 5, 0, 'Rubbish'),   # same place and time, other family
+    ])
+    clusters = duplicate_clusters(df)
+    assert clusters[0] == clusters[1] == clusters[2]
+    assert len({clusters[0], clusters[3], clusters[4]}) == 3
+
+
+def test_vehicle_fire_merges_into_collision():
+    df = incidents([
+        ('fire', 0, 0, 'Vehicle Fire'),
+        ('collision', 10, 10, None),
+        ('fire', 10, 10, 'Rubbish Fire'),
+    ])
+    kept, report = deduplicate(df)
+    # KEEP_ORDER prefers the collision report over the (earlier) fire call
+    assert kept['EVENT_TYPE'].tolist() == ['collision', 'fire']
+    assert kept.index.tolist() == [1, 2]
+    assert report == {'rows': 3, 'kept': 2, 'merged': 1, 'clusters': 1,
+                      'merged_by_type': {'fire': 1}, 'mixed_type_clusters': 1}
+
+
+def test_rows_without_time_are_kept():
+    df = incidents([('crime', 0, 0, None), ('crime', 0, 0, None)])
+    df.loc[1, 'DATE_TIME'] = pd.NaT
+    kept, report = deduplicate(df)
+    assert len(kept) == 2 and report['merged'] == 0
+
+
+def test_date_only_rows_need_exact_repeats():
+    # Crime and collision exports have dates only, so every row of a day is at midnight
+    df = incidents([
+        ('crime', 0, 0, None),
+        ('crime', 0, 30, None),   # another incident 30 m away the same day
+        ('crime', 0, 0, None),    # the first row repeated in the export
+        ('fire', 0, 0, 'Rubbish'),
+        ('fire', 17, 30, 'Rubbish'),
+    ])
+    df['DATE_TIME'] = df['DATE_TIME'].dt.normalize()
+    df.loc[4, 'DATE_TIME'] += pd.Timedelta(minutes=17)
+    df['OFFENCE'] = ['Assault', 'Robbery', 'Assault', None, None]
+    kept, report = deduplicate(df)
+    assert kept.index.tolist() == [0, 1, 3]
+    assert report['merged_by_type'] == {'crime': 1, 'fire': 1}
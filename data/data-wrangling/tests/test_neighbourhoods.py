@@ -0,0 +1,40 @@
+"""Nearest-neighbour neighbourhoods for 'unknown' rows (neighbourhoods.py)."""
+import pandas as pd
+
+from neighbourhoods import UNKNOWN, NeighbourhoodIndex, assignments, point_counts
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['LAT_ROUNDED', 'LON_ROUNDED', 'NEIGHBOURHOOD_CLEAN'])
+
+
+def test_point_counts_split_labelled_and_unknown():
+    points, unknown = point_counts(frame([
+        (43.650, -79.380, 'a'), (43.650, -79.380, 'a'), (43.650, -79.380, 'nsa'),
+        (43.651, -79.380, UNKNOWN), (43.651, -79.380, UNKNOWN),
+    ]))
+    assert points.to_dict() == {(43.650, -79.380, 'a'): 2}
+    assert unknown.to_dict() == {(43.651, -79.380): 2}
+
+
+def test_majority_vote_of_nearest_points():
+    points, _ = point_counts(frame([
+        (43.650, -79.380, 'a'), (43.651, -79.380, 'a'), (43.652, -79.380, 'b'),
+        # The point's majority label is 'c' although 'b' is also seen there
+        (43.660, -79.380, 'c'), (43.660, -79.380, 'c'), (43.660, -79.380, 'b'),
+    ]))
+    index = NeighbourhoodIndex(points)
+    assert index.size == 4
+    labels = index.assign([43.6505, 43.6601, 43.9], [-79.380, -79.380, -79.380], k=3)
+    # The third point has no reference within MAX_DISTANCE_KM
+    assert labels.tolist() == ['a', 'c', UNKNOWN]
+
+
+def test_ties_go_to_the_nearest():
+    points, _ = point_counts(frame([(43.650, -79.380, 'a'), (43.652, -79.380, 'b')]))
+    assert NeighbourhoodIndex(points).assign([43.6509], [-79.380], k=2).tolist() == ['a']
+
+
+def test_assignments_without_references():
+    _, unknown = point_counts(frame([(43.651, -79.380, UNKNOWN)]))
+    assert assignments(pd.Series(dtype='int64'), unknown).tolist() == [UNKNOWN]
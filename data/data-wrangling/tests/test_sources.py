@@ -0,0 +1,42 @@
+"""Reading the raw exports (sources.py)."""
+import pandas as pd
+
+from sources import clean_neighbourhood, read_source
+
+
+def test_junk_coordinates_become_missing(tmp_path):
+    path = tmp_path / 'crime.csv'
+    path.write_text(
+        'OCC_DATE,OFFENCE,MCI_CATEGORY,NEIGHBOURHOOD_158,LAT_WGS84,LONG_WGS84,UNUSED\n'
+        '2024-01-05,Theft,Theft Over,Annex (95),43.67,-79.40,x\n'
+        '2024-01-06,Assault,Assault,,None,,x\n'
+    )
+    df = read_source('crime', path)
+
+    assert 'UNUSED' not in df.columns
+    assert df['LAT'].dtype == df['LON'].dtype == 'float64'
+    assert df['LAT'].tolist()[0] == 43.67
+    assert df[['LAT', 'LON']].iloc[1].isna().all()
+    assert df['DATE_TIME'].tolist() == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-06')]
+
+
+def test_junk_ward_becomes_missing(tmp_path):
+    path = tmp_path / 'fire.csv'
+    path.write_text(
+        'Latitude,Longitude,TFS_Alarm_Time,Initial_CAD_Event_Type,Final_Incident_Type,Incident_Ward\n'
+        '43.65,-79.38,2024-01-05T04:12:00,Fire,Fire,10\n'
+        '43.65,-79.38,2024-01-05T05:00:00,Fire,Fire,n/a\n'
+    )
+    df = read_source('fire', path)
+    assert df['Incident_Ward'].tolist()[0] == 10.0
+    assert pd.isna(df['Incident_Ward'].iloc[1])
+
+
+def test_missing_neighbourhood_stays_missing():
+    col = pd.Series(['Annex (95)', None, 'Yorkville  Park (12)'], dtype='category')
+    cleaned = clean_neighbourhood(col)
+    # The space left by the suffix is stripped later, by clean.py
+    assert cleaned.iloc[0] == 'annex '
+    # Not the string "nan": clean.py fills it as 'unknown' for neighbourhoods.py to assign
+    assert pd.isna(cleaned.iloc[1])
+    assert cleaned.iloc[2] == 'yorkville park '
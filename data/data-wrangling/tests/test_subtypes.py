@@ -0,0 +1,49 @@
+"""EVENT_SUBTYPE rule table (subtypes.py) on small batches."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from subtypes import classify_subtypes, load_rules
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return load_rules()
+
+
+def mixed_batch():
+    return pd.DataFrame({
+        'EVENT_TYPE': ['collision', 'collision', 'crime', 'crime', 'crime', 'fire', 'fire', 'fire'],
+        'INJURY_COLLISIONS': [1, 0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+        'PEDESTRIAN': [1, 0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+        'AUTOMOBILE': [0, 1, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+        'OFFENCE': [None, None, 'Assault', 'Robbery - Business', 'Mischief', None, None, None],
+        'Initial_CAD_Event_Type': [None, None, None, None, None, 'VEF', 'FIG', 'Unknown'],
+        'Final_Incident_Type': [None, None, None, None, None, None, None, 'Residential'],
+    })
+
+
+def test_mixed_batch(rules):
+    assert classify_subtypes(mixed_batch(), rules).tolist() == [1, 4, 6, 13, 5, 18, 19, 17]
+
+
+def test_single_event_type_batch(rules):
+    # A fire-only batch has no OFFENCE text, so that column is all-missing float
+    batch = mixed_batch()
+    fire = batch[batch['EVENT_TYPE'] == 'fire'].reset_index(drop=True)
+    assert fire['OFFENCE'].isna().all()
+    assert classify_subtypes(fire.astype({'OFFENCE': 'float64'}), rules).tolist() == [18, 19, 17]
+
+    crime = batch[batch['EVENT_TYPE'] == 'crime'].reset_index(drop=True)
+    crime[['Initial_CAD_Event_Type', 'Final_Incident_Type']] = np.nan
+    assert classify_subtypes(crime, rules).tolist() == [6, 13, 5]
+
+
+def test_missing_key_columns(rules):
+    batch = mixed_batch()
+    full = classify_subtypes(batch, rules)
+    crime_only = batch.drop(columns=['Initial_CAD_Event_Type', 'Final_Incident_Type', 'INJURY_COLLISIONS'])
+    result = classify_subtypes(crime_only, rules)
+    assert result[2:5].tolist() == full[2:5].tolist()
+    # Without their key columns, collisions and fires fall back to their event type's default
+    assert result[[0, 1]].tolist() == [0, 0] and result[5:].tolist() == [16, 16, 16]
@@ -0,0 +1,28 @@
+"""Append-only category vocabularies (vocab.py)."""
+import json
+
+import pandas as pd
+
+from vocab import encode, load_vocabularies, save_vocabularies
+
+
+def test_ids_are_stable_across_batches():
+    vocabularies = {}
+    codes, added = encode(vocabularies, 'NEIGHBOURHOOD_CLEAN', pd.Series(['b', 'a', 'b']))
+    assert codes.tolist() == [1, 0, 1] and added == ['a', 'b']
+
+    # New values are appended after the existing ones, never re-sorted into them
+    codes, added = encode(vocabularies, 'NEIGHBOURHOOD_CLEAN', pd.Series(['c', 'a', '0']))
+    assert codes.tolist() == [3, 0, 2] and added == ['0', 'c']
+    assert vocabularies == {'NEIGHBOURHOOD_CLEAN': ['a', 'b', '0', 'c']}
+
+
+def test_round_trip_and_legacy_seed(tmp_path):
+    path, seed = tmp_path / 'vocabularies.json', tmp_path / 'encodings_reference.json'
+    seed.write_text(json.dumps({'EVENT_TYPE': {'1': 'crime', '0': 'collision'},
+                                'EVENT_SUBTYPE': {'0': 'Collision-Other'}}))
+    assert load_vocabularies(path, seed) == {'EVENT_TYPE': ['collision', 'crime']}
+
+    save_vocabularies({'EVENT_TYPE': ['fire', 'collision']}, path)
+    assert load_vocabularies(path, seed) == {'EVENT_TYPE': ['fire', 'collision']}
+    assert load_vocabularies(tmp_path / 'missing.json', None) == {}
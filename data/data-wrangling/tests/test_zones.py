@@ -0,0 +1,35 @@
+"""The zone grid copy (zones.py) agrees with the one the models use (ml/geogrid.py)."""
+import importlib.util
+import os
+
+import numpy as np
+
+import zones
+
+GEOGRID_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir,
+                            'ml', 'geogrid.py')
+
+
+def load_geogrid():
+    # By path: ml/ is a separate tree, not importable from here
+    spec = importlib.util.spec_from_file_location('ml_geogrid', GEOGRID_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_grid_constants_match_ml():
+    geogrid = load_geogrid()
+    assert zones.TORONTO_BBOX == geogrid.TORONTO_BBOX
+    assert zones.GRID_LEVEL == geogrid.GRID_LEVEL
+
+
+def test_zones_match_ml():
+    geogrid = load_geogrid()
+    rng = np.random.default_rng(0)
+    # Inside the box, on its edges and well outside it
+    lat = np.concatenate([rng.uniform(43.5, 43.9, 1000), [43.58, 43.86, 40.0, 50.0]])
+    lon = np.concatenate([rng.uniform(-79.7, -79.0, 1000), [-79.64, -79.11, -80.0, -70.0]])
+    for level in (3, 4, 5):
+        ours, theirs = zones.zones(lat, lon, level), geogrid.zones(lat, lon, level)
+        assert all((a == b).all() for a, b in zip(ours, theirs))
@@ -0,0 +1,58 @@
+"""
+Append-only category vocabularies for clean.py's *_encoded columns.
+
+Each column's vocabulary is the list of its values in id order, persisted in
+vocabularies.json. Ids are never reassigned: values seen for the first time are
+appended (sorted, so a fresh registry gives the same codes LabelEncoder did), and a
+value that disappears from the data keeps its id. Trained models, the API's
+`neighbourhood` integers and cached predictions therefore stay valid across refreshes.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+VOCAB_PATH = 'vocabularies.json'
+# The id → value tables clean.py wrote before the registry existed; used to seed it
+LEGACY_ENCODINGS_PATH = 'encodings_reference.json'
+
+
+def load_vocabularies(path=VOCAB_PATH, seed_path=LEGACY_ENCODINGS_PATH):
+    """{column: [value for id 0, value for id 1, ...]}"""
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    if seed_path and os.path.exists(seed_path):
+        with open(seed_path) as f:
+            encodings = json.load(f)
+        return {col: [table[k] for k in sorted(table, key=int)]
+                for col, table in encodings.items() if col != 'EVENT_SUBTYPE'}
+    return {}
+
+
+def save_vocabularies(vocabularies, path=VOCAB_PATH):
+    with open(path, 'w') as f:
+        json.dump(vocabularies, f, indent=2)
+
+
+def extend(vocabularies, column, values):
+    """Append the values (any iterable) not yet in the column's vocabulary; returns them"""
+    vocab = vocabularies.setdefault(column, [])
+    added = sorted(set(values) - set(vocab))
+    vocab.extend(added)
+    return added
+
+
+def codes(vocabularies, column, values):
+    """int64 ids of `values`, which must all be in the column's vocabulary"""
+    return pd.Categorical(values, categories=vocabularies[column]).codes.astype(np.int64)
+
+
+def encode(vocabularies, column, values):
+    """
+    Ids of `values` (strings, no missing values) in the column's vocabulary, appending
+    unseen values first. Returns (int64 codes, list of newly added values).
+    """
+    added = extend(vocabularies, column, values.unique())
+    return codes(vocabularies, column, values), added
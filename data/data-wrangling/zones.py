@@ -0,0 +1,24 @@
+"""
+The fixed Toronto zone grid clean.py uses for lat_zone / lon_zone.
+
+A copy of the degree-level half of ml/geogrid.py: each axis of a fixed bounding box is
+split into 2**GRID_LEVEL equal bands, so a zone depends only on the coordinate. The
+models compute the same zones from request coordinates, so the two copies must agree;
+tests/test_zones.py checks them against each other. Change both together.
+"""
+import numpy as np
+
+TORONTO_BBOX = {'lat': (43.58, 43.86), 'lon': (-79.64, -79.11)}
+GRID_LEVEL = 4  # 16 × 16 zones of about 1.9 km × 2.7 km
+
+
+def zone_index(values, low, high, level=GRID_LEVEL):
+    """Band index (0 .. 2**level - 1) of each value in [low, high]"""
+    bands = 1 << level
+    index = np.floor((np.asarray(values, dtype=np.float64) - low) * (bands / (high - low)))
+    return np.clip(index, 0, bands - 1).astype(np.int64)
+
+
+def zones(lat, lon, level=GRID_LEVEL, bbox=TORONTO_BBOX):
+    """(lat_zone, lon_zone) arrays for coordinates in degrees"""
+    return zone_index(lat, *bbox['lat'], level), zone_index(lon, *bbox['lon'], level)
@@ -0,0 +1,211 @@
+"""
+Time-based backtesting for the inverse models in train_inverse_models.py.
+
+Instead of a single random train_test_split (which leaks future incidents into
+training), the history is cut into rolling windows. In 'retrain' mode every window
+trains on the span before it and is scored on the window itself (walk-forward);
+in 'evaluate' mode an existing bundle is scored on every window. Windows are
+processed in parallel worker processes, and metrics are accumulated over large
+batches so scoring the full history never materialises a full prediction matrix.
+
+Usage:
+    python backtest.py --mode evaluate --bundle . --window 90D
+    python backtest.py --mode retrain --train-span 730D --window 90D --workers 6
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from tensorflow import keras
+
+import train_inverse_models as tim
+from features import FeatureBuilder
+
+RESULTS_PATH = 'backtest_results.csv'
+EVAL_BATCH_SIZE = 65536
+
+
+def make_windows(first, last, window, step, train_span=None, expanding=False):
+    """
+    Rolling (train_start, test_start, test_end) windows between the first and last event.
+    The first test window starts after one train_span of history (or immediately
+    in evaluate mode, when train_span is None).
+    """
+    window, step = pd.Timedelta(window), pd.Timedelta(step)
+    test_start = first + pd.Timedelta(train_span) if train_span else first
+
+    windows = []
+    while test_start < last:
+        test_end = min(test_start + window, last + pd.Timedelta(hours=1))
+        if expanding or not train_span:
+            train_start = first
+        else:
+            train_start = test_start - pd.Timedelta(train_span)
+        windows.append((train_start, test_start, test_end))
+        test_start += step
+    return windows
+
+
+class StreamingMetrics:
+    """Accuracy, top-3 accuracy and log loss accumulated batch by batch"""
+
+    def __init__(self):
+        self.n = 0
+        self.correct = 0
+        self.top3_correct = 0
+        self.log_loss_sum = 0.0
+
+    def update(self, probabilities, y):
+        y = y.astype(np.int64)
+        rows = np.arange(len(y))
+        in_range = y < probabilities.shape[1]
+        true_prob = np.where(in_range, probabilities[rows, np.minimum(y, probabilities.shape[1] - 1)], 0.0)
+        top3 = np.argpartition(probabilities, -3, axis=1)[:, -3:]
+
+        self.n += len(y)
+        self.correct += int((probabilities.argmax(axis=1) == y).sum())
+        self.top3_correct += int((top3 == y[:, None]).any(axis=1).sum())
+        self.log_loss_sum += float(-np.log(np.clip(true_prob, 1e-7, 1.0)).sum())
+
+    def result(self):
+        if self.n == 0:
+            return {'n': 0, 'accuracy': None, 'top3_accuracy': None, 'log_loss': None}
+        return {
+            'n': self.n,
+            'accuracy': round(self.correct / self.n, 4),
+            'top3_accuracy': round(self.top3_correct / self.n, 4),
+            'log_loss': round(self.log_loss_sum / self.n, 4),
+        }
+
+
+def score(model, scaler, X, y, batch_size=EVAL_BATCH_SIZE):
+    """Stream X through scaler + model in large batches"""
+    metrics = StreamingMetrics()
+    for start in range(0, len(X), batch_size):
+        X_batch = scaler.transform(np.asarray(X[start:start + batch_size])).astype(np.float32)
+        probabilities = model(X_batch, training=False).numpy()
+        metrics.update(probabilities, np.asarray(y[start:start + batch_size]))
+    return metrics.result()
+
+
+def _backtest_worker(window_id, bounds, name, data_dir, mode, bundle_dir, num_classes,
+                     threads, epochs, batch_size):
+    """Train (retrain mode) or load (evaluate mode) one model and score one window"""
+    tim.configure_worker(threads)
+    spec = tim.MODEL_SPECS[name]
+    X = np.load(os.path.join(data_dir, f'{name}_X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, f'{name}_y.npy'), mmap_mode='r')
+    train_lo, test_lo, test_hi = bounds
+
+    row = {'window': window_id, 'model': name, 'train_rows': 0, 'train_time_s': 0.0}
+    if mode == 'retrain':
+        if test_lo - train_lo < 100:
+            return {**row, 'skipped': 'too little training history'}
+        scaler = StandardScaler()
+        # No test split: the window is scored below, in batches
+        split = {'X_train': scaler.fit_transform(np.asarray(X[train_lo:test_lo])),
+                 'y_train': np.asarray(y[train_lo:test_lo])}
+        start = time.perf_counter()
+        model, _ = tim.fit_model(name, split, num_classes, epochs, batch_size, verbose=0)
+        row['train_rows'] = int(test_lo - train_lo)
+        row['train_time_s'] = round(time.perf_counter() - start, 2)
+    else:
+        model = keras.models.load_model(os.path.join(bundle_dir, spec['model_path']))
+        with open(os.path.join(bundle_dir, spec['scaler_path']), 'rb') as f:
+            scaler = pickle.load(f)
+
+    start = time.perf_counter()
+    row.update(score(model, scaler, X[test_lo:test_hi], y[test_lo:test_hi]))
+    row['eval_time_s'] = round(time.perf_counter() - start, 2)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolling time-window backtest of the inverse models')
+    parser.add_argument('--data', default=tim.DATA_PATH)
+    parser.add_argument('--mode', choices=['retrain', 'evaluate'], default='evaluate')
+    parser.add_argument('--bundle', default='.', help='Bundle directory scored in evaluate mode')
+    parser.add_argument('--models', nargs='+', default=list(tim.MODEL_SPECS),
+                        choices=list(tim.MODEL_SPECS))
+    parser.add_argument('--window', default='90D', help='Length of each test window')
+    parser.add_argument('--step', default=None, help='Shift between windows (default: --window)')
+    parser.add_argument('--train-span', default='730D',
+                        help='History used to train each window (retrain mode)')
+    parser.add_argument('--expanding', action='store_true',
+                        help='Train on all history before each window instead of a fixed span')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    print("Loading data...")
+    df = pd.read_csv(args.data)
+    df['_ts'] = tim.event_timestamps(df)
+    df = df.sort_values('_ts', kind='stable').reset_index(drop=True)
+    timestamps = df['_ts'].values
+    num_neighbourhoods = int(df['NEIGHBOURHOOD_CLEAN_encoded'].max()) + 1
+
+    train_span = args.train_span if args.mode == 'retrain' else None
+    windows = make_windows(df['_ts'].iloc[0], df['_ts'].iloc[-1], args.window,
+                           args.step or args.window, train_span, args.expanding)
+    # Rows are time-sorted, so each window is a contiguous slice
+    bounds = [
+        tuple(int(i) for i in np.searchsorted(timestamps, np.array([a, b, c], dtype='datetime64[ns]')))
+        for a, b, c in windows
+    ]
+    print(f"{len(df):,} rows, {len(windows)} windows × {len(args.models)} models "
+          f"on {args.workers} workers ({threads} threads each)")
+
+    rows = []
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as data_dir:
+        for name in args.models:
+            spec = tim.MODEL_SPECS[name]
+            np.save(os.path.join(data_dir, f'{name}_X.npy'), FeatureBuilder(spec['features']).build(df))
+            np.save(os.path.join(data_dir, f'{name}_y.npy'), df[spec['target']].values)
+
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context('spawn')) as pool:
+            futures = [
+                pool.submit(_backtest_worker, i, bounds[i], name, data_dir, args.mode, args.bundle,
+                            tim.num_classes_for(name, num_neighbourhoods),
+                            threads, args.epochs, args.batch_size)
+                for i in range(len(windows)) for name in args.models
+            ]
+            for future in futures:
+                rows.append(future.result())
+
+    table = pd.DataFrame(rows)
+    if 'accuracy' not in table.columns or table['accuracy'].isna().all():
+        print(f"\n✗ No evaluable windows: all {len(table)} were skipped or had no test rows")
+        raise SystemExit(1)
+    table.insert(1, 'test_start', [windows[r['window']][1].date() for r in rows])
+    table.insert(2, 'test_end', [windows[r['window']][2].date() for r in rows])
+    table.to_csv(args.output, index=False)
+
+    print(f"\nBacktest finished in {time.perf_counter() - start:.1f}s\n")
+    cols = [c for c in ['window', 'test_start', 'test_end', 'model', 'n', 'accuracy',
+                        'top3_accuracy', 'log_loss', 'train_rows'] if c in table.columns]
+    print(table[cols].to_string(index=False))
+
+    print("\nStability across windows (accuracy):")
+    summary = table.groupby('model')['accuracy'].agg(['mean', 'std', 'min', 'max']).round(4)
+    print(summary.to_string())
+    with open(os.path.splitext(args.output)[0] + '_summary.json', 'w') as f:
+        json.dump(summary.to_dict('index'), f, indent=2)
+    print(f"\n✓ Per-window metrics saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import numpy as np
 import tensorflow as tf
@@ -12,8 +13,22 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
 import warnings
+from drift import reference_histograms
+from features import FeatureBuilder
+from profiling import Profiler
 warnings.filterwarnings('ignore')
 
+parser = argparse.ArgumentParser(description='Train the binary / multi-class / regression models')
+parser.add_argument('--profile', action='store_true',
+                    help='Record wall time / peak RSS per phase and samples/sec per epoch')
+parser.add_argument('--profile-trace', default=None, metavar='DIR',
+                    help='Also capture a TensorFlow profiler trace of the fit phase into DIR')
+parser.add_argument('--profile-output', default='profile_report_boom.json')
+parser.add_argument('--data', default='data/final_cleaned_data.csv', help='Path to the cleaned dataset CSV')
+args = parser.parse_args()
+
+profiler = Profiler('boom', enabled=args.profile or bool(args.profile_trace), trace_dir=args.profile_trace)
+
 # Set random seeds for reproducibility
 np.random.seed(42)
 tf.random.set_seed(42)
@@ -22,7 +37,8 @@ print(f"TensorFlow version: {tf.__version__}")
 print(f"GPU Available: {tf.config.list_physical_devices('GPU')}")
 
 # Load your data
-df = pd.read_csv('data/final_cleaned_data.csv')
+profiler.begin('load')
+df = pd.read_csv(args.data)
 
 print(f"Dataset shape: {df.shape}")
 print(f"Missing values:\n{df.isnull().sum()}")
@@ -48,6 +64,7 @@ print(f"Unique neighbourhoods: {df['NEIGHBOURHOOD_CLEAN_encoded'].nunique()}")
 print(f"Event types distribution:\n{df['EVENT_TYPE_encoded'].value_counts()}")
 
 # Create a copy for feature engineering
+profiler.begin('feature_engineering')
 data = df.copy()
 
 # Create datetime for easier manipulation
@@ -56,13 +73,8 @@ data['datetime'] = pd.to_datetime(data[['year', 'month', 'day', 'hour']])
 # Sort by datetime
 data = data.sort_values('datetime').reset_index(drop=True)
 
-# Create cyclical features (important for time patterns)
-data['hour_sin'] = np.sin(2 * np.pi * data['hour'] / 24)
-data['hour_cos'] = np.cos(2 * np.pi * data['hour'] / 24)
-data['day_of_week_sin'] = np.sin(2 * np.pi * data['day_of_week'] / 7)
-data['day_of_week_cos'] = np.cos(2 * np.pi * data['day_of_week'] / 7)
-data['month_sin'] = np.sin(2 * np.pi * data['month'] / 12)
-data['month_cos'] = np.cos(2 * np.pi * data['month'] / 12)
+# Calendar and cyclical features (hour_sin, month_cos, ...) are derived from 'datetime'
+# by the FeatureBuilders below, the same way they are at prediction time
 
 # Create lagging features (events in previous hours/days)
 # Group by neighbourhood for temporal features
@@ -74,6 +86,15 @@ data['neighbourhood_hour_count'] = 0
 hourly_counts = data.groupby(['NEIGHBOURHOOD_CLEAN_encoded', 'datetime']).size().reset_index(name='events_this_hour')
 data = data.merge(hourly_counts, on=['NEIGHBOURHOOD_CLEAN_encoded', 'datetime'], how='left')
 
+# Per-neighbourhood location/volume, used to fill features the caller doesn't supply
+neighbourhood_stats = data.groupby('NEIGHBOURHOOD_CLEAN_encoded').agg({
+    'LAT_R': 'mean',
+    'LON_R': 'mean',
+    'lat_zone': 'median',
+    'lon_zone': 'median',
+    'neighbourhood_incident_count': 'first',
+}).to_dict('index')
+
 print("Feature engineering complete!")
 
 # ============================================
@@ -123,7 +144,7 @@ def prepare_binary_classification_data(data):
         'month_sin', 'month_cos', 'events_this_hour'
     ]
     
-    X = data_sorted[feature_cols].values
+    X = FeatureBuilder(feature_cols).build(data_sorted)
     y = data_sorted['next_hour_event'].values
     
     print(f"Features shape: {X.shape}")
@@ -153,7 +174,7 @@ def prepare_multiclass_data(data):
         'month_sin', 'month_cos', 'events_this_hour'
     ]
     
-    X = data[feature_cols].values
+    X = FeatureBuilder(feature_cols).build(data)
     y = data['EVENT_SUBTYPE_encoded'].values
     
     print(f"Features shape: {X.shape}")
@@ -182,23 +203,17 @@ def prepare_regression_data(data):
     
     # Get representative features for each neighbourhood-day
     daily_features = data.groupby(['NEIGHBOURHOOD_CLEAN_encoded', 'date']).agg({
-        'day_of_week': 'first',
-        'is_weekend': 'first',
-        'quarter': 'first',
-        'season_encoded': 'first',
         'LAT_R': 'mean',
         'LON_R': 'mean',
         'lat_zone': 'first',
         'lon_zone': 'first',
-        'neighbourhood_incident_count': 'first',
-        'month_sin': 'first',
-        'month_cos': 'first',
-        'day_of_week_sin': 'first',
-        'day_of_week_cos': 'first'
+        'neighbourhood_incident_count': 'first'
     }).reset_index()
     
     # Merge
     regression_data = daily_features.merge(daily_counts, on=['NEIGHBOURHOOD_CLEAN_encoded', 'date'])
+    # Day-level calendar features come from the date itself
+    regression_data['datetime'] = pd.to_datetime(regression_data['date'])
     
     feature_cols = [
         'day_of_week', 'is_weekend', 'quarter', 'season_encoded',
@@ -207,7 +222,7 @@ def prepare_regression_data(data):
         'month_sin', 'month_cos', 'day_of_week_sin', 'day_of_week_cos'
     ]
     
-    X = regression_data[feature_cols].values
+    X = FeatureBuilder(feature_cols).build(regression_data)
     y = regression_data['daily_event_count'].values
     
     print(f"Features shape: {X.shape}")
@@ -240,7 +255,7 @@ feature_cols_binary = [
     'month_sin', 'month_cos', 'events_this_hour'
 ]
 
-X_binary = data_sample[feature_cols_binary].values
+X_binary = FeatureBuilder(feature_cols_binary).build(data_sample)
 y_binary = data_sample['is_crime'].values
 
 X_multi, y_multi, feature_cols_multi = prepare_multiclass_data(data_sample)
@@ -249,12 +264,14 @@ X_reg, y_reg, feature_cols_reg, regression_data = prepare_regression_data(data_s
 # ============================================
 # SPLIT AND SCALE DATA
 # ============================================
+profiler.begin('split', model='binary')
 
 # Binary Classification
 X_train_bin, X_test_bin, y_train_bin, y_test_bin = train_test_split(
     X_binary, y_binary, test_size=0.2, random_state=42, stratify=y_binary
 )
 
+profiler.begin('scale', model='binary')
 scaler_bin = StandardScaler()
 X_train_bin_scaled = scaler_bin.fit_transform(X_train_bin)
 X_test_bin_scaled = scaler_bin.transform(X_test_bin)
@@ -262,10 +279,12 @@ X_test_bin_scaled = scaler_bin.transform(X_test_bin)
 print(f"Binary - Train: {X_train_bin_scaled.shape}, Test: {X_test_bin_scaled.shape}")
 
 # Multi-Class Classification
+profiler.begin('split', model='multiclass')
 X_train_multi, X_test_multi, y_train_multi, y_test_multi = train_test_split(
     X_multi, y_multi, test_size=0.2, random_state=42, stratify=y_multi
 )
 
+profiler.begin('scale', model='multiclass')
 scaler_multi = StandardScaler()
 X_train_multi_scaled = scaler_multi.fit_transform(X_train_multi)
 X_test_multi_scaled = scaler_multi.transform(X_test_multi)
@@ -273,15 +292,18 @@ X_test_multi_scaled = scaler_multi.transform(X_test_multi)
 print(f"Multi-Class - Train: {X_train_multi_scaled.shape}, Test: {X_test_multi_scaled.shape}")
 
 # Regression
+profiler.begin('split', model='regression')
 X_train_reg, X_test_reg, y_train_reg, y_test_reg = train_test_split(
     X_reg, y_reg, test_size=0.2, random_state=42
 )
 
+profiler.begin('scale', model='regression')
 scaler_reg = StandardScaler()
 X_train_reg_scaled = scaler_reg.fit_transform(X_train_reg)
 X_test_reg_scaled = scaler_reg.transform(X_test_reg)
 
 print(f"Regression - Train: {X_train_reg_scaled.shape}, Test: {X_test_reg_scaled.shape}")
+profiler.end()
 
 # ============================================
 # MODEL 1: BINARY CLASSIFICATION
@@ -401,12 +423,13 @@ print("\n" + "="*60)
 print("TRAINING BINARY CLASSIFICATION MODEL")
 print("="*60)
 
+profiler.begin('fit', model='binary')
 history_binary = binary_model.fit(
     X_train_bin_scaled, y_train_bin,
     validation_split=0.2,
     epochs=50,
     batch_size=256,
-    callbacks=[early_stopping, reduce_lr],
+    callbacks=[early_stopping, reduce_lr] + profiler.epoch_callbacks('binary', int(len(X_train_bin_scaled) * 0.8)),
     verbose=1
 )
 
@@ -415,12 +438,13 @@ print("\n" + "="*60)
 print("TRAINING MULTI-CLASS CLASSIFICATION MODEL")
 print("="*60)
 
+profiler.begin('fit', model='multiclass')
 history_multiclass = multiclass_model.fit(
     X_train_multi_scaled, y_train_multi,
     validation_split=0.2,
     epochs=50,
     batch_size=256,
-    callbacks=[early_stopping, reduce_lr],
+    callbacks=[early_stopping, reduce_lr] + profiler.epoch_callbacks('multiclass', int(len(X_train_multi_scaled) * 0.8)),
     verbose=1
 )
 
@@ -429,15 +453,17 @@ print("\n" + "="*60)
 print("TRAINING REGRESSION MODEL")
 print("="*60)
 
+profiler.begin('fit', model='regression')
 history_regression = regression_model.fit(
     X_train_reg_scaled, y_train_reg,
     validation_split=0.2,
     epochs=50,
     batch_size=128,
-    callbacks=[early_stopping, reduce_lr],
+    callbacks=[early_stopping, reduce_lr] + profiler.epoch_callbacks('regression', int(len(X_train_reg_scaled) * 0.8)),
     verbose=1
 )
 
+profiler.end()
 print("\n✓ All models trained successfully!")
 
 # ============================================
@@ -449,6 +475,7 @@ print("BINARY CLASSIFICATION EVALUATION")
 print("="*60)
 
 # Test set evaluation
+profiler.begin('evaluate', model='binary')
 binary_results = binary_model.evaluate(X_test_bin_scaled, y_test_bin, verbose=0)
 print(f"\nTest Loss: {binary_results[0]:.4f}")
 print(f"Test Accuracy: {binary_results[1]:.4f}")
@@ -488,6 +515,7 @@ print("MULTI-CLASS CLASSIFICATION EVALUATION")
 print("="*60)
 
 # Test set evaluation
+profiler.begin('evaluate', model='multiclass')
 multiclass_results = multiclass_model.evaluate(X_test_multi_scaled, y_test_multi, verbose=0)
 print(f"\nTest Loss: {multiclass_results[0]:.4f}")
 print(f"Test Accuracy: {multiclass_results[1]:.4f}")
@@ -524,6 +552,7 @@ print("REGRESSION EVALUATION")
 print("="*60)
 
 # Test set evaluation
+profiler.begin('evaluate', model='regression')
 regression_results = regression_model.evaluate(X_test_reg_scaled, y_test_reg, verbose=0)
 print(f"\nTest MSE: {regression_results[1]:.4f}")
 print(f"Test MAE: {regression_results[2]:.4f}")
@@ -554,6 +583,7 @@ print(f"Average predicted daily events: {y_pred_reg.mean():.2f}")
 # ============================================
 # VISUALIZATIONS
 # ============================================
+profiler.begin('plots')
 
 def plot_training_history(history, title):
     fig, axes = plt.subplots(1, 2, figsize=(14, 4))
@@ -622,6 +652,7 @@ print("Regression Actual vs Predicted Plot Plotted.")
 # ============================================
 
 print("Saving models and scalers...")
+profiler.begin('save')
 # Save models
 binary_model.save('binary_classification_model.keras')
 multiclass_model.save('multiclass_classification_model.keras')
@@ -640,34 +671,38 @@ with open('scaler_multiclass.pkl', 'wb') as f:
 with open('scaler_regression.pkl', 'wb') as f:
     pickle.dump(scaler_reg, f)
 
-# Save feature column names
+# Save feature column names (and the lookup the FeatureBuilders fill missing inputs from)
 with open('feature_columns.pkl', 'wb') as f:
     pickle.dump({
         'binary': feature_cols_binary,
         'multiclass': feature_cols_multi,
-        'regression': feature_cols_reg
+        'regression': feature_cols_reg,
+        'neighbourhood_stats': neighbourhood_stats,
+        # Training histograms for ml_api's drift monitor (the 19 columns cover regression's 14)
+        'feature_reference': reference_histograms(X_train_multi, feature_cols_multi)
     }, f)
 
 print("✓ All models and scalers saved successfully!")
+profiler.end()
 
 # ============================================
 # PREDICTION FUNCTIONS FOR NEW DATA
 # ============================================
 
-def predict_binary(neighbourhood, hour, day_of_week, is_weekend, lat, lon, season, **kwargs):
+# events_this_hour is only known in hindsight; predictions assume a quiet hour
+builder_bin = FeatureBuilder(feature_cols_binary, neighbourhood_stats, defaults={'events_this_hour': 0})
+builder_multi = FeatureBuilder(feature_cols_multi, neighbourhood_stats, defaults={'events_this_hour': 0})
+builder_reg = FeatureBuilder(feature_cols_reg, neighbourhood_stats)
+
+
+def predict_binary(neighbourhood, when, **inputs):
     """
     Predict if an event will occur
+    `when` is a datetime or Unix timestamp; scalars or equal-length arrays are accepted.
+    Extra inputs (lat, lon, lat_zone, ...) override the neighbourhood defaults.
     Returns: (prediction, confidence_score)
     """
-    # Create feature array (simplified - you'll need all features)
-    features = np.array([[
-        hour, day_of_week, is_weekend, 0, 1, season, lat, lon, 
-        0, 0, neighbourhood, 0,
-        np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24),
-        np.sin(2 * np.pi * day_of_week / 7), np.cos(2 * np.pi * day_of_week / 7),
-        0, 0, 0
-    ]])
-    
+    features = builder_bin.build({'neighbourhood': neighbourhood, 'datetime': when, **inputs})
     features_scaled = scaler_bin.transform(features)
     prob = binary_model.predict(features_scaled, verbose=0)[0][0]
     prediction = "Event will occur" if prob > 0.5 else "No event expected"
@@ -675,19 +710,12 @@ def predict_binary(neighbourhood, hour, day_of_week, is_weekend, lat, lon, seaso
     return prediction, prob
 
 
-def predict_multiclass(neighbourhood, hour, day_of_week, is_weekend, lat, lon, season, **kwargs):
+def predict_multiclass(neighbourhood, when, **inputs):
     """
     Predict type of event
     Returns: (top_prediction, top_3_predictions_with_probs)
     """
-    features = np.array([[
-        hour, day_of_week, is_weekend, 0, 1, season, lat, lon, 
-        0, 0, neighbourhood, 0,
-        np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24),
-        np.sin(2 * np.pi * day_of_week / 7), np.cos(2 * np.pi * day_of_week / 7),
-        0, 0, 0
-    ]])
-    
+    features = builder_multi.build({'neighbourhood': neighbourhood, 'datetime': when, **inputs})
     features_scaled = scaler_multi.transform(features)
     probs = multiclass_model.predict(features_scaled, verbose=0)[0]
     
@@ -697,36 +725,34 @@ def predict_multiclass(neighbourhood, hour, day_of_week, is_weekend, lat, lon, s
     return subtype_labels[top_3_indices[0]], top_3
 
 
-def predict_regression(neighbourhood, day_of_week, is_weekend, lat, lon, season, **kwargs):
+def predict_regression(neighbourhood, day, **inputs):
     """
     Predict number of events in a day
     Returns: predicted_count
     """
-    features = np.array([[
-        day_of_week, is_weekend, 1, season, lat, lon, 
-        0, 0, neighbourhood, 0,
-        0, 0, 0, 0
-    ]])
-    
+    features = builder_reg.build({'neighbourhood': neighbourhood, 'datetime': day, **inputs})
     features_scaled = scaler_reg.transform(features)
     count = regression_model.predict(features_scaled, verbose=0)[0][0]
     
     return max(0, count)  # Ensure non-negative
 
 
-# Example usage
+# Example usage (Saturday 13 Jan 2024, 9pm)
+example_time = datetime(2024, 1, 13, 21)
 print("\n=== Example Predictions ===")
 print("\nBinary Classification:")
-pred, conf = predict_binary(137, 21, 5, 1, -0.439, -2.011, 3)
+pred, conf = predict_binary(137, example_time, lat=-0.439, lon=-2.011)
 print(f"Prediction: {pred}")
 print(f"Confidence: {conf:.2%}")
 
 print("\nMulti-Class Classification:")
-top_pred, top_3 = predict_multiclass(137, 21, 5, 1, -0.439, -2.011, 3)
+top_pred, top_3 = predict_multiclass(137, example_time, lat=-0.439, lon=-2.011)
 print(f"Most likely event: {top_pred}")
 print("Top 3 predictions:")
 for event_type, prob in top_3:
     print(f"  - {event_type}: {prob:.2%}")
     print("\nRegression:")
-    count = predict_regression(137, 5, 1, -0.439, -2.011, 3)
-    print(f"Predicted daily events: {count:.1f}")
\ No newline at end of file
+    count = predict_regression(137, example_time, lat=-0.439, lon=-2.011)
+    print(f"Predicted daily events: {count:.1f}")
+
+profiler.write_report(args.profile_output, rows=len(df), sample_rows=len(data_sample))
@@ -0,0 +1,208 @@
+"""
+Offline bulk scoring for the inverse models, for query files far too large to send
+through /predict one row at a time (e.g. every hour of next month × every neighbourhood).
+
+The query file (CSV, Parquet or a directory of Parquet files) is read in chunks, each
+chunk is turned into features with the same FeatureBuilder ml_api.py uses, and chunks
+are scored in a process pool.
+Results are streamed to a Parquet file in input order, so memory stays bounded by
+roughly (workers × 2) chunks whatever the input size.
+
+Query columns use the /predict request names:
+    model1: datetime, neighbourhood              → event subtype
+    model2: datetime, event_subtype              → neighbourhood
+    model3: neighbourhood, event_subtype         → hour
+plus optional lat / lon / lat_zone / lon_zone. datetime is Unix seconds or an ISO string.
+A chunk with invalid values stops the run with its input row range, or is skipped and
+reported with --skip-errors.
+
+Usage:
+    python bulk_score.py queries.csv --model model1 --top-k 3 --output scores.parquet
+    python bulk_score.py queries.parquet --model model2 --full --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import pickle
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from features import FeatureBuilder
+
+OUTPUT_PATH = 'bulk_scores.parquet'
+CHUNK_SIZE = 200000
+LOCATION_DEFAULTS = {'LAT_R': 0.0, 'LON_R': 0.0, 'lat_zone': 0, 'lon_zone': 0}
+
+# Per-process scoring state, loaded once by _init_worker
+_worker = {}
+
+
+def read_chunks(path, chunk_size):
+    """
+    Yield DataFrames of at most chunk_size rows from a CSV or Parquet file, or from a
+    directory of Parquet files (hive partition columns, e.g. year=2024/, are included)
+    """
+    if os.path.isdir(path):
+        for batch in ds.dataset(path, format='parquet', partitioning='hive').to_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif path.endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def output_width(name, metadata):
+    """Number of classes a bundle's model predicts (train_inverse_models.num_classes_for)"""
+    if name == 'model1':
+        return len(metadata['subtype_labels'])
+    if name == 'model2':
+        return metadata['num_neighbourhoods']
+    return 24
+
+
+def class_labels(name, metadata, num_classes):
+    """Human-readable label for every output unit of a model"""
+    if name == 'model1':
+        return [metadata['subtype_labels'][i] for i in range(num_classes)]
+    if name == 'model2':
+        return [str(i) for i in range(num_classes)]
+    return [f'{h:02d}:00' for h in range(num_classes)]
+
+
+def _init_worker(name, bundle_dir, threads):
+    """Load the model, scaler and feature builder once per worker process"""
+    import tensorflow as tf
+    from tensorflow import keras
+    import train_inverse_models as tim
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 2))
+
+    spec = tim.MODEL_SPECS[name]
+    with open(os.path.join(bundle_dir, tim.METADATA_PATH), 'rb') as f:
+        metadata = pickle.load(f)
+    with open(os.path.join(bundle_dir, spec['scaler_path']), 'rb') as f:
+        _worker['scaler'] = pickle.load(f)
+    _worker['model'] = keras.models.load_model(os.path.join(bundle_dir, spec['model_path']))
+    _worker['builder'] = FeatureBuilder.from_metadata(metadata, name, defaults=LOCATION_DEFAULTS)
+    _worker['labels'] = np.array(class_labels(name, metadata, _worker['model'].output_shape[-1]))
+
+
+def _score_chunk(chunk, top_k, full, batch_size):
+    """Score one query chunk; returns the query columns plus the prediction columns"""
+    X = _worker['scaler'].transform(_worker['builder'].build(chunk)).astype(np.float32)
+    probabilities = np.concatenate([
+        _worker['model'](X[start:start + batch_size], training=False).numpy()
+        for start in range(0, len(X), batch_size)
+    ]) if len(X) else np.zeros((0, len(_worker['labels'])), dtype=np.float32)
+
+    out = chunk.reset_index(drop=True)
+    if full:
+        prob_cols = pd.DataFrame(probabilities, columns=[f'prob_{label}' for label in _worker['labels']])
+        return pd.concat([out, prob_cols], axis=1)
+
+    # argpartition + a sort of only k columns instead of a full argsort per row
+    top = np.argpartition(probabilities, -top_k, axis=1)[:, -top_k:]
+    top_prob = np.take_along_axis(probabilities, top, axis=1)
+    order = np.argsort(-top_prob, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_prob = np.take_along_axis(top_prob, order, axis=1)
+    for rank in range(top_k):
+        out[f'pred_{rank + 1}'] = _worker['labels'][top[:, rank]]
+        out[f'prob_{rank + 1}'] = top_prob[:, rank]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-score a query file with an inverse model')
+    parser.add_argument('input', help='CSV or Parquet query file, or a Parquet dataset directory')
+    parser.add_argument('--model', choices=['model1', 'model2', 'model3'], default='model1')
+    parser.add_argument('--bundle', default='.', help='Bundle directory with models, scalers and metadata')
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--top-k', type=int, default=5, help='Predictions kept per row')
+    parser.add_argument('--full', action='store_true', help='Write every class probability instead of top-k')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--batch-size', type=int, default=65536, help='Rows per model call')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--skip-errors', action='store_true',
+                        help='Report chunks with invalid rows and score the rest instead of stopping')
+    args = parser.parse_args()
+
+    # Checked here: inside the pool a bad --top-k would only fail once the first chunk is scored.
+    # The metadata is read directly (train_inverse_models.METADATA_PATH) so TensorFlow stays in the workers
+    with open(os.path.join(args.bundle, 'inverse_models_metadata.pkl'), 'rb') as f:
+        width = output_width(args.model, pickle.load(f))
+    if not args.full and not 1 <= args.top_k <= width:
+        parser.error(f"--top-k must be between 1 and {width}, the number of classes {args.model} predicts")
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    print(f"Scoring '{args.input}' with {args.model} on {args.workers} workers "
+          f"({threads} threads each), chunks of {args.chunk_size:,} rows")
+
+    writer = None
+    rows = skipped = 0
+    chunks_read = next_row = 0
+    start = time.perf_counter()
+    # Bounded window of in-flight chunks keeps memory flat and output in input order
+    pending = deque()
+    ctx = mp.get_context('spawn')  # TensorFlow's runtime is not fork-safe
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(args.model, args.bundle, threads)) as pool:
+        chunks = read_chunks(args.input, args.chunk_size)
+        while True:
+            while len(pending) < args.workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                future = pool.submit(_score_chunk, chunk, args.top_k, args.full, args.batch_size)
+                pending.append((future, chunks_read, next_row, len(chunk)))
+                chunks_read += 1
+                next_row += len(chunk)
+            if not pending:
+                break
+
+            future, index, first_row, size = pending.popleft()
+            try:
+                scored = future.result()
+            except ValueError as e:
+                # Invalid query values (FeatureBuilder); name the rows instead of a worker traceback
+                where = f"chunk {index} (input rows {first_row:,}-{first_row + size - 1:,})"
+                if not args.skip_errors:
+                    pool.shutdown(cancel_futures=True)
+                    if writer is not None:
+                        writer.close()
+                    raise SystemExit(f"✗ Could not score {where}: {e}\n"
+                                     "  Fix those rows, or pass --skip-errors to score the rest")
+                print(f"  ⚠ Skipped {where}: {e}")
+                skipped += size
+                continue
+
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(args.output, table.schema)
+            writer.write_table(table)
+
+            rows += table.num_rows
+            elapsed = time.perf_counter() - start
+            print(f"  {rows:,} rows scored ({rows / elapsed:,.0f} rows/sec)")
+
+    if writer is not None:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ {rows:,} rows scored in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    if skipped:
+        print(f"⚠ {skipped:,} rows in chunks with invalid values were skipped")
+    print(f"✓ Predictions saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
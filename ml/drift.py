@@ -0,0 +1,150 @@
+"""
+Input drift monitoring for ml_api.py.
+
+At training time `reference_histograms` stores a fixed-edge histogram per feature in the
+model metadata. At serving time a DriftMonitor keeps a histogram with the same edges for
+live traffic. Requests only enqueue their feature rows (a non-blocking put); a background
+thread bins them and periodically scores each feature against its reference with the
+population stability index (PSI) and Jensen-Shannon divergence. Memory is fixed: one
+counts vector per feature, decayed every interval so scores follow recent traffic.
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Columns with at most this many distinct values get one bin per value
+MAX_CATEGORIES = 256
+QUANTILE_BINS = 20
+
+# Common PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+def histogram_edges(values):
+    """
+    Bin edges for one feature. Value `v` lands in bin searchsorted(edges, v, 'right'):
+    bin 0 and the last bin hold values below / above anything seen in training.
+    """
+    unique = np.unique(values)
+    if len(unique) <= MAX_CATEGORIES:
+        inner = (unique[:-1] + unique[1:]) / 2
+    else:
+        quantiles = np.quantile(values, np.linspace(0, 1, QUANTILE_BINS + 1)[1:-1])
+        inner = np.unique(quantiles)
+    return np.concatenate([[unique[0]], inner, [np.nextafter(unique[-1], np.inf)]])
+
+
+def bin_counts(edges, values):
+    return np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+
+
+def reference_histograms(X, columns):
+    """{column: {'edges', 'counts'}} for a training feature matrix, stored with the model"""
+    X = np.asarray(X, dtype=np.float64)
+    reference = {}
+    for j, col in enumerate(columns):
+        edges = histogram_edges(X[:, j])
+        reference[col] = {'edges': edges.tolist(), 'counts': bin_counts(edges, X[:, j]).tolist()}
+    return reference
+
+
+def drift_scores(reference_counts, live_counts, eps=1e-4):
+    """PSI, Jensen-Shannon divergence and share of live values outside the training range"""
+    p = np.asarray(reference_counts, dtype=np.float64)
+    q = np.asarray(live_counts, dtype=np.float64)
+    out_of_range = (q[0] + q[-1]) / q.sum()
+    p = (p + eps) / (p + eps).sum()
+    q = (q + eps) / (q + eps).sum()
+
+    psi = float(((q - p) * np.log(q / p)).sum())
+    m = (p + q) / 2
+    js = float(0.5 * (p * np.log(p / m)).sum() + 0.5 * (q * np.log(q / m)).sum())
+    return {'psi': round(psi, 4), 'js_divergence': round(js, 4), 'out_of_range': round(float(out_of_range), 4)}
+
+
+class DriftMonitor:
+    """
+    Streaming histograms of live features, compared against the training reference.
+    `observe` is safe to call on the request path: it never blocks and drops rows
+    (counted in `dropped`) if the background thread falls behind.
+    """
+
+    def __init__(self, reference, interval=60.0, decay=0.5, min_rows=100, max_pending=10000):
+        self.reference = {col: {'edges': np.asarray(ref['edges']), 'counts': np.asarray(ref['counts'])}
+                          for col, ref in (reference or {}).items()}
+        self.interval = interval
+        self.decay = decay
+        self.min_rows = min_rows
+        self.live = {col: np.zeros(len(ref['counts'])) for col, ref in self.reference.items()}
+        self.rows = {col: 0.0 for col in self.reference}
+        self.scores = {}
+        self.updated_at = None
+        self.dropped = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+
+        if self.reference:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def observe(self, columns, X):
+        """Queue a batch of feature rows (n × len(columns)) built for a request"""
+        if not self.reference:
+            return
+        try:
+            self._pending.put_nowait((columns, X))
+        except queue.Full:
+            self.dropped += len(X)
+
+    def _ingest(self, columns, X):
+        with self._lock:
+            for j, col in enumerate(columns):
+                if col in self.reference:
+                    self.live[col] += bin_counts(self.reference[col]['edges'], X[:, j])
+                    self.rows[col] += len(X)
+
+    def _run(self):
+        next_score = time.monotonic() + self.interval
+        while True:
+            timeout = max(0.0, next_score - time.monotonic())
+            try:
+                self._ingest(*self._pending.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_score:
+                self.compute()
+                next_score = time.monotonic() + self.interval
+
+    def compute(self):
+        """Score every feature with enough live rows, then decay the live counts"""
+        with self._lock:
+            scores = {}
+            for col, ref in self.reference.items():
+                if self.rows[col] >= self.min_rows:
+                    scores[col] = {**drift_scores(ref['counts'], self.live[col]),
+                                   'rows': int(self.rows[col])}
+                self.live[col] *= self.decay
+                self.rows[col] *= self.decay
+            self.scores = scores
+            self.updated_at = time.time()
+        return scores
+
+    def report(self):
+        """Latest scores plus an overall status, for the /drift endpoint"""
+        worst = max((s['psi'] for s in self.scores.values()), default=0.0)
+        if worst >= PSI_SIGNIFICANT:
+            status = 'significant'
+        elif worst >= PSI_MODERATE:
+            status = 'moderate'
+        else:
+            status = 'stable'
+        return {
+            'status': status if self.scores else 'insufficient_data',
+            'max_psi': round(worst, 4),
+            'updated_at': self.updated_at,
+            'interval_s': self.interval,
+            'dropped_rows': self.dropped,
+            'features': self.scores,
+        }
@@ -0,0 +1,250 @@
+"""
+Shared feature builder for training, ml_api.py and offline scoring.
+
+A FeatureBuilder is driven by a model's feature list (the `*_features` entries in
+inverse_models_metadata.pkl or the lists in feature_columns.pkl) and turns a batch
+of raw inputs - timestamps, neighbourhood / subtype codes, coordinates - into the
+float32 matrix the model's scaler expects, in one vectorized call.
+
+Calendar features are always derived from the event timestamp, so the cleaned CSV,
+the training scripts and the API can't disagree about them.
+"""
+import numpy as np
+import pandas as pd
+
+from geogrid import GeoGrid
+
+# Incident timestamps in the cleaned data are Toronto wall-clock time
+TIMEZONE = 'America/Toronto'
+
+# Request-style names accepted for the dataset columns
+ALIASES = {
+    'neighbourhood': 'NEIGHBOURHOOD_CLEAN_encoded',
+    'event_subtype': 'EVENT_SUBTYPE_encoded',
+    'lat': 'LAT_R',
+    'lon': 'LON_R',
+}
+
+# season_encoded ids from clean.py's vocabularies.json: Fall, Spring, Summer, Winter
+SEASON_BY_MONTH = np.array([3, 3, 1, 1, 1, 2, 2, 2, 0, 0, 0, 3])
+
+CALENDAR_FEATURES = (
+    'year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night', 'quarter',
+    'season_encoded', 'hour_sin', 'hour_cos', 'day_of_week_sin', 'day_of_week_cos',
+    'month_sin', 'month_cos',
+)
+
+
+def to_local_datetime64(values):
+    """
+    Unix seconds (UTC) or naive datetimes → naive datetime64[s] in Toronto wall-clock time.
+    Datetime-like input is assumed to already be local time, like the cleaned data.
+    """
+    values = pd.Series(np.atleast_1d(values))
+    if pd.api.types.is_numeric_dtype(values):
+        local = pd.to_datetime(values, unit='s', utc=True).dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+    else:
+        local = pd.to_datetime(values)
+    return local.to_numpy(dtype='datetime64[s]')
+
+
+def calendar_features(timestamps):
+    """All calendar features for an array of datetime64 values, computed with numpy only"""
+    days = timestamps.astype('datetime64[D]')
+    months = timestamps.astype('datetime64[M]')
+
+    year = months.astype(np.int64) // 12 + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months.astype('datetime64[D]')).astype(np.int64) + 1
+    hour = (timestamps.astype('datetime64[h]') - days.astype('datetime64[h]')).astype(np.int64)
+    day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; 0=Monday
+
+    return {
+        'year': year,
+        'month': month,
+        'day': day,
+        'hour': hour,
+        'day_of_week': day_of_week,
+        'is_weekend': (day_of_week >= 5).astype(np.int64),
+        'is_night': ((hour < 6) | (hour >= 22)).astype(np.int64),
+        'quarter': (month - 1) // 3 + 1,
+        'season_encoded': SEASON_BY_MONTH[month - 1],
+        'hour_sin': np.sin(2 * np.pi * hour / 24),
+        'hour_cos': np.cos(2 * np.pi * hour / 24),
+        'day_of_week_sin': np.sin(2 * np.pi * day_of_week / 7),
+        'day_of_week_cos': np.cos(2 * np.pi * day_of_week / 7),
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+    }
+
+
+def partial_calendar_features(arrays):
+    """
+    Calendar features derivable from explicit hour / day_of_week / month inputs when no
+    timestamp is given. Only features missing from the inputs are returned.
+    """
+    derived = {}
+    if 'hour' in arrays:
+        hour = arrays['hour'].astype(np.float64)
+        derived['is_night'] = ((hour < 6) | (hour >= 22)).astype(np.int64)
+        derived['hour_sin'] = np.sin(2 * np.pi * hour / 24)
+        derived['hour_cos'] = np.cos(2 * np.pi * hour / 24)
+    if 'day_of_week' in arrays:
+        day_of_week = arrays['day_of_week'].astype(np.float64)
+        derived['is_weekend'] = (day_of_week >= 5).astype(np.int64)
+        derived['day_of_week_sin'] = np.sin(2 * np.pi * day_of_week / 7)
+        derived['day_of_week_cos'] = np.cos(2 * np.pi * day_of_week / 7)
+    if 'month' in arrays:
+        month = arrays['month'].astype(np.int64)
+        derived['quarter'] = (month - 1) // 3 + 1
+        derived['season_encoded'] = SEASON_BY_MONTH[month - 1]
+        derived['month_sin'] = np.sin(2 * np.pi * month / 12)
+        derived['month_cos'] = np.cos(2 * np.pi * month / 12)
+    return {col: values for col, values in derived.items() if col not in arrays}
+
+
+def _numeric(col, values):
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (ValueError, TypeError):
+        raise ValueError(f'{col} must be numeric') from None
+
+
+class FeatureBuilder:
+    """
+    Builds the feature matrix for one model.
+
+    Each column is resolved, in order, from: the calendar of the event timestamp
+    (or, without one, of explicit hour / day_of_week / month inputs), the inputs
+    themselves (dataset names or ALIASES), a per-neighbourhood lookup table
+    (e.g. neighbourhood_coords), then `defaults`. Anything still missing is an
+    error rather than a silent zero. With a `grid` (geogrid.GeoGrid), lat_zone /
+    lon_zone that are not given are computed from the resolved LAT_R / LON_R.
+    """
+
+    def __init__(self, columns, neighbourhood_stats=None, defaults=None, subtype_to_int=None, grid=None):
+        self.columns = list(columns)
+        self.defaults = dict(defaults or {})
+        self.subtype_to_int = subtype_to_int
+        self.grid = grid
+
+        # Lookup table as {column: (sorted neighbourhood ids, values)} for np.searchsorted
+        self.lookup = {}
+        if neighbourhood_stats:
+            ids = np.array(sorted(neighbourhood_stats), dtype=np.int64)
+            fields = set().union(*(row.keys() for row in neighbourhood_stats.values()))
+            for field in fields:
+                values = np.array([neighbourhood_stats[i].get(field, np.nan) for i in ids], dtype=np.float64)
+                self.lookup[field] = (ids, values)
+
+    @classmethod
+    def from_metadata(cls, metadata, name, defaults=None):
+        """Builder for an inverse model from its inverse_models_metadata.pkl bundle"""
+        return cls(metadata[f'{name}_features'],
+                   neighbourhood_stats=metadata.get('neighbourhood_coords'),
+                   defaults=defaults,
+                   subtype_to_int=metadata.get('subtype_to_int'),
+                   grid=GeoGrid.from_metadata(metadata))
+
+    def _inputs(self, inputs):
+        """Normalise a DataFrame / dict of scalars or arrays to {dataset column: 1-D array}"""
+        if isinstance(inputs, pd.DataFrame):
+            arrays = {col: inputs[col].to_numpy() for col in inputs.columns}
+        else:
+            arrays = {key: np.atleast_1d(np.asarray(value)) for key, value in inputs.items()}
+        for alias, column in ALIASES.items():
+            if alias in arrays and column not in arrays:
+                arrays[column] = arrays.pop(alias)
+
+        lengths = {len(v) for v in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'Inputs have mismatched lengths: {sorted(lengths)}')
+        return arrays, (lengths.pop() if lengths else 0)
+
+    def _timestamps(self, arrays):
+        if 'datetime' in arrays:
+            try:
+                timestamps = to_local_datetime64(arrays['datetime'])
+            except (ValueError, TypeError, OverflowError) as e:
+                raise ValueError(f'Invalid datetime: {e}') from None
+            if np.isnat(timestamps).any():
+                raise ValueError('Invalid datetime: missing or not a number')
+            return timestamps
+        if all(col in arrays for col in ('year', 'month', 'day', 'hour')):
+            return pd.to_datetime(pd.DataFrame({col: arrays[col] for col in ('year', 'month', 'day', 'hour')})) \
+                .to_numpy(dtype='datetime64[s]')
+        return None
+
+    def _subtypes(self, values):
+        if values.dtype.kind not in 'OUS':
+            return values
+        if self.subtype_to_int is None:
+            raise ValueError('event_subtype given as labels but the builder has no subtype_to_int mapping')
+        codes = pd.Series(values).map(self.subtype_to_int)
+        if codes.isna().any():
+            unknown = sorted(set(pd.Series(values)[codes.isna()]))
+            raise ValueError(f'Unknown event_subtype: {unknown}')
+        return codes.to_numpy()
+
+    def _resolve(self, col, arrays, neighbourhoods, n):
+        """A non-calendar column from the inputs, the neighbourhood lookup, then defaults (NaN if none)"""
+        if col in arrays:
+            return _numeric(col, arrays[col])
+        values = np.full(n, np.nan)
+        if col in self.lookup and neighbourhoods is not None:
+            ids, table = self.lookup[col]
+            keys = np.asarray(neighbourhoods, dtype=np.int64)
+            pos = np.clip(np.searchsorted(ids, keys), 0, len(ids) - 1)
+            values = np.where(ids[pos] == keys, table[pos], np.nan)
+        if col in self.defaults:
+            values = np.where(np.isnan(values), self.defaults[col], values)
+        return values
+
+    def build(self, inputs):
+        """Feature matrix (n_rows × len(columns), float32) for a batch of inputs"""
+        arrays, n = self._inputs(inputs)
+        if 'EVENT_SUBTYPE_encoded' in arrays:
+            arrays['EVENT_SUBTYPE_encoded'] = self._subtypes(arrays['EVENT_SUBTYPE_encoded'])
+
+        calendar = None
+        if any(col in CALENDAR_FEATURES for col in self.columns):
+            timestamps = self._timestamps(arrays)
+            if timestamps is not None:
+                calendar = calendar_features(timestamps)
+            else:
+                calendar = partial_calendar_features(arrays)
+
+        neighbourhoods = arrays.get('NEIGHBOURHOOD_CLEAN_encoded')
+        zones = None
+        X = np.empty((n, len(self.columns)), dtype=np.float32)
+        missing = []
+        for j, col in enumerate(self.columns):
+            if calendar is not None and col in calendar:
+                X[:, j] = calendar[col]
+                continue
+            if col in arrays:
+                X[:, j] = _numeric(col, arrays[col])
+                continue
+
+            if self.grid is not None and col in ('lat_zone', 'lon_zone'):
+                if zones is None:
+                    lat, lon = (self._resolve(c, arrays, neighbourhoods, n) for c in ('LAT_R', 'LON_R'))
+                    if not (np.isnan(lat).any() or np.isnan(lon).any()):
+                        zones = dict(zip(('lat_zone', 'lon_zone'), self.grid.zones(lat, lon)))
+                if zones is not None:
+                    X[:, j] = zones[col]
+                    continue
+
+            values = self._resolve(col, arrays, neighbourhoods, n)
+            if np.isnan(values).any():
+                missing.append(col)
+            X[:, j] = values
+
+        if missing:
+            raise ValueError(f'Cannot build features {missing} from inputs {sorted(arrays)}')
+        # NaN / inf from the inputs (or too large for float32) must not reach a model
+        finite = np.isfinite(X).all(axis=0)
+        if not finite.all():
+            bad = [col for col, ok in zip(self.columns, finite) if not ok]
+            raise ValueError(f'Non-finite values for features {bad}')
+        return X
@@ -0,0 +1,87 @@
+"""
+Fixed geographic grid for the lat_zone / lon_zone features.
+
+A quadtree over a fixed Toronto bounding box: at level L each axis is split into 2**L
+equal bands, so a zone depends only on the coordinate, never on the data loaded with
+it. The level L-1 zone is the level-L zone >> 1, and cell_ids interleaves the two
+indices (Z-order) so a cell's parent is its id >> 2. Points outside the box fall in
+the edge zones.
+
+clean.py computes zones from degrees with data/data-wrangling/zones.py, a copy of
+TORONTO_BBOX, GRID_LEVEL and zones() checked against this module by its tests; change
+both together. The models see
+standardized LAT_R / LON_R, so a GeoGrid also carries the cleaning run's coordinate
+mean and scale; training stores it in the metadata bundle and the FeatureBuilder
+derives zones from request coordinates with it.
+"""
+import os
+import pickle
+
+import numpy as np
+
+TORONTO_BBOX = {'lat': (43.58, 43.86), 'lon': (-79.64, -79.11)}
+GRID_LEVEL = 4  # 16 × 16 zones of about 1.9 km × 2.7 km
+
+
+def zone_index(values, low, high, level=GRID_LEVEL):
+    """Band index (0 .. 2**level - 1) of each value in [low, high]"""
+    bands = 1 << level
+    index = np.floor((np.asarray(values, dtype=np.float64) - low) * (bands / (high - low)))
+    return np.clip(index, 0, bands - 1).astype(np.int64)
+
+
+def zones(lat, lon, level=GRID_LEVEL, bbox=TORONTO_BBOX):
+    """(lat_zone, lon_zone) arrays for coordinates in degrees"""
+    return zone_index(lat, *bbox['lat'], level), zone_index(lon, *bbox['lon'], level)
+
+
+def cell_ids(lat_zone, lon_zone, level=GRID_LEVEL):
+    """Z-order cell id of each (lat_zone, lon_zone); id >> 2 is the cell one level up"""
+    lat_zone, lon_zone = np.asarray(lat_zone, dtype=np.int64), np.asarray(lon_zone, dtype=np.int64)
+    ids = np.zeros(np.broadcast(lat_zone, lon_zone).shape, dtype=np.int64)
+    for bit in range(level):
+        ids |= ((lat_zone >> bit) & 1) << (2 * bit + 1)
+        ids |= ((lon_zone >> bit) & 1) << (2 * bit)
+    return ids
+
+
+class GeoGrid:
+    """The grid plus the LAT_R / LON_R standardization of the cleaned data"""
+
+    def __init__(self, lat_mean, lat_scale, lon_mean, lon_scale, level=GRID_LEVEL, bbox=TORONTO_BBOX):
+        self.lat_mean, self.lat_scale = float(lat_mean), float(lat_scale)
+        self.lon_mean, self.lon_scale = float(lon_mean), float(lon_scale)
+        self.level = int(level)
+        self.bbox = {axis: tuple(bounds) for axis, bounds in bbox.items()}
+
+    @classmethod
+    def from_scaler(cls, scaler, level=GRID_LEVEL):
+        """From clean.py's scaler.pkl (a StandardScaler over LAT_R, LON_R, distance_from_center)"""
+        names = list(getattr(scaler, 'feature_names_in_', ['LAT_R', 'LON_R']))
+        lat, lon = names.index('LAT_R'), names.index('LON_R')
+        return cls(scaler.mean_[lat], scaler.scale_[lat], scaler.mean_[lon], scaler.scale_[lon], level)
+
+    @classmethod
+    def load(cls, scaler_path, level=GRID_LEVEL):
+        """GeoGrid for the scaler.pkl at scaler_path, or None if there is none"""
+        if not os.path.exists(scaler_path):
+            return None
+        with open(scaler_path, 'rb') as f:
+            return cls.from_scaler(pickle.load(f), level)
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        """The bundle's grid, or None for bundles trained before it was recorded"""
+        spec = metadata.get('geo_grid')
+        return cls(**spec) if spec else None
+
+    def to_dict(self):
+        return {'lat_mean': self.lat_mean, 'lat_scale': self.lat_scale,
+                'lon_mean': self.lon_mean, 'lon_scale': self.lon_scale,
+                'level': self.level, 'bbox': self.bbox}
+
+    def zones(self, lat_r, lon_r):
+        """(lat_zone, lon_zone) for standardized LAT_R / LON_R values"""
+        lat = np.asarray(lat_r, dtype=np.float64) * self.lat_scale + self.lat_mean
+        lon = np.asarray(lon_r, dtype=np.float64) * self.lon_scale + self.lon_mean
+        return zones(lat, lon, self.level, self.bbox)
@@ -0,0 +1,269 @@
+"""
+Hyperparameter search for the inverse models in train_inverse_models.py.
+
+Random-search trials run in a CPU process pool. Every epoch each trial reports its
+val_loss to a shared board; a trial whose val_loss is worse than the median of the
+other trials at the same epoch is pruned. Every trial is recorded with its config,
+throughput, wall time, parameter count, saved size and single-row inference latency,
+and the best configuration per model is emitted together with the
+accuracy/latency/size Pareto front.
+
+Only the three inverse models (train_inverse_models.MODEL_SPECS) are searched. The
+base models in boom.py are built inside that top-level script, with no build or fit
+function to call per trial, so their layer sizes are still hand-picked.
+
+Usage:
+    python hparam_search.py --trials 24 --workers 8 --models model1 model3
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from tensorflow import keras
+
+import train_inverse_models as tim
+from profiling import EpochThroughput
+
+RESULTS_PATH = 'hparam_search_results.json'
+
+# Sampling space; 'hidden' is generated as a halving stack starting from first_units
+SEARCH_SPACE = {
+    'first_units': [64, 128, 256, 512],
+    'depth': [2, 3, 4],
+    'batch_norm': [True, False],
+    'dropout': [0.1, 0.2, 0.3, 0.4, 0.5],
+    'batch_size': [256, 512, 1024, 2048],
+    'learning_rate': (1e-4, 3e-3),  # log-uniform
+}
+
+
+def sample_config(rng):
+    """Draw one trial configuration in MODEL_SPECS 'hidden' format"""
+    first = rng.choice(SEARCH_SPACE['first_units'])
+    depth = rng.choice(SEARCH_SPACE['depth'])
+    batch_norm = rng.choice(SEARCH_SPACE['batch_norm'])
+    dropout = rng.choice(SEARCH_SPACE['dropout'])
+
+    hidden = []
+    for i in range(depth):
+        units = max(16, first // (2 ** i))
+        # Same shape as the hand-picked stacks: dropout tapers, last block has no batch norm
+        hidden.append((units, batch_norm and i < depth - 1, round(max(0.0, dropout - 0.1 * i), 2)))
+
+    low, high = SEARCH_SPACE['learning_rate']
+    return {
+        'hidden': hidden,
+        'batch_size': rng.choice(SEARCH_SPACE['batch_size']),
+        'learning_rate': float(np.exp(rng.uniform(np.log(low), np.log(high)))),
+    }
+
+
+class MedianPruner(keras.callbacks.Callback):
+    """Stop a trial whose epoch val_loss is worse than the median of its peers"""
+
+    def __init__(self, board, lock, key, warmup_epochs=2, min_peers=3):
+        super().__init__()
+        self.board = board
+        self.lock = lock
+        self.key = key
+        self.warmup_epochs = warmup_epochs
+        self.min_peers = min_peers
+        self.pruned_at = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        val_loss = (logs or {}).get('val_loss')
+        if val_loss is None:
+            return
+        board_key = f'{self.key}:{epoch}'
+        with self.lock:
+            peers = list(self.board.get(board_key, []))
+            self.board[board_key] = peers + [float(val_loss)]
+
+        if epoch + 1 < self.warmup_epochs or len(peers) < self.min_peers:
+            return
+        if val_loss > float(np.median(peers)):
+            self.pruned_at = epoch + 1
+            self.model.stop_training = True
+
+
+def measure_serving_cost(model, input_dim, repeats=50):
+    """Median single-row latency (ms) and saved .keras size (bytes)"""
+    x = np.zeros((1, input_dim), dtype=np.float32)
+    model(x, training=False)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model(x, training=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trial.keras')
+        model.save(path)
+        size_bytes = os.path.getsize(path)
+
+    return float(np.median(timings)), size_bytes
+
+
+def _run_trial(trial_id, name, config, data_dir, num_classes, threads, max_epochs, board, lock):
+    """Train and measure one trial inside a pool worker"""
+    tim.configure_worker(threads)
+    split = tim.load_split(name, data_dir)
+    input_dim = split['X_train'].shape[1]
+
+    model = tim.build_model(name, input_dim, num_classes,
+                            hidden=config['hidden'], learning_rate=config['learning_rate'])
+    pruner = MedianPruner(board, lock, name)
+    # validation_split=0.2 below trains on 80% of X_train
+    throughput = EpochThroughput(int(len(split['X_train']) * 0.8))
+
+    start = time.perf_counter()
+    history = model.fit(
+        split['X_train'], split['y_train'],
+        validation_split=0.2,
+        epochs=max_epochs,
+        batch_size=config['batch_size'],
+        callbacks=[
+            keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+            keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3),
+            pruner,
+            throughput,
+        ],
+        verbose=0
+    )
+    wall_time = time.perf_counter() - start
+
+    test_loss, test_accuracy = model.evaluate(split['X_test'], split['y_test'],
+                                              batch_size=4096, verbose=0)
+    latency_ms, size_bytes = measure_serving_cost(model, input_dim)
+
+    return {
+        'trial_id': trial_id,
+        'model': name,
+        'config': config,
+        'pruned': pruner.pruned_at is not None,
+        'pruned_at_epoch': pruner.pruned_at,
+        'epochs_run': len(history.history['loss']),
+        'best_val_loss': float(min(history.history['val_loss'])),
+        'test_loss': float(test_loss),
+        'test_accuracy': float(test_accuracy),
+        'wall_time_s': round(wall_time, 2),
+        'samples_per_sec': throughput.samples_per_sec,
+        'params': int(model.count_params()),
+        'size_bytes': size_bytes,
+        'latency_ms': round(latency_ms, 3),
+    }
+
+
+def pareto_front(trials):
+    """Trials not dominated on (test_accuracy ↑, latency_ms ↓, params ↓)"""
+    def dominates(a, b):
+        no_worse = (a['test_accuracy'] >= b['test_accuracy'] and
+                    a['latency_ms'] <= b['latency_ms'] and a['params'] <= b['params'])
+        better = (a['test_accuracy'] > b['test_accuracy'] or
+                  a['latency_ms'] < b['latency_ms'] or a['params'] < b['params'])
+        return no_worse and better
+
+    return [t for t in trials if not any(dominates(o, t) for o in trials if o is not t)]
+
+
+def select_best(trials, max_latency_ms=None, max_params=None):
+    """Most accurate completed trial that fits the serving budget"""
+    candidates = [
+        t for t in trials
+        if not t['pruned']
+        and (max_latency_ms is None or t['latency_ms'] <= max_latency_ms)
+        and (max_params is None or t['params'] <= max_params)
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda t: (t['test_accuracy'], -t['latency_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hyperparameter search for the inverse models')
+    parser.add_argument('--data', default=tim.DATA_PATH)
+    parser.add_argument('--models', nargs='+', default=list(tim.MODEL_SPECS),
+                        choices=list(tim.MODEL_SPECS))
+    parser.add_argument('--trials', type=int, default=16, help='Trials per model')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--max-epochs', type=int, default=15)
+    parser.add_argument('--sample-size', type=int, default=100000,
+                        help='Rows used for the search (smaller than full training for speed)')
+    parser.add_argument('--max-latency-ms', type=float, default=None,
+                        help='Only pick configs at or below this single-row latency')
+    parser.add_argument('--max-params', type=int, default=None,
+                        help='Only pick configs at or below this parameter count')
+    parser.add_argument('--seed', type=int, default=tim.SEED)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    rng = random.Random(args.seed)
+
+    df, num_neighbourhoods, _ = tim.load_data(args.data, args.sample_size)
+    splits = {name: tim.prepare_split(df, name) for name in args.models}
+
+    jobs = [
+        (f'{name}-{i:03d}', name, sample_config(rng))
+        for name in args.models for i in range(args.trials)
+    ]
+    print(f"\nRunning {len(jobs)} trials on {args.workers} workers ({threads} threads each)...")
+
+    trials = []
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as data_dir, mp.get_context('spawn').Manager() as manager:
+        tim.dump_splits(splits, data_dir)
+        board, lock = manager.dict(), manager.Lock()
+
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 mp_context=mp.get_context('spawn')) as pool:
+            futures = [
+                pool.submit(_run_trial, trial_id, name, config, data_dir,
+                            tim.num_classes_for(name, num_neighbourhoods),
+                            threads, args.max_epochs, board, lock)
+                for trial_id, name, config in jobs
+            ]
+            for future in as_completed(futures):
+                trial = future.result()
+                trials.append(trial)
+                status = f"pruned@{trial['pruned_at_epoch']}" if trial['pruned'] else 'done'
+                print(f"  {trial['trial_id']}: {status:10s} acc={trial['test_accuracy']:.4f} "
+                      f"latency={trial['latency_ms']:.2f}ms params={trial['params']:,} "
+                      f"({trial['wall_time_s']:.1f}s)")
+
+    trials.sort(key=lambda t: t['trial_id'])
+    report = {
+        'search_wall_time_s': round(time.perf_counter() - start, 2),
+        'settings': vars(args),
+        'trials': trials,
+        'best': {},
+        'pareto': {},
+    }
+    print("\nBest configuration per model:")
+    for name in args.models:
+        model_trials = [t for t in trials if t['model'] == name]
+        best = select_best(model_trials, args.max_latency_ms, args.max_params)
+        report['best'][name] = best
+        report['pareto'][name] = [t['trial_id'] for t in pareto_front(model_trials)]
+        if best is None:
+            print(f"  {name}: no completed trial within the latency/size budget")
+        else:
+            print(f"  {name}: {best['trial_id']} acc={best['test_accuracy']:.4f} "
+                  f"latency={best['latency_ms']:.2f}ms hidden={best['config']['hidden']} "
+                  f"batch_size={best['config']['batch_size']} "
+                  f"lr={best['config']['learning_rate']:.5f}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Search results saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
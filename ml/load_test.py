@@ -0,0 +1,316 @@
+"""
+Load generator for ml_api.py, to find its saturation point and compare serving modes.
+
+Sends a realistic mix of /predict requests to a running server. Neighbourhoods, event
+subtypes and times are sampled from the cleaned training data (--data), or uniformly
+from the vocabularies in encodings_reference.json when no data file is given.
+
+Two modes, each run once per entry in --levels to trace a latency-vs-load curve:
+    closed: N concurrent clients, each sending its next request as soon as the
+            previous one returns (levels are concurrencies)
+    open:   requests arrive at a fixed average rate (Poisson), however fast the server
+            answers (levels are requests/sec). Latency is counted from the scheduled
+            arrival, so queueing behind a slow server is measured, not hidden.
+
+Results (throughput, latency percentiles, error rates, mean Server-Timing stages per
+level) are written as JSON, so runs against different serving modes can be diffed.
+
+Usage:
+    python ml/load_test.py --mode closed --levels 1,2,4,8,16 --duration 10
+    python ml/load_test.py --mode open --levels 50,100,200,400 --data data/final_cleaned_data.csv
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from features import TIMEZONE
+
+# Next to data-wrangling's scripts, wherever this is run from (as rebuild.py's WRANGLING_DIR)
+ENCODINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'data', 'data-wrangling', 'encodings_reference.json')
+OUTPUT_PATH = 'load_test_report.json'
+POOL_SIZE = 5000
+WARMUP_REQUESTS = 50
+
+# Traffic classes: endpoint and the request fields it sends
+CASES = {
+    'subtype': ('/predict', ('datetime', 'neighbourhood')),
+    'location': ('/predict', ('datetime', 'event_subtype')),
+    'hour': ('/predict', ('neighbourhood', 'event_subtype')),
+    'all': ('/predict/all', ('datetime', 'neighbourhood')),
+}
+DEFAULT_MIX = 'subtype=1,location=1,hour=1'
+
+
+def parse_mix(spec):
+    """'subtype=2,hour=1' → {'subtype': 2/3, 'hour': 1/3}"""
+    weights = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in CASES:
+            raise ValueError(f"Unknown traffic class '{name}', expected one of {list(CASES)}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def load_population(data_path, encodings, size, rng):
+    """(neighbourhood ids, subtype labels, Unix timestamps) to draw request fields from"""
+    subtype_labels = {int(k): v for k, v in encodings['EVENT_SUBTYPE'].items()}
+    if data_path:
+        df = pd.read_csv(data_path, usecols=['NEIGHBOURHOOD_CLEAN_encoded', 'EVENT_SUBTYPE_encoded',
+                                             'year', 'month', 'day', 'hour'])
+        df = df.sample(n=min(size, len(df)), random_state=int(rng.integers(2**31)))
+        # Cleaned times are Toronto wall-clock; /predict takes Unix seconds
+        local = pd.to_datetime(df[['year', 'month', 'day', 'hour']])
+        local = local.dt.tz_localize(TIMEZONE, ambiguous='NaT', nonexistent='shift_forward')
+        keep = local.notna().to_numpy()
+        return (df['NEIGHBOURHOOD_CLEAN_encoded'].to_numpy()[keep],
+                df['EVENT_SUBTYPE_encoded'].map(subtype_labels).to_numpy()[keep],
+                (local[keep].astype('int64') // 10**9).to_numpy())
+
+    now = int(time.time())
+    return (rng.integers(0, len(encodings['NEIGHBOURHOOD_CLEAN']), size),
+            rng.choice(list(subtype_labels.values()), size),
+            now - rng.integers(0, 365 * 24 * 3600, size))
+
+
+def build_requests(population, mix, size, rng):
+    """Pre-encoded (case, path, body) requests, so request generation never slows the client"""
+    neighbourhoods, subtypes, timestamps = population
+    cases = rng.choice(list(mix), size, p=list(mix.values()))
+    rows = rng.integers(0, len(neighbourhoods), size)
+    requests = []
+    for case, row in zip(cases, rows):
+        path, fields = CASES[case]
+        values = {'datetime': int(timestamps[row]), 'neighbourhood': int(neighbourhoods[row]),
+                  'event_subtype': str(subtypes[row])}
+        requests.append((case, path, json.dumps({field: values[field] for field in fields}).encode()))
+    return requests
+
+
+class Client:
+    """One keep-alive connection; reconnects after errors or when the server closes it"""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.conn = None
+
+    def post(self, path, body):
+        """(status, Server-Timing header); status is an exception name on failure"""
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = self.conn.getresponse()
+            response.read()
+            if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                self.conn.close()
+                self.conn = None
+            return response.status, response.getheader('Server-Timing')
+        except (OSError, http.client.HTTPException) as e:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            return type(e).__name__, None
+
+
+def run_closed(url, requests, concurrency, duration, timeout):
+    """`concurrency` clients sending back-to-back for `duration` seconds"""
+    start = time.perf_counter()
+    stop = start + duration
+
+    def client_loop(index):
+        client, results, k = Client(url, timeout), [], index
+        while time.perf_counter() < stop:
+            case, path, body = requests[k % len(requests)]
+            k += concurrency
+            sent = time.perf_counter()
+            status, timing = client.post(path, body)
+            results.append((case, time.perf_counter() - sent, status, timing))
+        return results
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = [r for batch in pool.map(client_loop, range(concurrency)) for r in batch]
+    return results, time.perf_counter() - start
+
+
+def run_open(url, requests, rate, duration, max_inflight, timeout, rng):
+    """Poisson arrivals at `rate` req/s for `duration` seconds, served by up to max_inflight clients"""
+    gaps = rng.exponential(1.0 / rate, int(rate * duration * 1.5) + 10)
+    arrivals = np.cumsum(gaps)
+    arrivals = arrivals[arrivals < duration]
+
+    pending = queue.Queue()
+    results, lock = [], threading.Lock()
+
+    def client_loop():
+        client = Client(url, timeout)
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            scheduled, (case, path, body) = item
+            status, timing = client.post(path, body)
+            with lock:
+                results.append((case, time.perf_counter() - scheduled, status, timing))
+
+    workers = [threading.Thread(target=client_loop, daemon=True) for _ in range(max_inflight)]
+    for worker in workers:
+        worker.start()
+
+    start = time.perf_counter()
+    for i, offset in enumerate(arrivals):
+        scheduled = start + offset
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((scheduled, requests[i % len(requests)]))
+    for _ in workers:
+        pending.put(None)
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - start
+
+
+def parse_server_timing(header):
+    """{stage: ms} from a Server-Timing header"""
+    stages = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        if params.startswith('dur='):
+            stages[name] = float(params[4:])
+    return stages
+
+
+def percentiles(latencies_ms):
+    if len(latencies_ms) == 0:
+        return None
+    p50, p90, p95, p99 = np.percentile(latencies_ms, [50, 90, 95, 99])
+    return {'p50': round(p50, 2), 'p90': round(p90, 2), 'p95': round(p95, 2), 'p99': round(p99, 2),
+            'max': round(float(latencies_ms.max()), 2), 'mean': round(float(latencies_ms.mean()), 2)}
+
+
+def summarize(level, results, elapsed):
+    """Throughput, latency percentiles, errors and mean server-side stages for one load level"""
+    cases = np.array([r[0] for r in results])
+    latencies = np.array([r[1] for r in results]) * 1000
+    statuses = [r[2] for r in results]
+    ok = np.array([status == 200 for status in statuses], dtype=bool)
+
+    errors = {}
+    for status in statuses:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    stage_totals = {}
+    for _, _, status, timing in results:
+        for stage, ms in parse_server_timing(timing).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    timed = sum(1 for r in results if r[3])
+
+    return {
+        'level': level,
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(ok.sum() / elapsed, 2),
+        'error_rate': round(1 - ok.mean(), 4) if len(results) else 0.0,
+        'errors': errors,
+        'latency_ms': percentiles(latencies[ok]),
+        'by_case': {case: {'requests': int((cases == case).sum()),
+                           'latency_ms': percentiles(latencies[ok & (cases == case)])}
+                    for case in sorted(set(cases))},
+        'server_timing_ms': {stage: round(total / timed, 3) for stage, total in stage_totals.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test a running ml_api.py server')
+    parser.add_argument('--url', default='http://localhost:5006')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--levels', default=None,
+                        help='Comma-separated concurrencies (closed) or req/s (open); '
+                             'defaults 1,2,4,8,16 / 25,50,100,200')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Traffic classes and weights, from {list(CASES)}')
+    parser.add_argument('--data', default=None, help='Cleaned training CSV to sample requests from')
+    parser.add_argument('--encodings', default=ENCODINGS_PATH)
+    parser.add_argument('--max-inflight', type=int, default=64, help='Client threads in open mode')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--slo-p99-ms', type=float, default=100.0,
+                        help='Report the highest level whose p99 and error rate stay within this')
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    default_levels = '1,2,4,8,16' if args.mode == 'closed' else '25,50,100,200'
+    levels = [float(v) if args.mode == 'open' else int(v) for v in (args.levels or default_levels).split(',')]
+    mix = parse_mix(args.mix)
+
+    with open(args.encodings) as f:
+        encodings = json.load(f)
+    population = load_population(args.data, encodings, POOL_SIZE, rng)
+    requests = build_requests(population, mix, POOL_SIZE, rng)
+    print(f"Load test: {args.mode} loop against {args.url}, levels {levels}, {args.duration:g}s each")
+    print(f"Traffic mix: {', '.join(f'{name} {share:.0%}' for name, share in mix.items())} "
+          f"(sampled from {args.data or args.encodings})")
+
+    # Warm up connections and the server's traced graphs before measuring
+    warmup = Client(args.url, args.timeout)
+    statuses = [warmup.post(path, body)[0] for _, path, body in requests[:WARMUP_REQUESTS]]
+    if not any(status == 200 for status in statuses):
+        raise SystemExit(f"✗ No successful warm-up request against {args.url}: {sorted(set(map(str, statuses)))}")
+
+    unit = 'clients' if args.mode == 'closed' else 'req/s'
+    curve = []
+    for level in levels:
+        if args.mode == 'closed':
+            results, elapsed = run_closed(args.url, requests, level, args.duration, args.timeout)
+        else:
+            results, elapsed = run_open(args.url, requests, level, args.duration,
+                                        args.max_inflight, args.timeout, rng)
+        summary = summarize(level, results, elapsed)
+        curve.append(summary)
+        latency = summary['latency_ms'] or {'p50': float('nan'), 'p99': float('nan')}
+        print(f"  {level:>7g} {unit:<7} | {summary['throughput_rps']:8.1f} req/s | "
+              f"p50 {latency['p50']:7.2f} ms | p99 {latency['p99']:7.2f} ms | "
+              f"errors {summary['error_rate']:.1%}")
+
+    within_slo = [s['level'] for s in curve if s['latency_ms'] and s['error_rate'] < 0.01
+                  and s['latency_ms']['p99'] <= args.slo_p99_ms]
+    peak = max(curve, key=lambda s: s['throughput_rps'])
+    report = {
+        'url': args.url,
+        'mode': args.mode,
+        'level_unit': unit,
+        'duration_s': args.duration,
+        'mix': mix,
+        'source': args.data or args.encodings,
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'peak_throughput_rps': peak['throughput_rps'],
+        'peak_level': peak['level'],
+        'slo_p99_ms': args.slo_p99_ms,
+        'max_level_within_slo': max(within_slo) if within_slo else None,
+        'curve': curve,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n✓ Peak throughput {peak['throughput_rps']:.1f} req/s at {peak['level']:g} {unit}")
+    print(f"✓ Report saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,76 +1,427 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, g, jsonify as flask_jsonify
 import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 import pickle
+import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from zoneinfo import ZoneInfo
+from functools import lru_cache
+import pandas as pd
 import warnings
 from flask_cors import CORS
+from drift import DriftMonitor
+from features import FeatureBuilder, TIMEZONE
+from geogrid import GeoGrid
+from tracing import (TraceWriter, format_traceparent, new_span_id, new_trace_id,
+                     parse_traceparent, request_events, server_timing)
 warnings.filterwarnings('ignore')
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Server-Timing', 'traceparent', 'X-Trace-Id', 'X-Request-ID'])
+
+# Spans of every request, in Chrome Trace Event format (open in Perfetto); off unless
+# ML_TRACE_FILE names a file, e.g. ml_api_trace.json
+trace_writer = TraceWriter(os.environ.get('ML_TRACE_FILE', ''))
+
 
 @app.before_request
-def log_request():
-    print(f"Incoming request: {request.method} {request.path}")
-    print(f"Headers: {dict(request.headers)}")
-    print(f"Data: {request.get_data()}")
+def start_trace():
+    """Continue the caller's W3C trace (traceparent header) or start a new one"""
+    g.trace_id, g.parent_span_id = parse_traceparent(request.headers.get('traceparent'))
+    g.trace_id = g.trace_id or new_trace_id()
+    g.span_id = new_span_id()
+    g.wall_start = time.time()
+    g.start = time.perf_counter()
+    g.stages = []
+
+
+@contextmanager
+def stage(name):
+    """Time a step of the request; reported in Server-Timing and the trace file"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if 'stages' in g:
+            g.stages.append((name, start - g.start, time.perf_counter() - start))
+
+
+def jsonify(*args, **kwargs):
+    with stage('serialize'):
+        return flask_jsonify(*args, **kwargs)
+
+
+@app.after_request
+def finish_trace(response):
+    if 'stages' not in g:
+        return response
+    total = time.perf_counter() - g.start
+    response.headers['Server-Timing'] = server_timing(
+        [(name, duration) for name, _, duration in g.stages] + [('total', total)])
+    response.headers['Timing-Allow-Origin'] = '*'
+    response.headers['traceparent'] = format_traceparent(g.trace_id, g.span_id)
+    response.headers['X-Trace-Id'] = g.trace_id
+    request_id = request.headers.get('X-Request-ID')
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    trace_writer.record(request_events(
+        g.trace_id, g.span_id, g.parent_span_id, f'{request.method} {request.path}', g.wall_start,
+        g.stages, total, threading.get_native_id(),
+        args={'status': response.status_code, 'request_id': request_id}))
+    return response
+
+
+# Directory holding the trained models, scalers and metadata (default: working directory)
+MODEL_DIR = os.environ.get('ML_MODEL_DIR', '.')
 
-print("Loading models and metadata...")
+
+def artifact(filename):
+    return os.path.join(MODEL_DIR, filename)
+
+
+print(f"Loading models and metadata from {os.path.abspath(MODEL_DIR)}...")
 
 # Load models
-model1 = keras.models.load_model('model_datetime_location_to_subtype.keras')
-model2 = keras.models.load_model('model_datetime_subtype_to_location.keras')
-model3 = keras.models.load_model('model_location_subtype_to_datetime.keras')
+model1 = keras.models.load_model(artifact('model_datetime_location_to_subtype.keras'))
+model2 = keras.models.load_model(artifact('model_datetime_subtype_to_location.keras'))
+model3 = keras.models.load_model(artifact('model_location_subtype_to_datetime.keras'))
 
 # Load scalers
-with open('scaler_datetime_location_to_subtype.pkl', 'rb') as f:
+with open(artifact('scaler_datetime_location_to_subtype.pkl'), 'rb') as f:
     scaler1 = pickle.load(f)
-with open('scaler_datetime_subtype_to_location.pkl', 'rb') as f:
+with open(artifact('scaler_datetime_subtype_to_location.pkl'), 'rb') as f:
     scaler2 = pickle.load(f)
-with open('scaler_location_subtype_to_datetime.pkl', 'rb') as f:
+with open(artifact('scaler_location_subtype_to_datetime.pkl'), 'rb') as f:
     scaler3 = pickle.load(f)
 
 # Load metadata
-with open('inverse_models_metadata.pkl', 'rb') as f:
+with open(artifact('inverse_models_metadata.pkl'), 'rb') as f:
     metadata = pickle.load(f)
 
 subtype_labels = metadata['subtype_labels']
 subtype_to_int = metadata['subtype_to_int']
-neighbourhood_coords = metadata['neighbourhood_coords']  # ADD THIS LINE
+neighbourhood_coords = metadata['neighbourhood_coords']
 
-subtype_labels = metadata['subtype_labels']
-subtype_to_int = metadata['subtype_to_int']
+# Feature vectors are built exactly as in training; location fields the request omits
+# come from the neighbourhood's training coordinates, falling back to the data mean (0).
+# Zones are computed from those coordinates on the fixed grid (geogrid.py) when the
+# bundle records it; the zero zone defaults only apply to older bundles
+geo_grid = GeoGrid.from_metadata(metadata)
+LOCATION_FIELDS = ('lat', 'lon', 'lat_zone', 'lon_zone')
+LOCATION_DEFAULTS = {'LAT_R': 0.0, 'LON_R': 0.0, 'lat_zone': 0, 'lon_zone': 0}
+builder1 = FeatureBuilder.from_metadata(metadata, 'model1', defaults=LOCATION_DEFAULTS)
+builder2 = FeatureBuilder.from_metadata(metadata, 'model2', defaults=LOCATION_DEFAULTS)
+builder3 = FeatureBuilder.from_metadata(metadata, 'model3', defaults=LOCATION_DEFAULTS)
+
+# Base models from boom.py (binary / multiclass / regression), served by /predict/all
+binary_model = keras.models.load_model(artifact('binary_classification_model.keras'))
+multiclass_model = keras.models.load_model(artifact('multiclass_classification_model.keras'))
+regression_model = keras.models.load_model(artifact('regression_model.keras'))
+base_scalers = {}
+for name in ('binary', 'multiclass', 'regression'):
+    with open(artifact(f'scaler_{name}.pkl'), 'rb') as f:
+        base_scalers[name] = pickle.load(f)
+with open(artifact('feature_columns.pkl'), 'rb') as f:
+    base_feature_columns = pickle.load(f)
+
+# One feature vector serves all three: the 19 binary/multiclass columns already
+# contain every regression column, which is gathered out of it inside the graph
+base_columns = list(dict.fromkeys(
+    col for name in ('binary', 'multiclass', 'regression') for col in base_feature_columns[name]
+))
+base_builder = FeatureBuilder(
+    base_columns,
+    neighbourhood_stats=base_feature_columns.get('neighbourhood_stats'),
+    defaults={**LOCATION_DEFAULTS, 'neighbourhood_incident_count': 0, 'events_this_hour': 0},
+    # Requests shared with /predict may carry an event_subtype label; the base models ignore it
+    subtype_to_int=subtype_to_int,
+    grid=geo_grid,
+)
+
+
+# Monte-Carlo dropout: with uncertainty=true each input is tiled into one batch of
+# `samples` rows and run once with dropout active, instead of `samples` separate calls
+MC_SAMPLES = 30
+MAX_MC_SAMPLES = 200
+
+
+def mc_forward(model, x):
+    """Forward pass with only the Dropout layers in training mode (BatchNorm keeps its moving stats)"""
+    for layer in model.layers:
+        x = layer(x, training=isinstance(layer, keras.layers.Dropout))
+    return x
+
+
+def mc_function(model):
+    return tf.function(lambda x: mc_forward(model, x),
+                       input_signature=[tf.TensorSpec([None, model.input_shape[-1]], tf.float32)])
+
+
+def infer_function(model):
+    """
+    Compiled inference pass. Calling a Keras model eagerly re-dispatches every layer in
+    Python and leaves a few objects behind per call; the traced graph does neither.
+    """
+    return tf.function(lambda x: model(x, training=False),
+                       input_signature=[tf.TensorSpec([None, model.input_shape[-1]], tf.float32)])
+
+
+inverse = {'model1': infer_function(model1), 'model2': infer_function(model2), 'model3': infer_function(model3)}
+mc_inverse = {'model1': mc_function(model1), 'model2': mc_function(model2), 'model3': mc_function(model3)}
+
+
+def fuse_base_models(mc=False):
+    """
+    Fold each model's StandardScaler and column selection into a single tf.function,
+    so /predict/all runs the three forward passes as one graph call.
+    With mc=True dropout stays active (see mc_forward).
+    """
+    heads = []
+    for name, model in (('binary', binary_model), ('multiclass', multiclass_model),
+                        ('regression', regression_model)):
+        scaler = base_scalers[name]
+        heads.append((
+            model,
+            tf.constant([base_columns.index(col) for col in base_feature_columns[name]]),
+            tf.constant(scaler.mean_, dtype=tf.float32),
+            tf.constant(scaler.scale_, dtype=tf.float32),
+        ))
+
+    @tf.function(input_signature=[tf.TensorSpec([None, len(base_columns)], tf.float32)])
+    def predict_all(x):
+        outputs = []
+        for model, columns, mean, scale in heads:
+            z = (tf.gather(x, columns, axis=1) - mean) / scale
+            outputs.append(mc_forward(model, z) if mc else model(z, training=False))
+        return outputs
+
+    return predict_all
+
+
+# Daily count forecasts only need the regression model
+regression_builder = FeatureBuilder(
+    base_feature_columns['regression'],
+    neighbourhood_stats=base_feature_columns.get('neighbourhood_stats'),
+    defaults={**LOCATION_DEFAULTS, 'neighbourhood_incident_count': 0},
+    grid=geo_grid,
+)
+forecast_neighbourhoods = sorted(base_feature_columns.get('neighbourhood_stats') or neighbourhood_coords)
+MAX_FORECAST_DAYS = 90
+
+# Live feature histograms vs. training, updated off the request path; see /drift
+drift_monitor = DriftMonitor({**base_feature_columns.get('feature_reference', {}),
+                              **metadata.get('feature_reference', {})})
+
+predict_base = fuse_base_models()
+predict_base_mc = fuse_base_models(mc=True)
+predict_base(np.zeros((1, len(base_columns)), dtype=np.float32))  # trace once at startup
+for name, model in (('model1', model1), ('model2', model2), ('model3', model3)):
+    inverse[name](np.zeros((1, model.input_shape[-1]), dtype=np.float32))
 
 print("✓ Models loaded successfully!")
 
-def unix_to_datetime_features(unix_timestamp):
-    """Convert Unix timestamp to datetime features"""
-    dt = datetime.fromtimestamp(unix_timestamp)
-    
-    year = dt.year
-    month = dt.month
-    day = dt.day
-    hour = dt.hour
-    day_of_week = dt.weekday()
-    is_weekend = 1 if day_of_week >= 5 else 0
-    is_night = 1 if hour < 6 or hour >= 22 else 0
-    quarter = (month - 1) // 3 + 1
-    
-    if month in [12, 1, 2]:
-        season = 0
-    elif month in [3, 4, 5]:
-        season = 1
-    elif month in [6, 7, 8]:
-        season = 2
+def readable_datetime(timestamp):
+    """A request's Unix timestamp in Toronto wall-clock time, as the features see it"""
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+        raise ValueError('datetime must be a Unix timestamp in seconds')
+    try:
+        return datetime.fromtimestamp(timestamp, ZoneInfo(TIMEZONE)).strftime('%Y-%m-%d %H:%M:%S')
+    except (ValueError, OverflowError, OSError):
+        raise ValueError(f'datetime out of range: {timestamp}') from None
+
+def request_inputs(data, *fields):
+    """The given request fields plus any location overrides the caller sent"""
+    return {key: data[key] for key in fields + LOCATION_FIELDS if key in data}
+
+def mc_sample_count(data):
+    """Number of MC-dropout samples requested (JSON or query string), or None"""
+    flag = data.get('uncertainty', request.args.get('uncertainty', False))
+    if str(flag).lower() not in ('true', '1', 'yes'):
+        return None
+    try:
+        samples = int(data.get('samples', request.args.get('samples', MC_SAMPLES)))
+    except (TypeError, ValueError):
+        raise ValueError('samples must be an integer') from None
+    return min(max(samples, 2), MAX_MC_SAMPLES)
+
+
+def summarize_samples(samples):
+    """Mean / stddev / entropy per class of (samples × classes) MC-dropout probabilities"""
+    mean = samples.mean(axis=0)
+    class_entropy = -mean * np.log(np.clip(mean, 1e-12, 1.0))
+    expected_entropy = float((-samples * np.log(np.clip(samples, 1e-12, 1.0))).sum(axis=1).mean())
+    predictive_entropy = float(class_entropy.sum())
+    return {
+        'samples': len(samples),
+        'mean': mean,
+        'std': samples.std(axis=0),
+        'entropy': class_entropy,
+        'predictive_entropy': round(predictive_entropy, 4),
+        # Epistemic part of the uncertainty (BALD): disagreement between the dropout samples
+        'mutual_information': round(max(0.0, predictive_entropy - expected_entropy), 4),
+    }
+
+
+def uncertainty_block(summary):
+    """JSON-ready MC-dropout summary with the per-class arrays"""
+    return {
+        'samples': summary['samples'],
+        'mean': [round(float(v), 4) for v in summary['mean']],
+        'std': [round(float(v), 4) for v in summary['std']],
+        'entropy': [round(float(v), 4) for v in summary['entropy']],
+        'predictive_entropy': summary['predictive_entropy'],
+        'mutual_information': summary['mutual_information'],
+    }
+
+
+def run_inverse(name, features_scaled, data):
+    """Class probabilities for one request, plus the MC-dropout summary when requested"""
+    samples = mc_sample_count(data)
+    if samples is None:
+        # Graph call: model.predict builds a tf.data pipeline per request (~100 ms)
+        with stage('infer'):
+            return inverse[name](features_scaled.astype(np.float32)).numpy()[0], None
+    tiled = np.repeat(features_scaled.astype(np.float32), samples, axis=0)
+    with stage('infer'):
+        samples_out = mc_inverse[name](tiled).numpy()
+    summary = summarize_samples(samples_out)
+    return summary['mean'], summary
+
+
+def add_uncertainty(output, entries, indices, summary):
+    """Attach per-prediction stddev and the summary block to an inverse-model response"""
+    if summary is None:
+        return output
+    for entry, idx in zip(entries, indices):
+        entry['std'] = round(float(summary['std'][idx]), 4)
+    output['uncertainty'] = uncertainty_block(summary)
+    return output
+
+
+def base_predictions(data):
+    """Binary, multiclass and regression outputs for one request, from a single graph call"""
+    with stage('features'):
+        features = base_builder.build({key: value for key, value in data.items()
+                                       if value is not None and key not in ('uncertainty', 'samples')})
+        drift_monitor.observe(base_builder.columns, features)
+    samples = mc_sample_count(data)
+    # Scaling is folded into the fused graph, so it is part of 'infer' here
+    if samples is None:
+        with stage('infer'):
+            binary_prob, multiclass_probs, regression_out = (out.numpy()[0] for out in predict_base(features))
     else:
-        season = 3
-    
+        with stage('infer'):
+            binary_samples, multiclass_samples, regression_samples = (
+                out.numpy() for out in predict_base_mc(np.repeat(features, samples, axis=0)))
+        binary_summary = summarize_samples(np.hstack([1 - binary_samples, binary_samples]))
+        multiclass_summary = summarize_samples(multiclass_samples)
+        regression_samples = np.maximum(regression_samples[:, 0], 0)
+        binary_prob = binary_summary['mean'][1:]
+        multiclass_probs = multiclass_summary['mean']
+        regression_out = [regression_samples.mean()]
+
+    probability = float(binary_prob[0])
+    top_3_indices = np.argsort(multiclass_probs)[-3:][::-1]
+    count = max(0.0, float(regression_out[0]))
+
+    if probability >= 0.66:
+        risk_level, recommendation = 'high', 'High risk. Avoid the area if possible or stay in well-lit, busy places.'
+    elif probability >= 0.33:
+        risk_level, recommendation = 'medium', 'Moderate risk. Stay aware of surroundings.'
+    else:
+        risk_level, recommendation = 'low', 'Low risk. Normal precautions apply.'
+
+    result = {
+        'binary_classification': {
+            'prediction': 'event_will_occur' if probability > 0.5 else 'no_event_expected',
+            'probability': round(probability, 4),
+            'confidence': round(max(probability, 1 - probability), 4),
+        },
+        'multiclass_classification': {
+            'most_likely_event': subtype_labels[int(top_3_indices[0])],
+            'top_3_predictions': [
+                {'event_type': subtype_labels[int(idx)], 'probability': round(float(multiclass_probs[idx]), 4)}
+                for idx in top_3_indices
+            ],
+        },
+        'regression': {
+            'predicted_daily_events': round(count, 2),
+            'rounded_count': int(round(count)),
+        },
+        'overall_assessment': {
+            'risk_level': risk_level,
+            'risk_score': round(probability, 4),
+            'recommendation': recommendation,
+        },
+    }
+    if samples is not None:
+        result['binary_classification']['uncertainty'] = {
+            'samples': samples,
+            'std': round(float(binary_summary['std'][1]), 4),
+            'predictive_entropy': binary_summary['predictive_entropy'],
+            'mutual_information': binary_summary['mutual_information'],
+        }
+        result['multiclass_classification']['uncertainty'] = uncertainty_block(multiclass_summary)
+        result['regression']['uncertainty'] = {
+            'samples': samples,
+            'std': round(float(regression_samples.std()), 2),
+            'interval_90': [round(float(q), 2) for q in np.percentile(regression_samples, [5, 95])],
+        }
+    return result
+
+
+def base_endpoint(*sections):
+    """Run the fused base models for the request and return the given response sections"""
+    with stage('parse'):
+        data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+    try:
+        result = base_predictions(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **{section: result[section] for section in sections}})
+
+@lru_cache(maxsize=32)
+def cached_forecast(start, days):
+    """
+    Predicted daily event counts for every neighbourhood × day, as one batch.
+    Keyed on the start date, so each day's forecasts are computed once; the result is
+    immutable because every caller shares it.
+    """
+    dates = pd.date_range(start, periods=days, freq='D')
+    inputs = {
+        'neighbourhood': np.repeat(forecast_neighbourhoods, days),
+        'datetime': np.tile(dates.values, len(forecast_neighbourhoods)),
+    }
+    with stage('features'):
+        features = regression_builder.build(inputs)
+    with stage('scale'):
+        features = base_scalers['regression'].transform(features).astype(np.float32)
+    with stage('infer'):
+        counts = np.maximum(regression_model(features, training=False).numpy()[:, 0], 0)
+    counts = np.round(counts.reshape(len(forecast_neighbourhoods), days).astype(float), 2)
+    return (tuple(int(n) for n in forecast_neighbourhoods), tuple(d.strftime('%Y-%m-%d') for d in dates),
+            tuple(map(tuple, counts.tolist())))
+
+
+def forecast_counts(start, days):
+    """The forecast as a response dict of the caller's own"""
+    computed = len(g.stages) if 'stages' in g else None
+    lookup = time.perf_counter()
+    neighbourhoods, dates, counts = cached_forecast(start, days)
+    # A cache hit runs none of the features/scale/infer stages; report the lookup instead
+    if computed is not None and len(g.stages) == computed:
+        g.stages.append(('cache', lookup - g.start, time.perf_counter() - lookup))
     return {
-        'year': year, 'month': month, 'day': day, 'hour': hour,
-        'day_of_week': day_of_week, 'is_weekend': is_weekend,
-        'is_night': is_night, 'quarter': quarter, 'season_encoded': season
+        'neighbourhoods': list(neighbourhoods),
+        'dates': list(dates),
+        # rows follow 'neighbourhoods', columns follow 'dates'
+        'counts': [list(row) for row in counts],
     }
 
 @app.route('/', methods=['GET'])
@@ -95,7 +446,8 @@ def predict():
         return jsonify({'status': 'ok'}), 200
     
     try:
-        data = request.get_json()
+        with stage('parse'):
+            data = request.get_json(silent=True)
         
         if not data:
             return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
@@ -112,25 +464,19 @@ def predict():
                 'error': 'Must provide exactly 2 of 3 fields: datetime, neighbourhood, event_subtype'
             }), 400
         
+        if has_datetime:
+            datetime_readable = readable_datetime(data['datetime'])
+
         # CASE 1: datetime + neighbourhood → event_subtype
         if has_datetime and has_neighbourhood:
-            dt_features = unix_to_datetime_features(data['datetime'])
             neighbourhood = data['neighbourhood']
             
-            lat = data.get('lat', 0.0)
-            lon = data.get('lon', 0.0)
-            lat_zone = data.get('lat_zone', 0)
-            lon_zone = data.get('lon_zone', 0)
-            
-            features = np.array([[
-                dt_features['year'], dt_features['month'], dt_features['day'],
-                dt_features['hour'], dt_features['day_of_week'], dt_features['is_weekend'],
-                dt_features['is_night'], dt_features['quarter'], dt_features['season_encoded'],
-                neighbourhood, lat, lon, lat_zone, lon_zone
-            ]])
-            
-            features_scaled = scaler1.transform(features)
-            probabilities = model1.predict(features_scaled, verbose=0)[0]
+            with stage('features'):
+                features = builder1.build(request_inputs(data, 'datetime', 'neighbourhood'))
+                drift_monitor.observe(builder1.columns, features)
+            with stage('scale'):
+                features_scaled = scaler1.transform(features)
+            probabilities, uncertainty = run_inverse('model1', features_scaled, data)
             
             top_5_indices = np.argsort(probabilities)[-5:][::-1]
             top_5 = [
@@ -145,19 +491,18 @@ def predict():
                 'prediction_type': 'event_subtype',
                 'input': {
                     'datetime': data['datetime'],
-                    'datetime_readable': datetime.fromtimestamp(data['datetime']).strftime('%Y-%m-%d %H:%M:%S'),
+                    'datetime_readable': datetime_readable,
                     'neighbourhood': neighbourhood
                 },
-                'output': {
+                'output': add_uncertainty({
                     'most_likely_event': top_5[0]['event_type'],
                     'confidence': top_5[0]['probability'],
                     'top_5_predictions': top_5
-                }
+                }, top_5, top_5_indices, uncertainty)
             })
         
         # CASE 2: datetime + event_subtype → location (top 20 lat/lon pairs)
         elif has_datetime and has_event_subtype:
-            dt_features = unix_to_datetime_features(data['datetime'])
             event_subtype_str = data['event_subtype']
             
             if event_subtype_str not in subtype_to_int:
@@ -166,17 +511,12 @@ def predict():
                     'error': f'Invalid event_subtype. Must be one of: {list(subtype_to_int.keys())}'
                 }), 400
             
-            event_subtype_encoded = subtype_to_int[event_subtype_str]
-            
-            features = np.array([[
-                dt_features['year'], dt_features['month'], dt_features['day'],
-                dt_features['hour'], dt_features['day_of_week'], dt_features['is_weekend'],
-                dt_features['is_night'], dt_features['quarter'], dt_features['season_encoded'],
-                event_subtype_encoded
-            ]])
-            
-            features_scaled = scaler2.transform(features)
-            probabilities = model2.predict(features_scaled, verbose=0)[0]
+            with stage('features'):
+                features = builder2.build(request_inputs(data, 'datetime', 'event_subtype'))
+                drift_monitor.observe(builder2.columns, features)
+            with stage('scale'):
+                features_scaled = scaler2.transform(features)
+            probabilities, uncertainty = run_inverse('model2', features_scaled, data)
             
             # Get top 20 neighbourhoods
             top_20_indices = np.argsort(probabilities)[-20:][::-1]
@@ -200,10 +540,10 @@ def predict():
                 'prediction_type': 'location',
                 'input': {
                     'datetime': data['datetime'],
-                    'datetime_readable': datetime.fromtimestamp(data['datetime']).strftime('%Y-%m-%d %H:%M:%S'),
+                    'datetime_readable': datetime_readable,
                     'event_subtype': event_subtype_str
                 },
-                'output': {
+                'output': add_uncertainty({
                     'most_likely_location': {
                         'latitude': top_20_locations[0]['latitude'],
                         'longitude': top_20_locations[0]['longitude'],
@@ -212,7 +552,7 @@ def predict():
                         'confidence': top_20_locations[0]['probability']
                     },
                     'top_20_locations': top_20_locations
-                }
+                }, top_20_locations, top_20_indices, uncertainty)
             })
         
         # CASE 3: neighbourhood + event_subtype → datetime (hour)
@@ -226,19 +566,12 @@ def predict():
                     'error': f'Invalid event_subtype. Must be one of: {list(subtype_to_int.keys())}'
                 }), 400
             
-            event_subtype_encoded = subtype_to_int[event_subtype_str]
-            
-            lat = data.get('lat', 0.0)
-            lon = data.get('lon', 0.0)
-            lat_zone = data.get('lat_zone', 0)
-            lon_zone = data.get('lon_zone', 0)
-            
-            features = np.array([[
-                neighbourhood, lat, lon, lat_zone, lon_zone, event_subtype_encoded
-            ]])
-            
-            features_scaled = scaler3.transform(features)
-            probabilities = model3.predict(features_scaled, verbose=0)[0]
+            with stage('features'):
+                features = builder3.build(request_inputs(data, 'neighbourhood', 'event_subtype'))
+                drift_monitor.observe(builder3.columns, features)
+            with stage('scale'):
+                features_scaled = scaler3.transform(features)
+            probabilities, uncertainty = run_inverse('model3', features_scaled, data)
             
             top_5_indices = np.argsort(probabilities)[-5:][::-1]
             top_5 = [
@@ -256,23 +589,68 @@ def predict():
                     'neighbourhood': neighbourhood,
                     'event_subtype': event_subtype_str
                 },
-                'output': {
+                'output': add_uncertainty({
                     'most_likely_hour': top_5[0]['hour'],
                     'most_likely_time_range': top_5[0]['time_range'],
                     'confidence': top_5[0]['probability'],
                     'top_5_hours': top_5
-                }
+                }, top_5, top_5_indices, uncertainty)
             })
         
         else:
             return jsonify({'success': False, 'error': 'Invalid combination'}), 400
     
+    except ValueError as e:
+        # Invalid request values (readable_datetime, FeatureBuilder, mc_sample_count)
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         import traceback
         print("ERROR:", str(e))
         print(traceback.format_exc())
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/predict/all', methods=['POST'])
+def predict_all():
+    return base_endpoint('binary_classification', 'multiclass_classification', 'regression',
+                         'overall_assessment')
+
+@app.route('/predict/binary', methods=['POST'])
+def predict_binary():
+    return base_endpoint('binary_classification')
+
+@app.route('/predict/multiclass', methods=['POST'])
+def predict_multiclass():
+    return base_endpoint('multiclass_classification')
+
+@app.route('/predict/regression', methods=['POST'])
+def predict_regression():
+    return base_endpoint('regression')
+
+@app.route('/forecast/counts', methods=['GET'])
+def forecast():
+    try:
+        days = int(request.args.get('days', 30))
+        start = request.args.get('start') or pd.Timestamp.now(tz=TIMEZONE).strftime('%Y-%m-%d')
+        start = pd.Timestamp(start).strftime('%Y-%m-%d')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid days/start: {e}'}), 400
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        return jsonify({'success': False, 'error': f'days must be between 1 and {MAX_FORECAST_DAYS}'}), 400
+
+    return jsonify({'success': True, 'start': start, 'days': days, **forecast_counts(start, days)})
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    return jsonify({'success': True, **drift_monitor.report()})
+
+@app.route('/models/info', methods=['GET'])
+def models_info():
+    return jsonify({
+        'success': True,
+        'base_models': {name: base_feature_columns[name] for name in ('binary', 'multiclass', 'regression')},
+        'inverse_models': {name: metadata[f'{name}_features'] for name in ('model1', 'model2', 'model3')},
+    })
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 City Safety Inverse Prediction API")
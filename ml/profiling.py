@@ -0,0 +1,231 @@
+"""
+Lightweight phase profiler for the training scripts (--profile).
+
+Records wall time and peak RSS per phase (load, feature engineering, split, scale,
+fit, evaluate, save), samples/sec for every training epoch and, optionally, a
+TensorFlow profiler trace of the fit phases. Everything is written as one JSON
+report so runs can be compared across machines and code changes.
+
+RSS comes from /proc and the resource module where they exist (Linux, macOS), else
+from psutil when it is installed (Windows); without either, memory is reported as None.
+"""
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from tensorflow import keras
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss_mb():
+    """Resident set size of this process, or None without /proc or psutil (macOS)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, IndexError, ValueError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    return None
+
+
+def max_rss_mb():
+    """Lifetime peak RSS of this process, or None where neither resource nor psutil can tell"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes on Linux
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+    peak = getattr(psutil.Process().memory_info(), 'peak_wset', None) if psutil is not None else None
+    return None if peak is None else peak / 2**20
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+class EpochThroughput(keras.callbacks.Callback):
+    """Record training samples/sec for every epoch"""
+
+    def __init__(self, num_samples):
+        super().__init__()
+        self.num_samples = num_samples
+        self.samples_per_sec = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        self.samples_per_sec.append(round(self.num_samples / elapsed, 1))
+
+
+class Profiler:
+    """
+    Phase timer. Use either `with profiler.phase('fit', model='model1'):` or, in flat
+    scripts, `profiler.begin('fit')` which closes the previous begin() phase.
+    Phases nest: a phase opened inside another is recorded with a 'parent' tag and
+    the outer phase's wall time and peak include it.
+    A disabled profiler turns every call into a no-op.
+    """
+
+    def __init__(self, script, enabled=True, trace_dir=None, sample_interval=0.05):
+        self.script = script
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.sample_interval = sample_interval
+        self.phases = []
+        self.epochs = {}
+        self._open = []  # stack of open phases, innermost last
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+
+        if enabled and current_rss_mb() is not None:
+            # Background sampler gives a real per-phase peak; ru_maxrss can't be reset
+            threading.Thread(target=self._sample, daemon=True).start()
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            rss = current_rss_mb()
+            with self._lock:
+                for record in self._open:
+                    record['_peak'] = max(record['_peak'], rss)
+
+    def _push(self, name, tags, flat):
+        if self.trace_dir and name == 'fit':
+            import tensorflow as tf
+            tf.profiler.experimental.start(os.path.join(self.trace_dir, self.script))
+        record = {'phase': name, **tags}
+        if self._open:
+            record['parent'] = self._open[-1]['phase']
+        record.update(_start=time.perf_counter(), _peak=current_rss_mb() or 0.0, _flat=flat)
+        with self._lock:
+            self._open.append(record)
+
+    def begin(self, name, **tags):
+        """Open a phase that lasts until end() or the next begin() at the same level"""
+        if not self.enabled:
+            return
+        if self._open and self._open[-1]['_flat']:
+            self.end()
+        self._push(name, tags, flat=True)
+
+    def end(self):
+        """Close the innermost open phase"""
+        if not self.enabled or not self._open:
+            return
+        with self._lock:
+            record = self._open.pop()
+        if self.trace_dir and record['phase'] == 'fit':
+            import tensorflow as tf
+            tf.profiler.experimental.stop()
+
+        rss = current_rss_mb()
+        peak = max(record.pop('_peak'), rss) if rss is not None else max_rss_mb()
+        with self._lock:
+            # What the inner phase saw is part of every phase around it
+            for outer in self._open:
+                outer['_peak'] = max(outer['_peak'], peak or 0.0)
+        record.pop('_flat')
+        record['wall_s'] = round(time.perf_counter() - record.pop('_start'), 3)
+        record['rss_end_mb'] = _round(rss)
+        record['peak_rss_mb'] = _round(peak)
+        self.phases.append(record)
+
+    @contextlib.contextmanager
+    def phase(self, name, **tags):
+        if not self.enabled:
+            yield
+            return
+        self._push(name, tags, flat=False)
+        depth = len(self._open)
+        try:
+            yield
+        finally:
+            # Also closes begin() phases left open inside the block
+            while len(self._open) >= depth:
+                self.end()
+
+    def epoch_callbacks(self, label, num_samples):
+        """Callbacks to add to model.fit so per-epoch samples/sec land in the report"""
+        if not self.enabled:
+            return []
+        callback = EpochThroughput(num_samples)
+        self.epochs[label] = callback.samples_per_sec
+        return [callback]
+
+    def merge(self, other, **tags):
+        """Fold in phases/epochs reported by a worker process (see as_dict)"""
+        if not self.enabled or not other:
+            return
+        # Worker phases ran inside whatever phase is open here (e.g. train_parallel)
+        parent = {'parent': self._open[-1]['phase']} if self._open else {}
+        self.phases.extend({**parent, **phase, **tags} for phase in other['phases'])
+        self.epochs.update(other['epochs'])
+
+    def _end_all(self):
+        while self.enabled and self._open:
+            self.end()
+
+    def as_dict(self):
+        self._end_all()
+        return {'phases': self.phases, 'epochs': self.epochs}
+
+    def write_report(self, path='profile_report.json', **extra):
+        if not self.enabled:
+            return
+        self._end_all()
+        self._stop.set()
+
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+
+        import numpy as np
+        import tensorflow as tf
+        report = {
+            'script': self.script,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': commit,
+            'host': {
+                'platform': platform.platform(),
+                'processor': platform.processor() or platform.machine(),
+                'cpu_count': os.cpu_count(),
+                'python': platform.python_version(),
+                'tensorflow': tf.__version__,
+                'numpy': np.__version__,
+            },
+            'total_wall_s': round(time.perf_counter() - self._started, 3),
+            'max_rss_mb': _round(max_rss_mb()),
+            'phases': self.phases,
+            'epoch_samples_per_sec': self.epochs,
+            **extra,
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+        print(f"\n✓ Profile report saved to '{path}'")
+        print(f"{'phase':22s} {'wall (s)':>10s} {'peak RSS (MB)':>14s}")
+        for phase in self.phases:
+            label = ('  ' if 'parent' in phase else '') + phase['phase']
+            label += f" [{phase['model']}]" if 'model' in phase else ''
+            peak = '-' if phase['peak_rss_mb'] is None else f"{phase['peak_rss_mb']:.1f}"
+            print(f"{label:22s} {phase['wall_s']:10.2f} {peak:>14s}")
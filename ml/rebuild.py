@@ -0,0 +1,292 @@
+"""
+Rebuild the models from the raw exports, skipping the stages that are up to date.
+
+    merge (main.py) → clean (clean.py) → train_base (boom.py)
+                                       → train_inverse (train_inverse_models.py)
+
+Each stage declares its script, arguments, input files and output files. Its
+fingerprint is a SHA-256 over the script, the arguments and the content of every
+input. A stage is skipped when the fingerprint matches its last successful run and
+its outputs are still what that run wrote. Skipping looks at content, not
+timestamps: a stage that reruns but writes the same outputs does not invalidate
+the stages after it.
+
+A stage waits for the stages whose outputs it reads, and independent stages (the
+two training scripts) run at the same time. Output goes to rebuild_logs/<stage>.log,
+and the fingerprints and file hashes are kept in rebuild_state.json.
+
+    python rebuild.py --workdir ../data/data-wrangling
+    python rebuild.py --stage-args train_inverse "--epochs 5 --parallel"
+    python rebuild.py --dry-run
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+WRANGLING_DIR = os.path.join(os.path.dirname(ML_DIR), 'data', 'data-wrangling')
+
+STATE_PATH = 'rebuild_state.json'
+LOG_DIR = 'rebuild_logs'
+
+
+def _paths(directory):
+    return lambda *names: [os.path.join(directory, name) for name in names]
+
+
+def default_stages(workdir=WRANGLING_DIR):
+    """The model build; main.py reads workdir/data/*.csv and the data stages write to workdir"""
+    workdir = os.path.abspath(workdir)
+    wrangling, data, ml = (_paths(directory) for directory in (WRANGLING_DIR, workdir, ML_DIR))
+    cleaned, clean_scaler = data('cleaned_data_ml_ready.csv', 'scaler.pkl')
+
+    return {
+        'merge': {
+            'script': wrangling('main.py')[0],
+            'cwd': workdir,
+            'args': [],
+            'inputs': data('data/fire_data.csv', 'data/crime_data.csv', 'data/collision_data.csv')
+                      + wrangling('sources.py', 'dataset.py', 'dedup.py', 'neighbourhoods.py'),
+            'outputs': data('final_parquet'),
+        },
+        'clean': {
+            'script': wrangling('clean.py')[0],
+            'cwd': workdir,
+            'args': [],
+            # The vocabularies are read back, so codes stay stable across runs (vocab.py)
+            'inputs': data('final_parquet', 'vocabularies.json', 'encodings_reference.json')
+                      + wrangling('pipeline.py', 'clean_state.py', 'dataset.py', 'vocab.py', 'subtypes.py',
+                                  'neighbourhoods.py', 'zones.py', 'event_subtype_rules.json'),
+            'outputs': [cleaned, clean_scaler]
+                       + data('vocabularies.json', 'clean_state.json', 'neighbourhood_points.parquet',
+                              'encodings_reference.json', 'event_subtype_mapping.json', 'event_type_reference.csv'),
+        },
+        'train_base': {
+            'script': ml('boom.py')[0],
+            'cwd': ML_DIR,
+            'args': ['--data', cleaned],
+            'inputs': [cleaned] + ml('features.py', 'geogrid.py', 'drift.py', 'profiling.py'),
+            'outputs': ml('binary_classification_model.keras', 'multiclass_classification_model.keras',
+                          'regression_model.keras', 'scaler_binary.pkl', 'scaler_multiclass.pkl',
+                          'scaler_regression.pkl', 'feature_columns.pkl'),
+        },
+        'train_inverse': {
+            'script': ml('train_inverse_models.py')[0],
+            'cwd': ML_DIR,
+            'args': ['--data', cleaned, '--clean-scaler', clean_scaler],
+            'inputs': [cleaned, clean_scaler] + ml('features.py', 'geogrid.py', 'drift.py', 'profiling.py'),
+            # train_inverse_models.MODEL_SPECS / METADATA_PATH
+            'outputs': ml('model_datetime_location_to_subtype.keras', 'scaler_datetime_location_to_subtype.pkl',
+                          'model_datetime_subtype_to_location.keras', 'scaler_datetime_subtype_to_location.pkl',
+                          'model_location_subtype_to_datetime.keras', 'scaler_location_subtype_to_datetime.pkl',
+                          'inverse_models_metadata.pkl'),
+        },
+    }
+
+
+# ============================================
+# CONTENT HASHES
+# ============================================
+def _file_digest(path, cache):
+    """SHA-256 of a file, reused from `cache` while its size and mtime are unchanged"""
+    stat = os.stat(path)
+    cached = cache.get(path)
+    if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return cache[path][2]
+
+
+def content_hash(path, cache):
+    """
+    Digest of a file, or of a directory's files with their sub-directories (file names
+    are left out: main.py's Parquet parts are named by write time); None if missing
+    """
+    if os.path.isfile(path):
+        return _file_digest(path, cache)
+    if not os.path.isdir(path):
+        return None
+    entries = []
+    for root, dirs, files in os.walk(path):
+        relative = os.path.relpath(root, path)
+        entries += [(relative, _file_digest(os.path.join(root, name), cache)) for name in files]
+    return hashlib.sha256(json.dumps(sorted(entries)).encode()).hexdigest()
+
+
+def fingerprint(stage, cache):
+    # An input the stage also writes (clean.py's vocabularies) is covered by the check that
+    # its outputs are as it left them; hashing it here would rerun the stage once more
+    inputs = {path: 'output' if path in stage['outputs'] else content_hash(path, cache)
+              for path in stage['inputs']}
+    spec = {'script': content_hash(stage['script'], cache), 'args': stage['args'], 'inputs': inputs}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+# ============================================
+# DAG RUNNER
+# ============================================
+def dependencies(stages):
+    """{stage: stages writing one of its inputs}; raises on cycles"""
+    producers = {os.path.abspath(out): name for name, stage in stages.items() for out in stage['outputs']}
+    deps = {name: sorted({producers[path] for path in map(os.path.abspath, stage['inputs'])
+                          if path in producers and producers[path] != name})
+            for name, stage in stages.items()}
+
+    done = set()
+    while len(done) < len(deps):
+        ready = [name for name, d in deps.items() if name not in done and set(d) <= done]
+        if not ready:
+            raise ValueError(f"Stages depend on each other: {sorted(set(deps) - done)}")
+        done.update(ready)
+    return deps
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class Runner:
+    def __init__(self, stages, state_path=STATE_PATH, log_dir=LOG_DIR, force=(), dry_run=False):
+        self.stages = stages
+        self.state_path, self.log_dir = state_path, log_dir
+        self.force, self.dry_run = set(force), dry_run
+        self.state = load_state(state_path)
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def _outputs_unchanged(self, recorded):
+        return all(content_hash(path, self.state['files']) == digest for path, digest in recorded.items())
+
+    def run_stage(self, name, upstream):
+        """Run one stage unless it is up to date; returns its result"""
+        stage = self.stages[name]
+        started = time.perf_counter()
+        # One stage hashes at a time, so shared inputs are only read once
+        with self.lock:
+            current = fingerprint(stage, self.state['files'])
+            previous = self.state['stages'].get(name)
+            up_to_date = (name not in self.force and previous is not None
+                          and previous['fingerprint'] == current
+                          and set(previous['outputs']) == set(stage['outputs'])
+                          and self._outputs_unchanged(previous['outputs']))
+        result = {'started': started - self.origin}
+
+        if up_to_date and not (self.dry_run and 'would run' in upstream):
+            print(f"↷ {name}: up to date")
+            return dict(result, status='skipped', seconds=time.perf_counter() - started)
+        if self.dry_run:
+            reason = 'inputs may change' if up_to_date else 'changed'
+            print(f"• {name}: would run ({reason})")
+            return dict(result, status='would run', seconds=0.0)
+
+        print(f"▶ {name}: running {os.path.basename(stage['script'])} {' '.join(stage['args'])}".rstrip())
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_path = os.path.join(self.log_dir, f'{name}.log')
+        with open(log_path, 'w') as log:
+            code = subprocess.run([sys.executable, stage['script'], *stage['args']], cwd=stage['cwd'],
+                                  stdout=log, stderr=subprocess.STDOUT).returncode
+        ended = time.perf_counter()
+        result.update(seconds=ended - started, log=log_path)
+
+        with self.lock:
+            outputs = {path: content_hash(path, self.state['files']) for path in stage['outputs']}
+            missing = [path for path, digest in outputs.items() if digest is None]
+            if code or missing:
+                detail = f'exit code {code}' if code else f"did not write {', '.join(missing)}"
+                print(f"✗ {name}: failed ({detail}), see {log_path}")
+                return dict(result, status='failed')
+            self.state['stages'][name] = {'fingerprint': current, 'outputs': outputs,
+                                          'seconds': round(ended - started, 3)}
+            save_state(self.state, self.state_path)
+        print(f"✓ {name}: done in {ended - started:.1f}s")
+        return dict(result, status='ran')
+
+    def run(self, jobs=None):
+        """Every stage in dependency order, independent ones concurrently; {stage: result}"""
+        deps = dependencies(self.stages)
+        pending, running, results = dict(deps), {}, {}
+        with ThreadPoolExecutor(jobs or len(self.stages) or 1) as pool:
+            while pending or running:
+                for name in [n for n, d in pending.items() if all(dep in results for dep in d)]:
+                    del pending[name]
+                    upstream = {results[dep]['status'] for dep in deps[name]}
+                    if upstream & {'failed', 'blocked'}:
+                        print(f"✗ {name}: not run, an earlier stage failed")
+                        results[name] = {'status': 'blocked', 'seconds': 0.0}
+                        continue
+                    running[pool.submit(self.run_stage, name, upstream)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return {name: results[name] for name in self.stages}
+
+
+def print_summary(results, wall_time):
+    print("\n" + "="*70)
+    print("REBUILD SUMMARY")
+    print("="*70)
+    for name, result in results.items():
+        print(f"  {name:15s} {result['status']:10s} {result['seconds']:8.1f}s")
+    busy = sum(result['seconds'] for result in results.values())
+    print(f"\nWall time: {wall_time:.1f}s (stage time {busy:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the models, skipping stages whose inputs are unchanged')
+    parser.add_argument('--workdir', default=WRANGLING_DIR,
+                        help='Directory with the raw exports in data/ and the merged / cleaned data')
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help='Only these stages (the others are treated as already built)')
+    parser.add_argument('--stage-args', nargs=2, action='append', default=[], metavar=('STAGE', 'ARGS'),
+                        help='Extra arguments for a stage, e.g. train_inverse "--epochs 5" (part of its fingerprint)')
+    parser.add_argument('--force', nargs='*', default=None, metavar='STAGE',
+                        help='Rerun these stages (all of them if none are named)')
+    parser.add_argument('--jobs', type=int, default=None, help='Stages run at the same time (default: no limit)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report which stages would run')
+    parser.add_argument('--state', default=STATE_PATH)
+    parser.add_argument('--log-dir', default=LOG_DIR)
+    args = parser.parse_args()
+
+    stages = default_stages(args.workdir)
+    for name, extra in args.stage_args:
+        if name not in stages:
+            parser.error(f"Unknown stage '{name}' (stages: {', '.join(stages)})")
+        stages[name]['args'] += shlex.split(extra)
+    if args.stages:
+        unknown = set(args.stages) - set(stages)
+        if unknown:
+            parser.error(f"Unknown stages {sorted(unknown)} (stages: {', '.join(stages)})")
+        stages = {name: stage for name, stage in stages.items() if name in args.stages}
+    force = stages if args.force == [] else (args.force or ())
+
+    started = time.perf_counter()
+    results = Runner(stages, args.state, args.log_dir, force=force, dry_run=args.dry_run).run(args.jobs)
+    print_summary(results, time.perf_counter() - started)
+    if any(result['status'] in ('failed', 'blocked') for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Fixtures for the ml_api test suite.
+
+Writes a tiny synthetic artifact bundle (inverse models, base models, scalers and
+metadata with the same file names and feature columns as the real training scripts)
+to a temp directory and points ml_api at it through ML_MODEL_DIR, so the suite runs
+in-process without a server, network access or the real trained models.
+"""
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+
+from tensorflow import keras  # noqa: E402
+from sklearn.preprocessing import StandardScaler  # noqa: E402
+
+from drift import reference_histograms  # noqa: E402
+from features import FeatureBuilder  # noqa: E402
+from geogrid import GeoGrid  # noqa: E402
+from train_inverse_models import MODEL_SPECS, METADATA_PATH, subtype_labels, subtype_to_int  # noqa: E402
+
+NUM_NEIGHBOURHOODS = 12
+NUM_ROWS = 2000
+SEED = 7
+# Coordinate scaling of a cleaning run, as recorded in the bundle
+GEO_GRID = GeoGrid(lat_mean=43.71, lat_scale=0.07, lon_mean=-79.40, lon_scale=0.1)
+
+# Column lists saved by boom.py in feature_columns.pkl
+BASE_FEATURES = {
+    'binary': ['hour', 'day_of_week', 'is_weekend', 'is_night', 'quarter', 'season_encoded',
+               'LAT_R', 'LON_R', 'lat_zone', 'lon_zone', 'NEIGHBOURHOOD_CLEAN_encoded',
+               'neighbourhood_incident_count', 'hour_sin', 'hour_cos', 'day_of_week_sin',
+               'day_of_week_cos', 'month_sin', 'month_cos', 'events_this_hour'],
+    'regression': ['day_of_week', 'is_weekend', 'quarter', 'season_encoded', 'LAT_R', 'LON_R',
+                   'lat_zone', 'lon_zone', 'NEIGHBOURHOOD_CLEAN_encoded',
+                   'neighbourhood_incident_count', 'month_sin', 'month_cos',
+                   'day_of_week_sin', 'day_of_week_cos'],
+}
+BASE_FEATURES['multiclass'] = BASE_FEATURES['binary']
+BASE_MODEL_PATHS = {
+    'binary': 'binary_classification_model.keras',
+    'multiclass': 'multiclass_classification_model.keras',
+    'regression': 'regression_model.keras',
+}
+
+
+def tiny_model(num_inputs, num_outputs, activation):
+    """Same layer types as the real models (Dense / BatchNorm / Dropout), a fraction of the size"""
+    model = keras.Sequential([
+        keras.layers.Input(shape=(num_inputs,)),
+        keras.layers.Dense(16, activation='relu'),
+        keras.layers.BatchNormalization(),
+        keras.layers.Dropout(0.2),
+        keras.layers.Dense(num_outputs, activation=activation),
+    ])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+
+def save_pickle(obj, path):
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f)
+
+
+def write_artifacts(model_dir):
+    """Synthetic stand-ins for everything ml_api loads from ML_MODEL_DIR"""
+    rng = np.random.default_rng(SEED)
+    keras.utils.set_random_seed(SEED)
+
+    neighbourhood_coords = {
+        n: {'LAT_R': float(rng.normal()), 'LON_R': float(rng.normal()),
+            'lat_zone': float(rng.integers(0, 10)), 'lon_zone': float(rng.integers(0, 10))}
+        for n in range(NUM_NEIGHBOURHOODS)
+    }
+    neighbourhood_stats = {n: {**coords, 'neighbourhood_incident_count': float(rng.integers(100, 50000))}
+                           for n, coords in neighbourhood_coords.items()}
+    inputs = {
+        'datetime': rng.integers(1_577_836_800, 1_735_689_600, NUM_ROWS),  # 2020-2024
+        'neighbourhood': rng.integers(0, NUM_NEIGHBOURHOODS, NUM_ROWS),
+        'event_subtype': rng.integers(0, len(subtype_labels), NUM_ROWS),
+        'events_this_hour': rng.integers(0, 3, NUM_ROWS),
+    }
+
+    outputs = {'model1': (len(subtype_labels), 'softmax'), 'model2': (NUM_NEIGHBOURHOODS, 'softmax'),
+               'model3': (24, 'softmax')}
+    reference = {}
+    for name, spec in MODEL_SPECS.items():
+        X = FeatureBuilder(spec['features'], neighbourhood_coords).build(inputs)
+        reference.update(reference_histograms(X, spec['features']))
+        save_pickle(StandardScaler().fit(X), os.path.join(model_dir, spec['scaler_path']))
+        tiny_model(X.shape[1], *outputs[name]).save(os.path.join(model_dir, spec['model_path']))
+
+    metadata = {
+        'subtype_labels': subtype_labels,
+        'subtype_to_int': subtype_to_int,
+        'num_neighbourhoods': NUM_NEIGHBOURHOODS,
+        'neighbourhood_coords': neighbourhood_coords,
+        'feature_reference': reference,
+        'geo_grid': GEO_GRID.to_dict(),
+    }
+    for name, spec in MODEL_SPECS.items():
+        metadata[f'{name}_features'] = spec['features']
+    save_pickle(metadata, os.path.join(model_dir, METADATA_PATH))
+
+    outputs = {'binary': (1, 'sigmoid'), 'multiclass': (len(subtype_labels), 'softmax'),
+               'regression': (1, 'linear')}
+    for name, columns in BASE_FEATURES.items():
+        X = FeatureBuilder(columns, neighbourhood_stats).build(inputs)
+        save_pickle(StandardScaler().fit(X), os.path.join(model_dir, f'scaler_{name}.pkl'))
+        tiny_model(X.shape[1], *outputs[name]).save(os.path.join(model_dir, BASE_MODEL_PATHS[name]))
+    save_pickle({
+        **BASE_FEATURES,
+        'neighbourhood_stats': neighbourhood_stats,
+        'feature_reference': reference_histograms(
+            FeatureBuilder(BASE_FEATURES['binary'], neighbourhood_stats).build(inputs), BASE_FEATURES['binary']),
+    }, os.path.join(model_dir, 'feature_columns.pkl'))
+
+
+def cleaned_frame(rows=NUM_ROWS, seed=SEED):
+    """Synthetic rows with the clean.py columns the inverse models train on"""
+    rng = np.random.default_rng(seed)
+    times = pd.to_datetime(rng.integers(1_577_836_800, 1_735_689_600, rows), unit='s')
+    return pd.DataFrame({
+        'year': times.year, 'month': times.month, 'day': times.day, 'hour': times.hour,
+        'day_of_week': times.dayofweek,
+        'is_weekend': (times.dayofweek >= 5).astype(int),
+        'is_night': ((times.hour >= 20) | (times.hour < 6)).astype(int),
+        'quarter': times.quarter,
+        'season_encoded': (times.month % 12) // 3,
+        'NEIGHBOURHOOD_CLEAN_encoded': rng.integers(0, NUM_NEIGHBOURHOODS, rows),
+        'LAT_R': rng.normal(size=rows), 'LON_R': rng.normal(size=rows),
+        'lat_zone': rng.integers(0, 16, rows), 'lon_zone': rng.integers(0, 16, rows),
+        'EVENT_SUBTYPE_encoded': rng.integers(0, len(subtype_labels), rows),
+    })
+
+
+@pytest.fixture(scope='session')
+def model_dir(tmp_path_factory):
+    """Directory holding the synthetic artifact bundle"""
+    model_dir = tmp_path_factory.mktemp('models')
+    write_artifacts(model_dir)
+    return model_dir
+
+
+@pytest.fixture(scope='session')
+def ml_api(model_dir):
+    """The ml_api module, loaded from the synthetic bundle (imported once per session)"""
+    os.environ['ML_MODEL_DIR'] = str(model_dir)
+    os.environ['ML_TRACE_FILE'] = ''
+    import ml_api
+    return ml_api
+
+
+@pytest.fixture
+def client(ml_api):
+    return ml_api.app.test_client()
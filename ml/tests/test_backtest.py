@@ -0,0 +1,76 @@
+"""Rolling windows and streamed metrics (backtest.py)."""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import accuracy_score, log_loss, top_k_accuracy_score
+
+import train_inverse_models as tim
+from backtest import StreamingMetrics, make_windows
+
+from conftest import NUM_NEIGHBOURHOODS, cleaned_frame
+
+FIRST = pd.Timestamp('2020-01-01 03:00')
+LAST = pd.Timestamp('2021-03-15 17:00')
+
+
+@pytest.mark.parametrize('train_span, expanding', [(None, False), ('180D', False), ('180D', True)])
+def test_windows_tile_the_test_period(train_span, expanding):
+    windows = make_windows(FIRST, LAST, '30D', '30D', train_span, expanding)
+    starts = [test_start for _, test_start, _ in windows]
+    ends = [test_end for _, _, test_end in windows]
+
+    assert starts[0] == FIRST + pd.Timedelta(train_span or 0)
+    # Back to back: each test window starts where the previous one ended, none overlap
+    assert starts[1:] == ends[:-1]
+    assert all(start < end for start, end in zip(starts, ends))
+    # The last window is cut off just after the last event, so it is still scored
+    assert ends[-1] == LAST + pd.Timedelta(hours=1) and starts[-1] <= LAST
+    for train_start, test_start, _ in windows:
+        if expanding or not train_span:
+            assert train_start == FIRST
+        else:
+            assert test_start - train_start == pd.Timedelta(train_span)
+
+
+def test_step_shorter_than_window_overlaps_by_design():
+    windows = make_windows(FIRST, LAST, '60D', '30D')
+    assert windows[1][1] - windows[0][1] == pd.Timedelta('30D')
+    assert windows[0][2] - windows[0][1] == pd.Timedelta('60D')
+
+
+def test_streaming_metrics_match_sklearn():
+    rng = np.random.default_rng(0)
+    num_classes = 7
+    probabilities = rng.dirichlet(np.ones(num_classes), size=1000)
+    y = rng.integers(0, num_classes, 1000)
+
+    metrics = StreamingMetrics()
+    for start in range(0, len(y), 300):  # uneven last batch
+        metrics.update(probabilities[start:start + 300], y[start:start + 300])
+    result = metrics.result()
+
+    labels = list(range(num_classes))
+    assert result['n'] == 1000
+    assert result['accuracy'] == round(accuracy_score(y, probabilities.argmax(axis=1)), 4)
+    assert result['top3_accuracy'] == round(top_k_accuracy_score(y, probabilities, k=3, labels=labels), 4)
+    assert result['log_loss'] == pytest.approx(log_loss(y, probabilities, labels=labels), abs=1e-4)
+
+
+def test_streaming_metrics_edge_cases():
+    assert StreamingMetrics().result() == {'n': 0, 'accuracy': None, 'top3_accuracy': None, 'log_loss': None}
+
+    # A label the model has no output for counts as wrong, with the clipped log loss
+    metrics = StreamingMetrics()
+    metrics.update(np.array([[0.7, 0.2, 0.1, 0.0], [0.1, 0.2, 0.3, 0.4]]), np.array([0, 9]))
+    result = metrics.result()
+    assert result['accuracy'] == 0.5 and result['top3_accuracy'] == 0.5
+    assert result['log_loss'] == pytest.approx((-np.log(0.7) - np.log(1e-7)) / 2, abs=1e-4)
+
+
+def test_fit_without_test_split():
+    df = cleaned_frame(rows=300)
+    split = tim.prepare_split(df, 'model3')
+    model, run = tim.fit_model('model3', {'X_train': split['X_train'], 'y_train': split['y_train']},
+                               tim.num_classes_for('model3', NUM_NEIGHBOURHOODS), epochs=1, verbose=0)
+    assert run['test_accuracy'] is None and run['test_loss'] is None
+    assert run['epochs_run'] == 1 and model.output_shape[-1] == 24
@@ -0,0 +1,88 @@
+"""Offline bulk scoring (bulk_score.py) against the synthetic bundle, through its CLI."""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from train_inverse_models import subtype_labels
+
+from conftest import ML_DIR, NUM_NEIGHBOURHOODS
+
+NUM_QUERIES = 50
+
+
+def bulk_score(*args, returncode=0):
+    result = subprocess.run([sys.executable, 'bulk_score.py', *map(str, args), '--workers', '1',
+                             '--chunk-size', '20'], cwd=ML_DIR, capture_output=True, text=True)
+    assert result.returncode == returncode, result.stdout + result.stderr
+    return result
+
+
+def queries():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'datetime': rng.integers(1_704_067_200, 1_735_689_600, NUM_QUERIES),
+        'neighbourhood': rng.integers(0, NUM_NEIGHBOURHOODS, NUM_QUERIES),
+        'event_subtype': rng.choice(list(subtype_labels.values()), NUM_QUERIES),
+    })
+
+
+def test_csv_top_k(model_dir, tmp_path):
+    source = queries()
+    source.to_csv(tmp_path / 'queries.csv', index=False)
+    bulk_score(tmp_path / 'queries.csv', '--model', 'model1', '--bundle', model_dir,
+               '--top-k', 3, '--output', tmp_path / 'scores.parquet')
+
+    scores = pd.read_parquet(tmp_path / 'scores.parquet')
+    # Input order is kept across chunks
+    assert scores['datetime'].tolist() == source['datetime'].tolist()
+    assert [c for c in scores.columns if c.startswith('pred_')] == ['pred_1', 'pred_2', 'pred_3']
+    assert scores[['pred_1', 'pred_2', 'pred_3']].isin(subtype_labels.values()).all().all()
+    probs = scores[['prob_1', 'prob_2', 'prob_3']].to_numpy()
+    assert (np.diff(probs, axis=1) <= 0).all()
+
+
+def test_parquet_dataset_full(model_dir, tmp_path):
+    # A partitioned directory, laid out like main.py's final_parquet
+    source = queries().assign(year=lambda df: pd.to_datetime(df['datetime'], unit='s').dt.year)
+    pq.write_to_dataset(pa.Table.from_pandas(source, preserve_index=False), tmp_path / 'queries',
+                        partition_cols=['year'])
+    bulk_score(tmp_path / 'queries', '--model', 'model2', '--bundle', model_dir, '--full',
+               '--output', tmp_path / 'scores.parquet')
+
+    scores = pd.read_parquet(tmp_path / 'scores.parquet')
+    assert len(scores) == NUM_QUERIES
+    assert 'year' in scores.columns
+    prob_cols = [c for c in scores.columns if c.startswith('prob_')]
+    assert prob_cols == [f'prob_{i}' for i in range(NUM_NEIGHBOURHOODS)]
+    assert np.allclose(scores[prob_cols].sum(axis=1), 1.0, atol=1e-4)
+    assert sorted(scores['datetime']) == sorted(source['datetime'])
+
+
+def test_top_k_beyond_classes_is_rejected(model_dir, tmp_path):
+    queries().to_csv(tmp_path / 'queries.csv', index=False)
+    result = bulk_score(tmp_path / 'queries.csv', '--model', 'model3', '--bundle', model_dir,
+                        '--top-k', 25, '--output', tmp_path / 'scores.parquet', returncode=2)
+    assert '--top-k must be between 1 and 24' in result.stderr
+    assert not (tmp_path / 'scores.parquet').exists()
+
+
+def test_invalid_rows_name_their_chunk(model_dir, tmp_path):
+    source = queries().astype({'datetime': object})
+    source.loc[25, 'datetime'] = 'not a time'
+    source.to_csv(tmp_path / 'queries.csv', index=False)
+    args = (tmp_path / 'queries.csv', '--model', 'model1', '--bundle', model_dir,
+            '--output', tmp_path / 'scores.parquet')
+
+    result = bulk_score(*args, returncode=1)
+    assert 'Could not score chunk 1 (input rows 20-39): Invalid datetime' in result.stderr
+    assert 'Traceback' not in result.stderr
+
+    result = bulk_score(*args, '--skip-errors')
+    assert 'Skipped chunk 1 (input rows 20-39)' in result.stdout
+    scores = pd.read_parquet(tmp_path / 'scores.parquet')
+    assert scores['datetime'].astype(int).tolist() == source['datetime'].drop(range(20, 40)).astype(int).tolist()
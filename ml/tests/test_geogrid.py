@@ -0,0 +1,62 @@
+"""Fixed zone grid (geogrid.py) and its use in the FeatureBuilder."""
+import numpy as np
+
+from features import FeatureBuilder
+from geogrid import TORONTO_BBOX, GeoGrid, cell_ids, zones
+
+from conftest import GEO_GRID
+
+
+def test_zones_are_fixed_and_clipped():
+    lat = np.array([43.58, 43.6499, 43.86, 40.0, 50.0])
+    lon = np.array([-79.64, -79.375, -79.11, -80.0, -70.0])
+    lat_zone, lon_zone = zones(lat, lon, level=4)
+    assert lat_zone.tolist() == [0, 3, 15, 0, 15]
+    assert lon_zone.tolist() == [0, 8, 15, 0, 15]
+    # The same point gets the same zone whatever it is batched with
+    assert zones(lat[1:2], lon[1:2], level=4) == (lat_zone[1:2], lon_zone[1:2])
+
+
+def test_levels_nest():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(*TORONTO_BBOX['lat'], 1000)
+    lon = rng.uniform(*TORONTO_BBOX['lon'], 1000)
+    fine, coarse = zones(lat, lon, level=5), zones(lat, lon, level=4)
+    assert (fine[0] >> 1 == coarse[0]).all() and (fine[1] >> 1 == coarse[1]).all()
+    assert (cell_ids(*fine, level=5) >> 2 == cell_ids(*coarse, level=4)).all()
+
+
+def test_grid_round_trips_through_metadata():
+    grid = GeoGrid.from_metadata({'geo_grid': GEO_GRID.to_dict()})
+    lat_r, lon_r = np.array([-1.0, 0.0, 1.5]), np.array([0.5, 0.0, -2.0])
+    expected = zones(lat_r * 0.07 + 43.71, lon_r * 0.1 - 79.40)
+    assert all((a == b).all() for a, b in zip(grid.zones(lat_r, lon_r), expected))
+    assert GeoGrid.from_metadata({}) is None
+
+
+def test_builder_derives_zones_from_coordinates():
+    coords = {1: {'LAT_R': 0.5, 'LON_R': -0.5, 'lat_zone': 99.0, 'lon_zone': 99.0}}
+    builder = FeatureBuilder(['LAT_R', 'LON_R', 'lat_zone', 'lon_zone'], coords, grid=GEO_GRID)
+
+    X = builder.build({'neighbourhood': [1, 1, 1], 'lat': [0.5, 1.0, 0.5], 'lon': [-0.5, 1.0, -0.5],
+                       'lat_zone': [3, 3, 3]})
+    lat_zone, lon_zone = GEO_GRID.zones([0.5, 1.0, 0.5], [-0.5, 1.0, -0.5])
+    assert X[:, 2].tolist() == [3, 3, 3]  # explicit input wins
+    assert X[:, 3].tolist() == lon_zone.tolist()
+
+    # Only a neighbourhood: zones of its coordinates, not the stored medians
+    X = builder.build({'neighbourhood': [1]})
+    assert X[0, 2:].tolist() == [float(z[0]) for z in GEO_GRID.zones([0.5], [-0.5])]
+
+    # No grid: previous behaviour (lookup table)
+    X = FeatureBuilder(['lat_zone'], coords).build({'neighbourhood': [1]})
+    assert X[0, 0] == 99.0
+
+
+def test_api_fills_zones_from_request_coordinates(ml_api):
+    builder = ml_api.base_builder
+    X = builder.build({'neighbourhood': [2], 'datetime': [1_700_000_000], 'lat': [0.3], 'lon': [-0.2]})
+    columns = builder.columns
+    lat_zone, lon_zone = GEO_GRID.zones([0.3], [-0.2])
+    assert X[0, columns.index('lat_zone')] == lat_zone[0]
+    assert X[0, columns.index('lon_zone')] == lon_zone[0]
@@ -0,0 +1,78 @@
+"""Median pruning, Pareto front and best-config selection (hparam_search.py)."""
+import random
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from hparam_search import MedianPruner, pareto_front, sample_config, select_best
+
+
+def pruner_run(board, losses, **kwargs):
+    """Feed one trial's per-epoch val_loss to a MedianPruner; returns the pruner"""
+    pruner = MedianPruner(board, threading.Lock(), 'model1', **kwargs)
+    pruner.set_model(SimpleNamespace(stop_training=False))
+    for epoch, loss in enumerate(losses):
+        pruner.on_epoch_end(epoch, {'val_loss': loss})
+        if pruner.model.stop_training:
+            break
+    return pruner
+
+
+def test_median_pruner():
+    board = {}
+    for losses in ([1.0, 0.8, 0.6], [1.1, 0.9, 0.7], [1.2, 1.0, 0.8]):
+        assert pruner_run(board, losses).pruned_at is None  # fewer than min_peers peers so far
+    assert board['model1:0'] == [1.0, 1.1, 1.2]
+
+    # Worse than the peers' median from the start; epoch 0 is warm-up, so it stops after epoch 1
+    late = pruner_run(board, [1.5, 1.5, 1.5])
+    assert late.pruned_at == 2 and late.model.stop_training
+    # At the median is not worse than it
+    assert pruner_run(board, [1.0, 0.85, 0.7]).pruned_at is None
+
+    assert pruner_run(board, [5.0, 5.0], warmup_epochs=1).pruned_at == 1
+    # Epochs without a val_loss neither post nor prune
+    assert pruner_run({}, [None]).pruned_at is None
+
+
+def trial(trial_id, accuracy, latency_ms, params, pruned=False):
+    return {'trial_id': trial_id, 'test_accuracy': accuracy, 'latency_ms': latency_ms,
+            'params': params, 'pruned': pruned}
+
+
+def test_pareto_front():
+    trials = [
+        trial('a', 0.80, 1.0, 1000),
+        trial('b', 0.70, 0.5, 1000),   # faster
+        trial('c', 0.70, 1.0, 1000),   # dominated by a and b
+        trial('d', 0.80, 1.0, 1000),   # ties a: neither dominates the other
+        trial('e', 0.90, 2.0, 5000),   # most accurate
+        trial('f', 0.85, 2.0, 6000),   # dominated by e
+    ]
+    assert [t['trial_id'] for t in pareto_front(trials)] == ['a', 'b', 'd', 'e']
+    assert pareto_front([]) == []
+
+
+def test_select_best():
+    trials = [
+        trial('a', 0.80, 1.0, 1000),
+        trial('b', 0.80, 0.5, 2000),
+        trial('e', 0.90, 2.0, 5000),
+        trial('p', 0.95, 0.1, 100, pruned=True),
+    ]
+    assert select_best(trials)['trial_id'] == 'e'
+    assert select_best(trials, max_latency_ms=1.0)['trial_id'] == 'b'  # ties go to the faster
+    assert select_best(trials, max_latency_ms=1.0, max_params=1000)['trial_id'] == 'a'
+    assert select_best(trials, max_params=10) is None
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_sampled_configs_taper(seed):
+    config = sample_config(random.Random(seed))
+    units = [block[0] for block in config['hidden']]
+    dropouts = [block[2] for block in config['hidden']]
+    assert units == sorted(units, reverse=True) and min(units) >= 16
+    assert dropouts == sorted(dropouts, reverse=True) and min(dropouts) >= 0
+    assert not config['hidden'][-1][1]  # no batch norm on the last block
+    assert 1e-4 <= config['learning_rate'] <= 3e-3
@@ -0,0 +1,307 @@
+"""
+In-process tests for ml_api.py: every /predict case, the fused base-model endpoints,
+latency budgets (p50/p99 over repeated requests) and Python allocation budgets
+(tracemalloc). Run from ml/ with `python -m pytest tests`.
+
+Budgets are for the tiny synthetic models in conftest.py, so they measure the
+request path (parsing, feature building, scaling, serialisation and graph-call
+overhead) rather than model size. Set ML_LATENCY_SCALE to loosen them on slow machines.
+"""
+import gc
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+TIMESTAMP = 1705190400  # 2024-01-13 19:00 Toronto
+NEIGHBOURHOOD = 3
+SUBTYPE = 'Crime-Assault-Simple'
+
+WARMUP_REQUESTS = 20
+TIMED_REQUESTS = 200
+LATENCY_SCALE = float(os.environ.get('ML_LATENCY_SCALE', 1.0))
+
+# (name, path, body, p50 budget ms, p99 budget ms)
+CASES = [
+    ('subtype', '/predict', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}, 10, 30),
+    ('location', '/predict', {'datetime': TIMESTAMP, 'event_subtype': SUBTYPE}, 10, 30),
+    ('hour', '/predict', {'neighbourhood': NEIGHBOURHOOD, 'event_subtype': SUBTYPE}, 10, 30),
+    ('all', '/predict/all', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}, 10, 30),
+    ('binary', '/predict/binary', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}, 10, 30),
+    ('multiclass', '/predict/multiclass', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}, 10, 30),
+    ('regression', '/predict/regression', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}, 10, 30),
+    ('subtype_mc', '/predict', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD,
+                                'uncertainty': True}, 15, 40),
+    ('all_mc', '/predict/all', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD,
+                                'uncertainty': True}, 15, 40),
+]
+
+# Python-heap budgets: peak bytes while serving one request (~70 KB with the synthetic
+# models), and what stays allocated after TIMED_REQUESTS requests. TensorFlow keeps a
+# few hundred blocks of conversion caches; a per-request leak of ~1 KB or 5 objects
+# exceeds these. An eager Keras model call, for one, retains several blocks per request.
+PEAK_BYTES_BUDGET = 256 * 1024
+RETAINED_BYTES_BUDGET = 128 * 1024
+RETAINED_BLOCKS_BUDGET = 1000
+
+
+def post(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+# ============================================
+# /predict (inverse models)
+# ============================================
+
+def test_predict_event_subtype(client, ml_api):
+    data = post(client, '/predict', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD})
+    assert data['prediction_type'] == 'event_subtype'
+    top_5 = data['output']['top_5_predictions']
+    assert [p['rank'] for p in top_5] == [1, 2, 3, 4, 5]
+    assert all(p['event_type'] in ml_api.subtype_to_int for p in top_5)
+    assert top_5 == sorted(top_5, key=lambda p: -p['probability'])
+    assert data['output']['most_likely_event'] == top_5[0]['event_type']
+
+
+def test_predict_location(client, ml_api):
+    data = post(client, '/predict', {'datetime': TIMESTAMP, 'event_subtype': SUBTYPE})
+    assert data['prediction_type'] == 'location'
+    locations = data['output']['top_20_locations']
+    assert len(locations) == min(20, len(ml_api.neighbourhood_coords))
+    best = data['output']['most_likely_location']
+    coords = ml_api.neighbourhood_coords[best['neighbourhood']]
+    assert best['coordinates'] == [pytest.approx(coords['LAT_R']), pytest.approx(coords['LON_R'])]
+
+
+def test_predict_hour(client):
+    data = post(client, '/predict', {'neighbourhood': NEIGHBOURHOOD, 'event_subtype': SUBTYPE})
+    assert data['prediction_type'] == 'datetime'
+    hours = data['output']['top_5_hours']
+    assert all(0 <= h['hour'] < 24 for h in hours)
+    assert data['output']['most_likely_time_range'] == f"{hours[0]['hour']:02d}:00 - {hours[0]['hour']:02d}:59"
+
+
+def test_predict_matches_model(client, ml_api):
+    """The endpoint's probabilities are the model's output for the training feature vector"""
+    data = post(client, '/predict', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD})
+    features = ml_api.builder1.build({'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD})
+    probs = ml_api.model1(ml_api.scaler1.transform(features).astype(np.float32), training=False).numpy()[0]
+    best = int(np.argmax(probs))
+    assert data['output']['most_likely_event'] == ml_api.subtype_labels[best]
+    assert data['output']['confidence'] == pytest.approx(probs[best], abs=1e-4)
+
+
+def test_predict_uncertainty(client):
+    data = post(client, '/predict', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD,
+                                     'uncertainty': True, 'samples': 10})
+    block = data['output']['uncertainty']
+    assert block['samples'] == 10
+    assert len(block['mean']) == len(block['std'])
+    assert all('std' in p for p in data['output']['top_5_predictions'])
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'datetime': TIMESTAMP}, 'exactly 2 of 3'),
+    ({'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD, 'event_subtype': SUBTYPE}, 'exactly 2 of 3'),
+    ({'datetime': TIMESTAMP, 'event_subtype': 'Not-A-Subtype'}, 'Invalid event_subtype'),
+    ({'neighbourhood': NEIGHBOURHOOD, 'event_subtype': 'Not-A-Subtype'}, 'Invalid event_subtype'),
+    ({'datetime': 'abc', 'neighbourhood': NEIGHBOURHOOD}, 'Unix timestamp'),
+    ({'datetime': 1e300, 'neighbourhood': NEIGHBOURHOOD}, 'out of range'),
+    ({'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD, 'lat': float('inf')}, 'Non-finite'),
+    ({'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD, 'lat': 'north'}, 'must be numeric'),
+])
+def test_predict_rejects_bad_input(client, body, error):
+    response = client.post('/predict', json=body)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+@pytest.mark.parametrize('path', ['/predict', '/predict/all'])
+@pytest.mark.parametrize('samples', ['abc', [5], None])
+def test_bad_sample_count(client, path, samples):
+    response = client.post(path, json={'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD,
+                                       'uncertainty': True, 'samples': samples})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'samples must be an integer'
+
+
+def test_datetime_readable_is_toronto_time(client):
+    data = post(client, '/predict', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD})
+    assert data['input']['datetime_readable'] == '2024-01-13 19:00:00'
+
+
+def test_predict_requires_json(client):
+    response = client.post('/predict', data='', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': 'No JSON data provided'}
+
+
+# ============================================
+# Base models (fused graph)
+# ============================================
+
+def test_predict_all(client):
+    data = post(client, '/predict/all', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD})
+    assert 0 <= data['binary_classification']['probability'] <= 1
+    assert len(data['multiclass_classification']['top_3_predictions']) == 3
+    assert data['regression']['predicted_daily_events'] >= 0
+    assert data['overall_assessment']['risk_level'] in ('low', 'medium', 'high')
+
+
+@pytest.mark.parametrize('path, section', [
+    ('/predict/binary', 'binary_classification'),
+    ('/predict/multiclass', 'multiclass_classification'),
+    ('/predict/regression', 'regression'),
+])
+def test_single_model_endpoints_match_all(client, path, section):
+    body = {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}
+    assert post(client, path, body)[section] == post(client, '/predict/all', body)[section]
+
+
+def test_predict_all_accepts_event_subtype_label(client):
+    body = {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD}
+    assert post(client, '/predict/all', {**body, 'event_subtype': SUBTYPE}) == post(client, '/predict/all', body)
+    response = client.post('/predict/all', json={**body, 'event_subtype': 'Not-A-Subtype'})
+    assert response.status_code == 400
+
+
+def test_predict_all_missing_datetime(client):
+    response = client.post('/predict/all', json={'neighbourhood': NEIGHBOURHOOD})
+    assert response.status_code == 400
+
+
+def test_server_timing_and_trace(client):
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+    response = client.post('/predict', json={'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD},
+                           headers={'traceparent': f'00-{trace_id}-00f067aa0ba902b7-01'})
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert stages == ['parse', 'features', 'scale', 'infer', 'serialize', 'total']
+    assert response.headers['X-Trace-Id'] == trace_id
+
+
+# ============================================
+# /forecast/counts
+# ============================================
+
+def test_forecast_counts(client, ml_api):
+    response = client.get('/forecast/counts?days=7&start=2024-01-13')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['start'] == '2024-01-13' and data['days'] == 7
+    assert data['dates'] == [f'2024-01-{day}' for day in range(13, 20)]
+    assert data['neighbourhoods'] == [int(n) for n in ml_api.forecast_neighbourhoods]
+    counts = np.array(data['counts'])
+    assert counts.shape == (len(data['neighbourhoods']), 7)
+    assert (counts >= 0).all()
+
+
+def test_forecast_counts_cache(client, ml_api):
+    ml_api.cached_forecast.cache_clear()
+
+    def get():
+        response = client.get('/forecast/counts?days=3&start=2024-02-01')
+        stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        return response.get_json(), stages
+
+    first, stages = get()
+    assert stages == ['features', 'scale', 'infer', 'serialize', 'total']
+
+    # A response built from the cache is the request's own copy
+    with ml_api.app.test_request_context():
+        ml_api.forecast_counts('2024-02-01', 3)['counts'][0][0] = -1.0
+    second, stages = get()
+    assert stages == ['cache', 'serialize', 'total']
+    assert second == first
+
+
+@pytest.mark.parametrize('query', ['days=0', 'days=91', 'days=abc', 'start=not-a-date'])
+def test_forecast_counts_rejects_bad_query(client, query):
+    response = client.get(f'/forecast/counts?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+# ============================================
+# /drift
+# ============================================
+
+def test_drift_report(client, ml_api):
+    monitor = ml_api.drift_monitor
+    columns = ml_api.base_builder.columns
+    for _ in range(monitor.min_rows):
+        post(client, '/predict/all', {'datetime': TIMESTAMP, 'neighbourhood': NEIGHBOURHOOD})
+
+    # Rows are binned on the monitor's thread; wait for them, then score without waiting an interval
+    deadline = time.monotonic() + 10
+    while not (monitor._pending.empty() and min(monitor.rows[col] for col in columns) >= monitor.min_rows):
+        assert time.monotonic() < deadline, 'drift monitor did not ingest the requests'
+        time.sleep(0.01)
+    monitor.compute()
+
+    response = client.get('/drift')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert data['status'] in ('stable', 'moderate', 'significant')
+    assert data['updated_at'] is not None and data['dropped_rows'] == 0
+    assert set(columns) <= set(data['features'])
+    for col in columns:
+        assert set(data['features'][col]) == {'psi', 'js_divergence', 'out_of_range', 'rows'}
+        assert data['features'][col]['rows'] >= monitor.min_rows
+    assert data['max_psi'] == max(scores['psi'] for scores in data['features'].values())
+
+
+# ============================================
+# Performance budgets
+# ============================================
+
+@pytest.mark.parametrize('name, path, body, p50_ms, p99_ms', CASES, ids=[case[0] for case in CASES])
+def test_latency_budget(client, name, path, body, p50_ms, p99_ms):
+    for _ in range(WARMUP_REQUESTS):
+        post(client, path, body)
+
+    latencies = []
+    for _ in range(TIMED_REQUESTS):
+        start = time.perf_counter()
+        client.post(path, json=body)
+        latencies.append((time.perf_counter() - start) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99])
+
+    assert p50 <= p50_ms * LATENCY_SCALE, f'{name}: p50 {p50:.1f} ms > {p50_ms} ms'
+    assert p99 <= p99_ms * LATENCY_SCALE, f'{name}: p99 {p99:.1f} ms > {p99_ms} ms'
+
+
+@pytest.mark.parametrize('name, path, body', [case[:3] for case in CASES], ids=[case[0] for case in CASES])
+def test_allocation_budget(client, name, path, body):
+    for _ in range(WARMUP_REQUESTS):
+        post(client, path, body)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        client.post(path, json=body)
+        tracemalloc.reset_peak()
+        before_size, _ = tracemalloc.get_traced_memory()
+        client.post(path, json=body)
+        _, peak = tracemalloc.get_traced_memory()
+
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        for _ in range(TIMED_REQUESTS):
+            client.post(path, json=body)
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    retained_bytes = sum(stat.size_diff for stat in stats)
+    retained_blocks = sum(stat.count_diff for stat in stats)
+
+    assert peak - before_size <= PEAK_BYTES_BUDGET, f'{name}: peak {peak - before_size} bytes per request'
+    assert retained_bytes <= RETAINED_BYTES_BUDGET, f'{name}: {retained_bytes} bytes retained'
+    assert retained_blocks <= RETAINED_BLOCKS_BUDGET, f'{name}: {retained_blocks} blocks retained'
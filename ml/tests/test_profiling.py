@@ -0,0 +1,59 @@
+"""Phase bookkeeping and platform fallbacks of the profiler (profiling.py)."""
+import json
+
+import profiling
+from profiling import Profiler
+
+
+def phases_by_name(profiler):
+    return {phase['phase']: phase for phase in profiler.as_dict()['phases']}
+
+
+def test_nested_phases_keep_their_parent():
+    profiler = Profiler('test')
+    with profiler.phase('train', model='model1'):
+        with profiler.phase('fit', model='model1'):
+            pass
+        with profiler.phase('evaluate', model='model1'):
+            pass
+    phases = phases_by_name(profiler)
+
+    assert set(phases) == {'train', 'fit', 'evaluate'}
+    assert 'parent' not in phases['train']
+    assert phases['fit']['parent'] == phases['evaluate']['parent'] == 'train'
+    # The outer phase spans its children instead of being closed by them
+    assert phases['train']['wall_s'] >= phases['fit']['wall_s'] + phases['evaluate']['wall_s']
+    assert phases['train']['peak_rss_mb'] >= phases['fit']['peak_rss_mb']
+
+
+def test_begin_closes_only_the_previous_flat_phase():
+    profiler = Profiler('test')
+    profiler.begin('load')
+    profiler.begin('split')
+    with profiler.phase('fit'):
+        profiler.begin('epoch')  # left open: closed with its enclosing phase
+    profiler.begin('save')
+    profiler.end()
+
+    phases = profiler.as_dict()['phases']
+    assert [p['phase'] for p in phases] == ['load', 'epoch', 'fit', 'split', 'save']
+    assert phases[1]['parent'] == 'fit'
+    assert phases[2]['parent'] == 'split'
+    assert not any('parent' in p for p in (phases[0], phases[3], phases[4]))
+
+
+def test_memory_is_optional_without_proc_or_resource(monkeypatch, tmp_path):
+    # e.g. Windows without psutil
+    monkeypatch.setattr(profiling, 'resource', None)
+    monkeypatch.setattr(profiling, 'psutil', None)
+    monkeypatch.setattr(profiling, 'current_rss_mb', lambda: None)
+    profiler = Profiler('test')
+    with profiler.phase('fit'):
+        pass
+    profiler.write_report(str(tmp_path / 'report.json'))
+
+    with open(tmp_path / 'report.json') as f:
+        report = json.load(f)
+    assert report['max_rss_mb'] is None
+    assert report['phases'][0]['peak_rss_mb'] is None
+    assert report['phases'][0]['wall_s'] >= 0
@@ -0,0 +1,102 @@
+"""Content-hash cached stage runner (rebuild.py) on tiny stand-in stages."""
+import os
+
+import pytest
+
+from rebuild import Runner, default_stages, dependencies
+
+# Reads its input, sleeps, writes the lower-cased text plus a suffix
+STAGE_SCRIPT = """
+import sys, time
+source, target, suffix = sys.argv[1:4]
+time.sleep(float(sys.argv[4]) if len(sys.argv) > 4 else 0)
+if suffix == 'fail':
+    sys.exit(3)
+with open(source) as f:
+    text = f.read().lower()
+with open(target, 'w') as f:
+    f.write(text + suffix)
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    script = tmp_path / 'stage.py'
+    script.write_text(STAGE_SCRIPT)
+    (tmp_path / 'raw.txt').write_text('incidents')
+
+    def stage(source, target, *args):
+        return {'script': str(script), 'cwd': str(tmp_path), 'args': [source, target, *args],
+                'inputs': [str(tmp_path / source)], 'outputs': [str(tmp_path / target)]}
+
+    stages = {
+        'merge': stage('raw.txt', 'merged.txt', ''),
+        'train_a': stage('merged.txt', 'a.txt', '-a', '0.5'),
+        'train_b': stage('merged.txt', 'b.txt', '-b', '0.5'),
+    }
+
+    def run(**kwargs):
+        runner = Runner(stages, str(tmp_path / 'state.json'), str(tmp_path / 'logs'), **kwargs)
+        runner.results = runner.run()
+        return {name: result['status'] for name, result in runner.results.items()}, runner
+
+    return tmp_path, stages, run
+
+
+def test_dependencies_follow_outputs(workspace):
+    _, stages, _ = workspace
+    assert dependencies(stages) == {'merge': [], 'train_a': ['merge'], 'train_b': ['merge']}
+    assert dependencies(default_stages()) == {
+        'merge': [], 'clean': ['merge'], 'train_base': ['clean'], 'train_inverse': ['clean'],
+    }
+
+
+def test_unchanged_stages_are_skipped(workspace):
+    tmp_path, _, run = workspace
+    assert run()[0] == {'merge': 'ran', 'train_a': 'ran', 'train_b': 'ran'}
+    assert (tmp_path / 'a.txt').read_text() == 'incidents-a'
+    assert run()[0] == {'merge': 'skipped', 'train_a': 'skipped', 'train_b': 'skipped'}
+
+    # Same content after lower-casing: merge reruns, the stages after it don't
+    (tmp_path / 'raw.txt').write_text('INCIDENTS')
+    assert run()[0] == {'merge': 'ran', 'train_a': 'skipped', 'train_b': 'skipped'}
+
+    (tmp_path / 'raw.txt').write_text('more incidents')
+    assert run(dry_run=True)[0] == {'merge': 'would run', 'train_a': 'would run', 'train_b': 'would run'}
+    assert run()[0] == {'merge': 'ran', 'train_a': 'ran', 'train_b': 'ran'}
+
+    # A changed or deleted output, or --force, reruns the stage
+    os.remove(tmp_path / 'b.txt')
+    assert run()[0] == {'merge': 'skipped', 'train_a': 'skipped', 'train_b': 'ran'}
+    assert run(force={'train_a'})[0] == {'merge': 'skipped', 'train_a': 'ran', 'train_b': 'skipped'}
+
+
+def test_independent_stages_run_concurrently(workspace):
+    _, _, run = workspace
+    run()
+    statuses, runner = run(force={'train_a', 'train_b'})
+    assert statuses == {'merge': 'skipped', 'train_a': 'ran', 'train_b': 'ran'}
+    a, b = runner.results['train_a'], runner.results['train_b']
+    assert min(a['seconds'], b['seconds']) >= 0.5
+    # Each sleeps 0.5s: one after the other, the second would start after the first ended
+    assert abs(a['started'] - b['started']) < 0.5
+
+
+def test_failure_blocks_dependents_and_is_not_recorded(workspace):
+    tmp_path, stages, run = workspace
+    stages['merge']['args'][2] = 'fail'
+    assert run()[0] == {'merge': 'failed', 'train_a': 'blocked', 'train_b': 'blocked'}
+    assert (tmp_path / 'logs' / 'merge.log').exists()
+
+    stages['merge']['args'][2] = ''
+    assert run()[0] == {'merge': 'ran', 'train_a': 'ran', 'train_b': 'ran'}
+
+
+def test_stage_reading_its_own_output(workspace):
+    tmp_path, stages, run = workspace
+    stages['merge']['inputs'].append(str(tmp_path / 'merged.txt'))
+    assert run()[0]['merge'] == 'ran'
+    assert run()[0]['merge'] == 'skipped'
+
+    (tmp_path / 'merged.txt').write_text('edited')
+    assert run()[0] == {'merge': 'ran', 'train_a': 'skipped', 'train_b': 'skipped'}
@@ -0,0 +1,84 @@
+"""Serial, parallel, resumed and incremental training (train_inverse_models.py) on a tiny synthetic frame."""
+import argparse
+import pickle
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+import train_inverse_models as tim
+
+from conftest import NUM_NEIGHBOURHOODS, cleaned_frame
+
+EPOCHS = 4
+BATCH_SIZE = 64
+
+
+@pytest.fixture(scope='module')
+def splits():
+    # --deterministic: the resumed and uninterrupted runs must agree to the bit
+    tf.config.experimental.enable_op_determinism()
+    df = cleaned_frame(rows=600)
+    return {name: tim.prepare_split(df, name) for name in ('model2', 'model3')}
+
+
+def fit(name, split, epochs=EPOCHS, checkpoint_dir=None):
+    _, run = tim.fit_model(name, split, tim.num_classes_for(name, NUM_NEIGHBOURHOODS), epochs, BATCH_SIZE,
+                           verbose=0, checkpoint_dir=checkpoint_dir and str(checkpoint_dir))
+    return run
+
+
+def test_parallel_matches_serial(splits, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # workers save their models to the working directory
+    serial = {name: fit(name, split, checkpoint_dir=tmp_path / 'serial' / name) for name, split in splits.items()}
+    parallel = tim.train_parallel(splits, NUM_NEIGHBOURHOODS, str(tmp_path / 'parallel'), threads_per_worker=1,
+                                  epochs=EPOCHS, batch_size=BATCH_SIZE, deterministic=True)
+
+    for name in splits:
+        assert parallel[name]['epochs_run'] == serial[name]['epochs_run']
+        assert parallel[name]['test_accuracy'] == pytest.approx(serial[name]['test_accuracy'], abs=1e-6)
+        assert parallel[name]['test_loss'] == pytest.approx(serial[name]['test_loss'], rel=1e-4)
+        assert (tmp_path / tim.MODEL_SPECS[name]['model_path']).exists()
+        assert (tmp_path / 'parallel' / name / 'done.json').exists()
+
+
+def test_resume_matches_uninterrupted(splits, tmp_path):
+    split = splits['model3']
+    uninterrupted = fit('model3', split, checkpoint_dir=tmp_path / 'full')
+
+    # A run that stopped after 2 epochs, continued from its checkpoint
+    fit('model3', split, epochs=2, checkpoint_dir=tmp_path / 'resumed')
+    resumed = fit('model3', split, checkpoint_dir=tmp_path / 'resumed')
+
+    assert resumed['resumed_from_epoch'] == 2
+    assert resumed['epochs_run'] == uninterrupted['epochs_run'] == EPOCHS
+    for key, values in uninterrupted['history'].items():
+        np.testing.assert_allclose(resumed['history'][key], values, rtol=1e-6, err_msg=key)
+    assert resumed['test_accuracy'] == uninterrupted['test_accuracy']
+    assert resumed['test_loss'] == pytest.approx(uninterrupted['test_loss'], rel=1e-6)
+
+
+def test_incremental_keeps_full_history_drift_reference(tmp_path):
+    df = cleaned_frame(rows=600)
+    timestamps = tim.event_timestamps(df)
+    watermark = timestamps.sort_values().iloc[500]
+    history = df[timestamps <= watermark]
+
+    bundle = tmp_path / 'bundle'
+    models, scalers = {}, {}
+    for name in tim.MODEL_SPECS:
+        split = tim.prepare_split(history, name)
+        scalers[name] = split['scaler']
+        num_classes = tim.num_classes_for(name, NUM_NEIGHBOURHOODS)
+        models[name] = tim.build_model(name, split['X_train'].shape[1], num_classes)
+    tim.save_bundle(scalers, {}, NUM_NEIGHBOURHOODS, {}, watermark, models, str(bundle))
+    df.to_csv(tmp_path / 'cleaned.csv', index=False)
+
+    args = argparse.Namespace(from_bundle=str(bundle), data=str(tmp_path / 'cleaned.csv'),
+                              output_dir=str(tmp_path / 'refreshed'), replay_ratio=0.5, learning_rate=1e-4,
+                              incremental_epochs=1, batch_size=BATCH_SIZE, epochs=1, compare_full=False)
+    tim.train_incremental(args)
+
+    with open(tmp_path / 'refreshed' / tim.METADATA_PATH, 'rb') as f:
+        metadata = pickle.load(f)
+    assert metadata['feature_reference'] == tim.feature_reference(df)
@@ -0,0 +1,96 @@
+"""
+Request tracing for ml_api.py.
+
+Trace ids follow W3C Trace Context: an incoming `traceparent` header is continued,
+otherwise a new trace is started. Spans are written in the Chrome Trace Event format
+(a JSON array of "X" events, which may be left unterminated), so a trace file opens
+directly in Perfetto / chrome://tracing and can be filtered by trace id.
+Writing happens on a background thread; requests only enqueue their spans.
+"""
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def new_trace_id():
+    return secrets.token_hex(16)
+
+
+def new_span_id():
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_span_id) from a traceparent header, or (None, None) if invalid"""
+    match = TRACEPARENT.match((header or '').strip().lower())
+    if not match or match.group(1) == '0' * 32:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def format_traceparent(trace_id, span_id):
+    return f'00-{trace_id}-{span_id}-01'
+
+
+def server_timing(timings):
+    """Server-Timing header value from [(name, seconds), ...]; repeated stages are summed"""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in totals.items())
+
+
+class TraceWriter:
+    """Append spans to a Chrome Trace Event file from a background thread"""
+
+    def __init__(self, path, max_pending=10000):
+        self.path = path
+        self.dropped = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        if path:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def record(self, events):
+        if not self.path:
+            return
+        try:
+            self._pending.put_nowait(events)
+        except queue.Full:
+            self.dropped += len(events)
+
+    def _run(self):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a') as f:
+            if new_file:
+                f.write('[\n')
+            while True:
+                events = self._pending.get()
+                # Drain whatever else is queued so bursts cost one flush
+                while True:
+                    for event in events:
+                        f.write(json.dumps(event) + ',\n')
+                    try:
+                        events = self._pending.get_nowait()
+                    except queue.Empty:
+                        break
+                f.flush()
+
+
+def request_events(trace_id, span_id, parent_id, name, wall_start, spans, total, tid, args=None):
+    """
+    Trace events for one request: an enclosing span plus one per stage.
+    `spans` holds (stage, offset_s, duration_s) relative to the request start.
+    """
+    ts = int(wall_start * 1e6)
+    common = {'trace_id': trace_id, 'span_id': span_id, 'parent_span_id': parent_id}
+    events = [{'name': name, 'cat': 'request', 'ph': 'X', 'ts': ts, 'dur': int(total * 1e6),
+               'pid': os.getpid(), 'tid': tid, 'args': {**common, **(args or {})}}]
+    for stage, offset, duration in spans:
+        events.append({'name': stage, 'cat': 'stage', 'ph': 'X', 'ts': ts + int(offset * 1e6),
+                       'dur': int(duration * 1e6), 'pid': os.getpid(), 'tid': tid, 'args': common})
+    return events
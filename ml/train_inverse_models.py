@@ -1,3 +1,14 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import tensorflow as tf
@@ -8,264 +19,789 @@ from sklearn.preprocessing import StandardScaler
 import pickle
 import warnings
 from datetime import datetime
+
+from drift import reference_histograms
+from features import FeatureBuilder
+from geogrid import GeoGrid
+from profiling import Profiler
 warnings.filterwarnings('ignore')
 
-np.random.seed(42)
-tf.random.set_seed(42)
+DATA_PATH = 'data/final_cleaned_data.csv'
+SAMPLE_SIZE = 500000
+SEED = 42
 
-print("Loading data...")
-df = pd.read_csv('data/final_cleaned_data.csv')
+# Stand-in used when --profile is off; every phase call is a no-op
+NO_PROFILE = Profiler('train_inverse_models', enabled=False)
 
 # Subtype labels
 subtype_labels = {
-    0: 'Collision-Other', 1: 'Collision-Injury-Pedestrian', 
-    2: 'Collision-Injury-Vehicle', 3: 'Collision-NoInjury-Pedestrian', 
-    4: 'Collision-NoInjury-Vehicle', 5: 'Crime-Other', 
-    6: 'Crime-Assault-Simple', 7: 'Crime-Assault-Weapon-Aggravated', 
-    8: 'Crime-Assault-BodilyHarm', 9: 'Crime-Assault-PeaceOfficer', 
-    10: 'Crime-AutoTheft', 11: 'Crime-BreakAndEnter', 
-    12: 'Crime-Robbery-Weapon', 13: 'Crime-Robbery-Business', 
-    14: 'Crime-Robbery-Other', 15: 'Crime-Theft-Other', 
-    16: 'Fire-Other', 17: 'Fire-Residential', 
-    18: 'Fire-Vehicle', 19: 'Fire-Outdoor-Rubbish', 
+    0: 'Collision-Other', 1: 'Collision-Injury-Pedestrian',
+    2: 'Collision-Injury-Vehicle', 3: 'Collision-NoInjury-Pedestrian',
+    4: 'Collision-NoInjury-Vehicle', 5: 'Crime-Other',
+    6: 'Crime-Assault-Simple', 7: 'Crime-Assault-Weapon-Aggravated',
+    8: 'Crime-Assault-BodilyHarm', 9: 'Crime-Assault-PeaceOfficer',
+    10: 'Crime-AutoTheft', 11: 'Crime-BreakAndEnter',
+    12: 'Crime-Robbery-Weapon', 13: 'Crime-Robbery-Business',
+    14: 'Crime-Robbery-Other', 15: 'Crime-Theft-Other',
+    16: 'Fire-Other', 17: 'Fire-Residential',
+    18: 'Fire-Vehicle', 19: 'Fire-Outdoor-Rubbish',
     20: 'Fire-Alarm-Commercial'
 }
 
 # Reverse mapping for string to int
 subtype_to_int = {v: k for k, v in subtype_labels.items()}
 
-print(f"Dataset shape: {df.shape}")
-print(f"Unique neighbourhoods: {df['NEIGHBOURHOOD_CLEAN_encoded'].nunique()}")
-num_neighbourhoods = df['NEIGHBOURHOOD_CLEAN_encoded'].nunique()
-
-# Sample for faster training during hackathon
-if len(df) > 500000:
-    print(f"Sampling 500k rows from {len(df)} for faster training...")
-    df = df.sample(n=500000, random_state=42)
-
 # ============================================
-# MODEL 1: (datetime + location) → event_subtype
+# MODEL DEFINITIONS
 # ============================================
-print("\n" + "="*60)
-print("MODEL 1: Predict EVENT SUBTYPE from datetime + location")
-print("="*60)
-
-# Features: datetime + location info
-X1 = df[['year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night', 
-         'quarter', 'season_encoded', 'NEIGHBOURHOOD_CLEAN_encoded', 
-         'LAT_R', 'LON_R', 'lat_zone', 'lon_zone']].values
-
-# Target: event subtype
-y1 = df['EVENT_SUBTYPE_encoded'].values
-
-X1_train, X1_test, y1_train, y1_test = train_test_split(
-    X1, y1, test_size=0.2, random_state=42, stratify=y1
-)
-
-scaler1 = StandardScaler()
-X1_train_scaled = scaler1.fit_transform(X1_train)
-X1_test_scaled = scaler1.transform(X1_test)
-
-print(f"Train: {X1_train_scaled.shape}, Test: {X1_test_scaled.shape}")
-
-# Build model
-model1 = models.Sequential([
-    layers.Input(shape=(X1_train_scaled.shape[1],)),
-    layers.Dense(256, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.4),
-    layers.Dense(128, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.3),
-    layers.Dense(64, activation='relu'),
-    layers.Dropout(0.2),
-    layers.Dense(len(subtype_labels), activation='softmax')
-])
-
-model1.compile(
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
-    loss='sparse_categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-print("Training Model 1...")
-history1 = model1.fit(
-    X1_train_scaled, y1_train,
-    validation_split=0.2,
-    epochs=30,
-    batch_size=512,
-    callbacks=[
-        keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
-        keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3)
-    ],
-    verbose=1
-)
-
-results1 = model1.evaluate(X1_test_scaled, y1_test, verbose=0)
-print(f"Model 1 Test Accuracy: {results1[1]:.4f}")
+# hidden: (units, batch_norm, dropout) per Dense block
+MODEL_SPECS = {
+    # MODEL 1: (datetime + location) → event_subtype
+    'model1': {
+        'title': 'Predict EVENT SUBTYPE from datetime + location',
+        'summary': 'datetime+location → event_subtype',
+        'features': ['year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night',
+                     'quarter', 'season_encoded', 'NEIGHBOURHOOD_CLEAN_encoded',
+                     'LAT_R', 'LON_R', 'lat_zone', 'lon_zone'],
+        'target': 'EVENT_SUBTYPE_encoded',
+        'stratify': True,
+        'hidden': [(256, True, 0.4), (128, True, 0.3), (64, False, 0.2)],
+        'model_path': 'model_datetime_location_to_subtype.keras',
+        'scaler_path': 'scaler_datetime_location_to_subtype.pkl',
+    },
+    # MODEL 2: (datetime + event_subtype) → location (neighbourhood)
+    'model2': {
+        'title': 'Predict LOCATION (neighbourhood) from datetime + event_subtype',
+        'summary': 'datetime+event_subtype → location',
+        'features': ['year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night',
+                     'quarter', 'season_encoded', 'EVENT_SUBTYPE_encoded'],
+        'target': 'NEIGHBOURHOOD_CLEAN_encoded',
+        'stratify': False,
+        'hidden': [(256, True, 0.4), (128, True, 0.3), (64, False, 0.2)],
+        'model_path': 'model_datetime_subtype_to_location.keras',
+        'scaler_path': 'scaler_datetime_subtype_to_location.pkl',
+    },
+    # MODEL 3: (location + event_subtype) → datetime (hour prediction)
+    'model3': {
+        'title': 'Predict DATETIME (hour) from location + event_subtype',
+        'summary': 'location+event_subtype → datetime',
+        'features': ['NEIGHBOURHOOD_CLEAN_encoded', 'LAT_R', 'LON_R', 'lat_zone', 'lon_zone',
+                     'EVENT_SUBTYPE_encoded'],
+        # Target: hour of day (0-23) - classification problem
+        'target': 'hour',
+        'stratify': False,
+        'hidden': [(128, True, 0.3), (64, False, 0.2), (32, False, 0.0)],
+        'model_path': 'model_location_subtype_to_datetime.keras',
+        'scaler_path': 'scaler_location_subtype_to_datetime.pkl',
+    },
+}
+
+
+def num_classes_for(name, num_neighbourhoods):
+    """Output layer width for each model"""
+    if name == 'model1':
+        return len(subtype_labels)
+    if name == 'model2':
+        return num_neighbourhoods
+    return 24  # 24 hours
+
+
+def event_timestamps(df):
+    """Hour-resolution event timestamps rebuilt from the cleaned date columns"""
+    return pd.to_datetime(df[['year', 'month', 'day', 'hour']])
+
+
+def load_data(path=DATA_PATH, sample_size=SAMPLE_SIZE, profiler=None):
+    """
+    Load the cleaned dataset, sampling it down for faster training.
+    Returns (df, num_neighbourhoods, watermark) where watermark is the newest event time.
+    """
+    profiler = profiler or NO_PROFILE
+    print("Loading data...")
+    profiler.begin('load')
+    df = pd.read_csv(path)
+
+    print(f"Dataset shape: {df.shape}")
+    print(f"Unique neighbourhoods: {df['NEIGHBOURHOOD_CLEAN_encoded'].nunique()}")
+    # Neighbourhood ids are append-only, so size the embedding by the largest id
+    num_neighbourhoods = int(df['NEIGHBOURHOOD_CLEAN_encoded'].max()) + 1
+    watermark = event_timestamps(df).max()
+
+    # Sample for faster training during hackathon
+    if len(df) > sample_size:
+        print(f"Sampling {sample_size // 1000}k rows from {len(df)} for faster training...")
+        df = df.sample(n=sample_size, random_state=SEED)
+    profiler.end()
+
+    return df, num_neighbourhoods, watermark
+
+
+def prepare_split(df, name, profiler=None):
+    """Select features/target for a model, split 80/20 and scale"""
+    profiler = profiler or NO_PROFILE
+    spec = MODEL_SPECS[name]
+
+    with profiler.phase('split', model=name):
+        X = FeatureBuilder(spec['features']).build(df)
+        y = df[spec['target']].values
+
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=SEED, stratify=y if spec['stratify'] else None
+        )
+
+    with profiler.phase('scale', model=name):
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+    print(f"Train: {X_train_scaled.shape}, Test: {X_test_scaled.shape}")
+
+    return {
+        'X_train': X_train_scaled, 'X_test': X_test_scaled,
+        'y_train': y_train, 'y_test': y_test,
+        'scaler': scaler,
+    }
+
+
+def build_model(name, input_dim, num_classes, hidden=None, learning_rate=0.001):
+    """Build and compile the classifier for a model spec (hidden overrides the spec's layers)"""
+    stack = [layers.Input(shape=(input_dim,))]
+    for units, batch_norm, dropout in hidden or MODEL_SPECS[name]['hidden']:
+        stack.append(layers.Dense(units, activation='relu'))
+        if batch_norm:
+            stack.append(layers.BatchNormalization())
+        if dropout:
+            stack.append(layers.Dropout(dropout))
+    stack.append(layers.Dense(num_classes, activation='softmax'))
+
+    model = models.Sequential(stack)
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
 
 # ============================================
-# MODEL 2: (datetime + event_subtype) → location (neighbourhood)
+# CHECKPOINT / RESUME
 # ============================================
-print("\n" + "="*60)
-print("MODEL 2: Predict LOCATION (neighbourhood) from datetime + event_subtype")
-print("="*60)
-
-# Features: datetime + event subtype
-X2 = df[['year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night', 
-         'quarter', 'season_encoded', 'EVENT_SUBTYPE_encoded']].values
-
-# Target: neighbourhood
-y2 = df['NEIGHBOURHOOD_CLEAN_encoded'].values
-
-X2_train, X2_test, y2_train, y2_test = train_test_split(
-    X2, y2, test_size=0.2, random_state=42
-)
-
-scaler2 = StandardScaler()
-X2_train_scaled = scaler2.fit_transform(X2_train)
-X2_test_scaled = scaler2.transform(X2_test)
-
-print(f"Train: {X2_train_scaled.shape}, Test: {X2_test_scaled.shape}")
-
-# Build model
-model2 = models.Sequential([
-    layers.Input(shape=(X2_train_scaled.shape[1],)),
-    layers.Dense(256, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.4),
-    layers.Dense(128, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.3),
-    layers.Dense(64, activation='relu'),
-    layers.Dropout(0.2),
-    layers.Dense(num_neighbourhoods, activation='softmax')
-])
-
-model2.compile(
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
-    loss='sparse_categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-print("Training Model 2...")
-history2 = model2.fit(
-    X2_train_scaled, y2_train,
-    validation_split=0.2,
-    epochs=30,
-    batch_size=512,
-    callbacks=[
-        keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
-        keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3)
-    ],
-    verbose=1
-)
-
-results2 = model2.evaluate(X2_test_scaled, y2_test, verbose=0)
-print(f"Model 2 Test Accuracy: {results2[1]:.4f}")
-
-# Calculate representative lat/lon for each neighbourhood
-print("Calculating neighbourhood coordinates...")
-neighbourhood_coords = df.groupby('NEIGHBOURHOOD_CLEAN_encoded').agg({
-    'LAT_R': 'mean',
-    'LON_R': 'mean'
-}).to_dict('index')
-print(f"✓ Calculated coordinates for {len(neighbourhood_coords)} neighbourhoods")
+
+class EpochBatches(keras.utils.PyDataset):
+    """Training batches reshuffled with a per-epoch seed, so a resumed run sees the same order"""
+
+    def __init__(self, X, y, batch_size, initial_epoch=0):
+        super().__init__()
+        self.X, self.y = X, y
+        self.batch_size = batch_size
+        self.epoch = initial_epoch
+        self._shuffle()
+
+    def _shuffle(self):
+        self.order = np.random.default_rng(SEED + self.epoch).permutation(len(self.X))
+
+    def __len__(self):
+        return int(np.ceil(len(self.X) / self.batch_size))
+
+    def __getitem__(self, idx):
+        rows = self.order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        return self.X[rows], self.y[rows]
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self._shuffle()
+
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+    """
+    Per-epoch checkpoint of the model (weights + optimizer state) and of the
+    EarlyStopping / ReduceLROnPlateau counters. Must be listed after those two
+    callbacks so its on_train_begin restores their state after they reset.
+    """
+
+    def __init__(self, checkpoint_dir, early_stopping, reduce_lr, state=None):
+        super().__init__()
+        self.checkpoint_dir = checkpoint_dir
+        self.early_stopping = early_stopping
+        self.reduce_lr = reduce_lr
+        self.state = state or {'epoch': -1, 'history': {}}
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def on_train_begin(self, logs=None):
+        es_state = self.state.get('early_stopping')
+        if es_state:
+            self.early_stopping.wait = es_state['wait']
+            self.early_stopping.best = es_state['best']
+            self.early_stopping.best_epoch = es_state['best_epoch']
+            if self.state.get('best_weights'):
+                with np.load(os.path.join(self.checkpoint_dir, self.state['best_weights'])) as best:
+                    self.early_stopping.best_weights = [best[f'w{i}'] for i in range(len(best.files))]
+        rlr_state = self.state.get('reduce_lr')
+        if rlr_state:
+            self.reduce_lr.wait = rlr_state['wait']
+            self.reduce_lr.best = rlr_state['best']
+            self.reduce_lr.cooldown_counter = rlr_state['cooldown_counter']
+
+    def on_epoch_begin(self, epoch, logs=None):
+        # Dropout seed generators are not restored by load_model, so derive them from the epoch
+        keras.utils.set_random_seed(SEED + epoch)
+        for i, layer in enumerate(self.model.layers):
+            seed_generator = getattr(layer, 'seed_generator', None)
+            if seed_generator is not None:
+                seed_generator.state.assign(
+                    np.array([SEED + 1000 * epoch + i, 0], dtype=seed_generator.state.dtype))
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.state['history'].setdefault(key, []).append(float(value))
+
+        # Files are tagged with the epoch and state.json is replaced last, so a crash at any
+        # point leaves state.json pointing at a complete, consistent checkpoint
+        previous = {self.state.get('model'), self.state.get('best_weights')}
+        model_file = f'epoch_{epoch:03d}.keras'
+        self.model.save(os.path.join(self.checkpoint_dir, model_file))
+
+        es = self.early_stopping
+        best_file = None
+        if es.best_weights is not None:
+            best_file = f'best_weights_{epoch:03d}.npz'
+            np.savez(os.path.join(self.checkpoint_dir, best_file),
+                     **{f'w{i}': w for i, w in enumerate(es.best_weights)})
+
+        self.state.update({
+            'epoch': epoch,
+            'model': model_file,
+            'best_weights': best_file,
+            'stopped': bool(self.model.stop_training),
+            'early_stopping': {
+                'wait': es.wait,
+                'best': None if es.best is None else float(es.best),
+                'best_epoch': es.best_epoch,
+            },
+            'reduce_lr': {
+                'wait': self.reduce_lr.wait,
+                'best': None if self.reduce_lr.best is None else float(self.reduce_lr.best),
+                'cooldown_counter': self.reduce_lr.cooldown_counter,
+            },
+        })
+        state_path = os.path.join(self.checkpoint_dir, 'state.json')
+        with open(state_path + '.tmp', 'w') as f:
+            json.dump(self.state, f)
+        os.replace(state_path + '.tmp', state_path)
+
+        for stale in previous - {model_file, best_file, None}:
+            os.remove(os.path.join(self.checkpoint_dir, stale))
+
+
+def read_checkpoint(checkpoint_dir):
+    """Saved epoch state for a model, or None when it has no checkpoint yet"""
+    if not checkpoint_dir:
+        return None
+    state_path = os.path.join(checkpoint_dir, 'state.json')
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def completion_marker(checkpoint_root, name):
+    return os.path.join(checkpoint_root, name, 'done.json')
+
+
+def mark_complete(checkpoint_root, name, run):
+    """Record a finished model so --resume can skip it"""
+    os.makedirs(os.path.join(checkpoint_root, name), exist_ok=True)
+    with open(completion_marker(checkpoint_root, name), 'w') as f:
+        json.dump({k: v for k, v in run.items() if k != 'log'}, f)
+
+
+def fit_model(name, split, num_classes, epochs=30, batch_size=512, verbose=1, checkpoint_dir=None,
+              profiler=None):
+    """
+    Train one model and evaluate it on the held-out split (skipped when the split has no
+    X_test, e.g. in backtest.py, which scores windows itself; test metrics are then None).
+    With checkpoint_dir, every epoch is checkpointed and an existing checkpoint is resumed.
+    """
+    profiler = profiler or NO_PROFILE
+    state = read_checkpoint(checkpoint_dir)
+    if state:
+        model = keras.models.load_model(os.path.join(checkpoint_dir, state['model']))
+        # A run that early-stopped before being marked complete only needs its best weights back
+        initial_epoch = epochs if state.get('stopped') else state['epoch'] + 1
+        print(f"Resuming {name.replace('model', 'Model ')} from epoch {initial_epoch}...")
+    else:
+        # Same initial weights whichever process, or position in a serial run, trains the model
+        keras.utils.set_random_seed(SEED)
+        model = build_model(name, split['X_train'].shape[1], num_classes)
+        initial_epoch = 0
+        print(f"Training {name.replace('model', 'Model ')}...")
+
+    # Same split as validation_split=0.2: the last 20% of the training rows
+    split_at = int(np.ceil(len(split['X_train']) * 0.8))
+    X_val, y_val = split['X_train'][split_at:], split['y_train'][split_at:]
+    batches = EpochBatches(split['X_train'][:split_at], split['y_train'][:split_at],
+                           batch_size, initial_epoch)
+
+    early_stopping = keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    reduce_lr = keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3)
+    callbacks = [early_stopping, reduce_lr]
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = TrainingCheckpoint(checkpoint_dir, early_stopping, reduce_lr, state)
+        callbacks.append(checkpoint)
+
+    start = time.perf_counter()
+    with profiler.phase('fit', model=name):
+        history = model.fit(
+            batches,
+            validation_data=(X_val, y_val),
+            initial_epoch=initial_epoch,
+            epochs=epochs,
+            callbacks=callbacks + profiler.epoch_callbacks(name, split_at),
+            verbose=verbose
+        )
+    wall_time = time.perf_counter() - start
+
+    results = [None, None]
+    if split.get('X_test') is not None:
+        with profiler.phase('evaluate', model=name):
+            results = [float(v) for v in model.evaluate(split['X_test'], split['y_test'], verbose=0)]
+        print(f"{name.replace('model', 'Model ')} Test Accuracy: {results[1]:.4f}")
+
+    full_history = checkpoint.state['history'] if checkpoint else {
+        k: [float(v) for v in vals] for k, vals in history.history.items()
+    }
+    run = {
+        'history': full_history,
+        'epochs_run': len(full_history.get('loss', [])),
+        'resumed_from_epoch': initial_epoch or None,
+        'test_loss': results[0],
+        'test_accuracy': results[1],
+        'wall_time_s': round(wall_time, 2),
+    }
+    return model, run
+
 
 # ============================================
-# MODEL 3: (location + event_subtype) → datetime (hour prediction)
+# PARALLEL TRAINING
 # ============================================
-print("\n" + "="*60)
-print("MODEL 3: Predict DATETIME (hour) from location + event_subtype")
-print("="*60)
-
-# Features: location + event subtype
-X3 = df[['NEIGHBOURHOOD_CLEAN_encoded', 'LAT_R', 'LON_R', 'lat_zone', 'lon_zone',
-         'EVENT_SUBTYPE_encoded']].values
-
-# Target: hour of day (0-23) - classification problem
-y3 = df['hour'].values
-
-X3_train, X3_test, y3_train, y3_test = train_test_split(
-    X3, y3, test_size=0.2, random_state=42
-)
-
-scaler3 = StandardScaler()
-X3_train_scaled = scaler3.fit_transform(X3_train)
-X3_test_scaled = scaler3.transform(X3_test)
-
-print(f"Train: {X3_train_scaled.shape}, Test: {X3_test_scaled.shape}")
-
-# Build model (predicting hour as classification: 0-23)
-model3 = models.Sequential([
-    layers.Input(shape=(X3_train_scaled.shape[1],)),
-    layers.Dense(128, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.3),
-    layers.Dense(64, activation='relu'),
-    layers.Dropout(0.2),
-    layers.Dense(32, activation='relu'),
-    layers.Dense(24, activation='softmax')  # 24 hours
-])
-
-model3.compile(
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
-    loss='sparse_categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-print("Training Model 3...")
-history3 = model3.fit(
-    X3_train_scaled, y3_train,
-    validation_split=0.2,
-    epochs=30,
-    batch_size=512,
-    callbacks=[
-        keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
-        keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3)
-    ],
-    verbose=1
-)
-
-results3 = model3.evaluate(X3_test_scaled, y3_test, verbose=0)
-print(f"Model 3 Test Accuracy: {results3[1]:.4f}")
+
+SPLIT_KEYS = ('X_train', 'X_test', 'y_train', 'y_test')
+
+
+def dump_splits(splits, data_dir):
+    """Write prepared splits as .npy files so worker processes can memory-map them"""
+    for name, split in splits.items():
+        for key in SPLIT_KEYS:
+            np.save(os.path.join(data_dir, f'{name}_{key}.npy'), split[key])
+
+
+def load_split(name, data_dir):
+    """Memory-map a split written by dump_splits"""
+    return {
+        key: np.load(os.path.join(data_dir, f'{name}_{key}.npy'), mmap_mode='r')
+        for key in SPLIT_KEYS
+    }
+
+
+def configure_worker(threads, deterministic=False):
+    """Give a worker process its own TensorFlow thread budget and seeds"""
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 2))
+    # Seeds python, NumPy, TensorFlow and Keras' own initializer/dropout generators
+    keras.utils.set_random_seed(SEED)
+    # Spawned workers start with TensorFlow's defaults, so --deterministic is applied here too
+    if deterministic:
+        tf.config.experimental.enable_op_determinism()
+
+
+def _train_worker(name, data_dir, num_classes, threads, epochs, batch_size, checkpoint_root,
+                  profile=False, trace_dir=None, deterministic=False):
+    """
+    Train a single model in its own process.
+    Reads the prepared split from memory-mapped .npy files and saves the model itself.
+    """
+    configure_worker(threads, deterministic)
+    split = load_split(name, data_dir)
+    profiler = Profiler(f'train_inverse_models-{name}', enabled=profile, trace_dir=trace_dir)
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        model, run = fit_model(name, split, num_classes, epochs, batch_size, verbose=2,
+                               checkpoint_dir=os.path.join(checkpoint_root, name), profiler=profiler)
+        with profiler.phase('save', model=name):
+            model.save(MODEL_SPECS[name]['model_path'])
+
+    run['profile'] = profiler.as_dict() if profile else None
+    run['threads'] = threads
+    run['pid'] = os.getpid()
+    run['log'] = log.getvalue()
+    mark_complete(checkpoint_root, name, run)
+    return name, run
+
+
+def train_parallel(splits, num_neighbourhoods, checkpoint_root, threads_per_worker=None,
+                   epochs=30, batch_size=512, profiler=None, deterministic=False):
+    """Train all models concurrently, one spawned worker process per model"""
+    names = list(splits)
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // len(names))
+
+    print(f"\nTraining {len(names)} models in parallel ({threads_per_worker} threads per worker)...")
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Hand the prepared arrays to the workers through the filesystem, not pickling
+        dump_splits(splits, data_dir)
+
+        # spawn: TensorFlow's runtime is not fork-safe
+        ctx = mp.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(names), mp_context=ctx) as pool:
+            futures = [
+                pool.submit(_train_worker, name, data_dir,
+                            num_classes_for(name, num_neighbourhoods),
+                            threads_per_worker, epochs, batch_size, checkpoint_root,
+                            profiler is not None and profiler.enabled,
+                            profiler.trace_dir if profiler else None, deterministic)
+                for name in names
+            ]
+            for future in futures:
+                name, run = future.result()
+                if profiler:
+                    profiler.merge(run.pop('profile'), pid=run['pid'])
+                runs[name] = run
+                print(f"✓ {name} finished in {run['wall_time_s']:.1f}s "
+                      f"(test accuracy {run['test_accuracy']:.4f})")
+
+    return runs
+
 
 # ============================================
 # SAVE EVERYTHING
 # ============================================
-print("\nSaving models and scalers...")
-
-model1.save('model_datetime_location_to_subtype.keras')
-model2.save('model_datetime_subtype_to_location.keras')
-model3.save('model_location_subtype_to_datetime.keras')
-
-with open('scaler_datetime_location_to_subtype.pkl', 'wb') as f:
-    pickle.dump(scaler1, f)
-with open('scaler_datetime_subtype_to_location.pkl', 'wb') as f:
-    pickle.dump(scaler2, f)
-with open('scaler_location_subtype_to_datetime.pkl', 'wb') as f:
-    pickle.dump(scaler3, f)
-
-# Save metadata
-metadata = {
-    'subtype_labels': subtype_labels,
-    'subtype_to_int': subtype_to_int,
-    'num_neighbourhoods': num_neighbourhoods,
-    'neighbourhood_coords': neighbourhood_coords,
-    'model1_features': ['year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night', 
-                        'quarter', 'season_encoded', 'NEIGHBOURHOOD_CLEAN_encoded', 
-                        'LAT_R', 'LON_R', 'lat_zone', 'lon_zone'],
-    'model2_features': ['year', 'month', 'day', 'hour', 'day_of_week', 'is_weekend', 'is_night', 
-                        'quarter', 'season_encoded', 'EVENT_SUBTYPE_encoded'],
-    'model3_features': ['NEIGHBOURHOOD_CLEAN_encoded', 'LAT_R', 'LON_R', 'lat_zone', 'lon_zone',
-                        'EVENT_SUBTYPE_encoded']
-}
 
-with open('inverse_models_metadata.pkl', 'wb') as f:
-    pickle.dump(metadata, f)
+METADATA_PATH = 'inverse_models_metadata.pkl'
+
+
+def feature_reference(df):
+    """Training-time histograms of every model feature, for ml_api's drift monitor"""
+    columns = list(dict.fromkeys(col for spec in MODEL_SPECS.values() for col in spec['features']))
+    return reference_histograms(FeatureBuilder(columns).build(df), columns)
+
+
+def save_bundle(scalers, runs, num_neighbourhoods, neighbourhood_coords, watermark,
+                trained_models=None, output_dir='.', extra=None, profiler=None):
+    """Save models (when trained in-process), scalers and the metadata bundle"""
+    profiler = profiler or NO_PROFILE
+    print("\nSaving models and scalers...")
+    profiler.begin('save')
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name, model in (trained_models or {}).items():
+        model.save(os.path.join(output_dir, MODEL_SPECS[name]['model_path']))
+
+    for name, scaler in scalers.items():
+        with open(os.path.join(output_dir, MODEL_SPECS[name]['scaler_path']), 'wb') as f:
+            pickle.dump(scaler, f)
+
+    # Save metadata
+    now = datetime.now()
+    metadata = {
+        'subtype_labels': subtype_labels,
+        'subtype_to_int': subtype_to_int,
+        'num_neighbourhoods': num_neighbourhoods,
+        'neighbourhood_coords': neighbourhood_coords,
+        'version': now.strftime('%Y%m%d-%H%M%S'),
+        'trained_at': now.isoformat(timespec='seconds'),
+        'data_watermark': pd.Timestamp(watermark).isoformat(),
+        'training_runs': runs,
+    }
+    for name, spec in MODEL_SPECS.items():
+        metadata[f'{name}_features'] = spec['features']
+    metadata.update(extra or {})
+
+    with open(os.path.join(output_dir, METADATA_PATH), 'wb') as f:
+        pickle.dump(metadata, f)
+    profiler.end()
+
+    print(f"✓ All models saved successfully to '{output_dir}'!")
+    return metadata
+
+
+# ============================================
+# INCREMENTAL (WARM-START) RETRAINING
+# ============================================
 
-print("✓ All models saved successfully!")
-print("\nModel Performance Summary:")
-print(f"  Model 1 (datetime+location → event_subtype): {results1[1]:.2%} accuracy")
-print(f"  Model 2 (datetime+event_subtype → location): {results2[1]:.2%} accuracy")
-print(f"  Model 3 (location+event_subtype → datetime): {results3[1]:.2%} accuracy")
\ No newline at end of file
+def load_bundle(bundle_dir):
+    """Load models, scalers and metadata written by save_bundle"""
+    with open(os.path.join(bundle_dir, METADATA_PATH), 'rb') as f:
+        metadata = pickle.load(f)
+
+    trained_models, scalers = {}, {}
+    for name, spec in MODEL_SPECS.items():
+        trained_models[name] = keras.models.load_model(os.path.join(bundle_dir, spec['model_path']))
+        with open(os.path.join(bundle_dir, spec['scaler_path']), 'rb') as f:
+            scalers[name] = pickle.load(f)
+
+    return trained_models, scalers, metadata
+
+
+def train_incremental(args):
+    """
+    Fine-tune the previous bundle on rows newer than its watermark plus a replay
+    sample of history, and write the result as a new versioned bundle.
+    Scalers are kept frozen: the warm-started weights were learned in their space.
+    """
+    trained_models, scalers, prev_metadata = load_bundle(args.from_bundle)
+    if 'data_watermark' not in prev_metadata:
+        raise SystemExit(f"Bundle in '{args.from_bundle}' has no data_watermark; run a full training first")
+    watermark = pd.Timestamp(prev_metadata['data_watermark'])
+
+    print("Loading data...")
+    df = pd.read_csv(args.data)
+    timestamps = event_timestamps(df)
+    new_rows = df[timestamps > watermark]
+    history = df[timestamps <= watermark]
+    print(f"Watermark: {watermark} → {len(new_rows):,} new rows, {len(history):,} history rows")
+
+    if len(new_rows) < 10:
+        print("Not enough new rows since the watermark; nothing to do.")
+        return
+
+    # Hold out part of the new rows: it is what the refreshed models must get right
+    new_train, new_test = train_test_split(new_rows, test_size=0.2, random_state=SEED)
+    replay_size = min(len(history), int(len(new_train) * args.replay_ratio))
+    replay = history.sample(n=replay_size, random_state=SEED)
+    train_df = pd.concat([new_train, replay])
+    print(f"Incremental training set: {len(new_train):,} new + {len(replay):,} replay rows")
+
+    num_neighbourhoods = prev_metadata['num_neighbourhoods']
+    runs, report = {}, {}
+    for name, spec in MODEL_SPECS.items():
+        print("\n" + "="*60)
+        print(f"{name.replace('model', 'MODEL ')} (incremental): {spec['title']}")
+        print("="*60)
+
+        model = trained_models[name]
+        scaler = scalers[name]
+        num_classes = model.output_shape[-1]
+
+        # Labels the previous output layer cannot represent (e.g. brand new neighbourhoods)
+        train_part = train_df[train_df[spec['target']] < num_classes]
+        test_part = new_test[new_test[spec['target']] < num_classes]
+        dropped = (len(train_df) - len(train_part)) + (len(new_test) - len(test_part))
+        if dropped:
+            print(f"⚠ Skipping {dropped} rows with {spec['target']} outside the model's {num_classes} classes")
+
+        builder = FeatureBuilder(spec['features'])
+        X_train = scaler.transform(builder.build(train_part))
+        y_train = train_part[spec['target']].values
+        X_test = scaler.transform(builder.build(test_part))
+        y_test = test_part[spec['target']].values
+
+        previous_accuracy = model.evaluate(X_test, y_test, verbose=0)[1]
+
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=args.learning_rate),
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        start = time.perf_counter()
+        fit_history = model.fit(
+            X_train, y_train,
+            validation_split=0.2,
+            epochs=args.incremental_epochs,
+            batch_size=args.batch_size,
+            callbacks=[keras.callbacks.EarlyStopping(monitor='val_loss', patience=2,
+                                                     restore_best_weights=True)],
+            verbose=1
+        )
+        wall_time = time.perf_counter() - start
+        results = model.evaluate(X_test, y_test, verbose=0)
+
+        runs[name] = {
+            'mode': 'incremental',
+            'history': {k: [float(v) for v in vals] for k, vals in fit_history.history.items()},
+            'epochs_run': len(fit_history.history['loss']),
+            'test_loss': float(results[0]),
+            'test_accuracy': float(results[1]),
+            'wall_time_s': round(wall_time, 2),
+        }
+        report[name] = {
+            'previous_accuracy': float(previous_accuracy),
+            'incremental_accuracy': float(results[1]),
+            'incremental_wall_time_s': round(wall_time, 2),
+        }
+
+        if args.compare_full:
+            # Full retrain from scratch on the same data the normal run would see
+            full_history = history.sample(n=min(len(history), SAMPLE_SIZE), random_state=SEED)
+            full_train = pd.concat([full_history, new_train])
+            full_train = full_train[full_train[spec['target']] < num_classes]
+            full_scaler = StandardScaler()
+            full_split = {
+                'X_train': full_scaler.fit_transform(builder.build(full_train)),
+                'y_train': full_train[spec['target']].values,
+                'X_test': full_scaler.transform(builder.build(test_part)),
+                'y_test': y_test,
+            }
+            _, full_run = fit_model(name, full_split, num_classes, args.epochs, args.batch_size)
+            report[name].update({
+                'full_retrain_accuracy': full_run['test_accuracy'],
+                'full_retrain_wall_time_s': full_run['wall_time_s'],
+                'accuracy_delta_vs_full': float(results[1]) - full_run['test_accuracy'],
+            })
+
+    new_watermark = event_timestamps(new_rows).max()
+    output_dir = args.output_dir or os.path.join('bundles', datetime.now().strftime('%Y%m%d-%H%M%S'))
+    save_bundle(scalers, runs, num_neighbourhoods, prev_metadata['neighbourhood_coords'],
+                new_watermark, trained_models, output_dir,
+                extra={
+                    'parent_version': prev_metadata.get('version'),
+                    'geo_grid': prev_metadata.get('geo_grid'),
+                    'incremental_report': report,
+                    # Drift is judged against all the data the bundle has now seen, not the
+                    # replay-skewed fine-tuning sample
+                    'feature_reference': feature_reference(df),
+                })
+
+    print("\nIncremental Refresh Summary (accuracy on held-out new rows):")
+    for name, row in report.items():
+        line = (f"  {name.replace('model', 'Model ')}: previous {row['previous_accuracy']:.2%} → "
+                f"incremental {row['incremental_accuracy']:.2%} ({row['incremental_wall_time_s']:.1f}s)")
+        if 'full_retrain_accuracy' in row:
+            line += (f" | full retrain {row['full_retrain_accuracy']:.2%} "
+                     f"({row['full_retrain_wall_time_s']:.1f}s), "
+                     f"delta {row['accuracy_delta_vs_full']:+.2%}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the three inverse prediction models')
+    parser.add_argument('--data', default=DATA_PATH, help='Path to the cleaned dataset CSV')
+    parser.add_argument('--clean-scaler', default=None,
+                        help="clean.py's scaler.pkl, for the zone grid (default: next to --data)")
+    parser.add_argument('--parallel', action='store_true',
+                        help='Train the three models concurrently in separate worker processes')
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help='TensorFlow thread budget per worker (default: cpu_count / 3)')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--checkpoint-dir', default='checkpoints',
+                        help='Where per-epoch checkpoints and completion markers are kept '
+                             '(removed once the bundle is saved)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip finished models and continue the others from their last checkpoint')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='Also enable TensorFlow op determinism (slower; for bit-exact runs on many-core hosts)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record wall time / peak RSS per phase and samples/sec per epoch')
+    parser.add_argument('--profile-trace', default=None, metavar='DIR',
+                        help='Also capture a TensorFlow profiler trace of the fit phases into DIR')
+    parser.add_argument('--profile-output', default='profile_report.json')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Warm-start from a previous bundle using only rows newer than its watermark')
+    parser.add_argument('--from-bundle', default='.',
+                        help='Bundle directory to warm-start from (incremental mode)')
+    parser.add_argument('--output-dir', default=None,
+                        help='Where to write the incremental bundle (default: bundles/<version>)')
+    parser.add_argument('--replay-ratio', type=float, default=1.0,
+                        help='History rows replayed per new row (incremental mode)')
+    parser.add_argument('--incremental-epochs', type=int, default=5)
+    parser.add_argument('--learning-rate', type=float, default=1e-4,
+                        help='Fine-tuning learning rate (incremental mode)')
+    parser.add_argument('--compare-full', action='store_true',
+                        help='Also run a full retrain and report the accuracy difference')
+    args = parser.parse_args()
+
+    # Seeds python, NumPy, TensorFlow and Keras' own initializer/dropout generators
+    keras.utils.set_random_seed(SEED)
+    if args.deterministic:
+        tf.config.experimental.enable_op_determinism()
+
+    if args.incremental:
+        train_incremental(args)
+        return
+
+    profiler = Profiler('train_inverse_models', enabled=args.profile or bool(args.profile_trace),
+                        trace_dir=args.profile_trace)
+
+    df, num_neighbourhoods, watermark = load_data(args.data, profiler=profiler)
+
+    splits = {}
+    for name, spec in MODEL_SPECS.items():
+        print("\n" + "="*60)
+        print(f"{name.replace('model', 'MODEL ')}: {spec['title']}")
+        print("="*60)
+        splits[name] = prepare_split(df, name, profiler)
+
+    # Calculate representative lat/lon (and grid zone) for each neighbourhood; the
+    # FeatureBuilder in ml_api.py fills these in when a request only names a neighbourhood
+    print("Calculating neighbourhood coordinates...")
+    with profiler.phase('feature_engineering'):
+        neighbourhood_coords = df.groupby('NEIGHBOURHOOD_CLEAN_encoded').agg({
+            'LAT_R': 'mean',
+            'LON_R': 'mean',
+            'lat_zone': 'median',
+            'lon_zone': 'median',
+        }).to_dict('index')
+    print(f"✓ Calculated coordinates for {len(neighbourhood_coords)} neighbourhoods")
+
+    # Checkpoints are only removed once the bundle is saved, so they are left over from a
+    # run that did not finish; starting over would silently throw them away
+    if not args.resume and os.path.isdir(args.checkpoint_dir) and os.listdir(args.checkpoint_dir):
+        raise SystemExit(f"'{args.checkpoint_dir}' holds checkpoints of an unfinished run: pass --resume "
+                         "to continue it, or remove the directory to start over")
+
+    # Finished models were saved when they completed; only train the rest
+    runs = {}
+    for name in MODEL_SPECS:
+        marker = completion_marker(args.checkpoint_dir, name)
+        if args.resume and os.path.exists(marker):
+            with open(marker) as f:
+                runs[name] = json.load(f)
+            print(f"✓ {name} already finished (test accuracy {runs[name]['test_accuracy']:.4f}), skipping")
+    pending = {name: split for name, split in splits.items() if name not in runs}
+
+    if args.parallel and pending:
+        # Worker fit/evaluate/save phases are merged into the report with their pid
+        with profiler.phase('train_parallel'):
+            runs.update(train_parallel(pending, num_neighbourhoods, args.checkpoint_dir,
+                                       args.threads_per_worker, args.epochs, args.batch_size, profiler,
+                                       args.deterministic))
+    else:
+        for name, split in pending.items():
+            model, runs[name] = fit_model(name, split, num_classes_for(name, num_neighbourhoods),
+                                          args.epochs, args.batch_size,
+                                          checkpoint_dir=os.path.join(args.checkpoint_dir, name),
+                                          profiler=profiler)
+            # Save as soon as a model finishes so a later crash can't lose it
+            with profiler.phase('save', model=name):
+                model.save(MODEL_SPECS[name]['model_path'])
+            mark_complete(args.checkpoint_dir, name, runs[name])
+
+    # The zone grid plus the cleaning run's coordinate scale, so the API can compute
+    # lat_zone / lon_zone from request coordinates
+    clean_scaler = args.clean_scaler or os.path.join(os.path.dirname(args.data), 'scaler.pkl')
+    geo_grid = GeoGrid.load(clean_scaler)
+    if geo_grid is None:
+        print(f"⚠ No cleaning scaler at {clean_scaler}; the bundle will not record the zone grid")
+
+    scalers = {name: split['scaler'] for name, split in splits.items()}
+    save_bundle(scalers, runs, num_neighbourhoods, neighbourhood_coords, watermark, profiler=profiler,
+                extra={'feature_reference': feature_reference(df),
+                       'geo_grid': geo_grid.to_dict() if geo_grid else None})
+    # Every model is in the bundle now, so the checkpoints are no longer needed
+    shutil.rmtree(args.checkpoint_dir, ignore_errors=True)
+
+    print("\nModel Performance Summary:")
+    for name, spec in MODEL_SPECS.items():
+        print(f"  {name.replace('model', 'Model ')} ({spec['summary']}): "
+              f"{runs[name]['test_accuracy']:.2%} accuracy")
+
+    profiler.write_report(args.profile_output, mode='parallel' if args.parallel else 'sequential',
+                          rows=len(df), epochs=args.epochs, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,33 +3,97 @@ import { NextRequest, NextResponse } from "next/server";
 // The actual ML API endpoint on the private network
 const ML_API_URL = "http://akashs-macbook-air:5006/predict";
 
+// W3C trace context: continue the browser's trace or start one here. The proxy hop
+// is a span of its own: the ML API gets a traceparent naming this span as parent,
+// so its spans (trace file + Server-Timing) hang off this hop, not off the caller
+const TRACEPARENT = /^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$/;
+
+function randomHex(length: number) {
+  return crypto.randomUUID().replace(/-/g, "").slice(0, length);
+}
+
+function proxySpan(request: NextRequest) {
+  const match = TRACEPARENT.exec(request.headers.get("traceparent")?.trim().toLowerCase() ?? "");
+  // All-zero trace and parent ids are invalid and start a new trace
+  const parent = match && !/^0+$/.test(match[1]) && !/^0+$/.test(match[2]) ? match : null;
+  const traceId = parent ? parent[1] : randomHex(32);
+  const spanId = randomHex(16);
+  return {
+    traceId,
+    spanId,
+    parentSpanId: parent ? parent[2] : null,
+    traceparent: `00-${traceId}-${spanId}-${parent ? parent[3] : "01"}`,
+  };
+}
+
+// One JSON line per proxy hop, so the hop can be joined with the ML API's trace file
+function recordSpan(span: ReturnType<typeof proxySpan>, startedAt: number, duration: number, status: number) {
+  console.info(
+    JSON.stringify({
+      span: "POST /api/predict",
+      trace_id: span.traceId,
+      span_id: span.spanId,
+      parent_span_id: span.parentSpanId,
+      start: new Date(startedAt).toISOString(),
+      dur_ms: Number(duration.toFixed(2)),
+      status,
+    })
+  );
+}
+
 export async function POST(request: NextRequest) {
+  const start = performance.now();
+  const startedAt = Date.now();
+  const span = proxySpan(request);
+  const { traceparent } = span;
   try {
     // Get the JSON body from the incoming request
     const body = await request.json();
 
     // Forward the request to the actual ML API
+    const upstreamStart = performance.now();
     const response = await fetch(ML_API_URL, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        traceparent,
       },
       body: JSON.stringify(body),
     });
 
     // Get the response data
     const data = await response.json();
+    const upstream = performance.now() - upstreamStart;
+
+    // Pass the ML API's stage timings through and add this hop's own
+    const proxy = performance.now() - start;
+    recordSpan(span, startedAt, proxy, response.status);
+    const serverTiming = [
+      response.headers.get("server-timing"),
+      `upstream;dur=${upstream.toFixed(2)}`,
+      `proxy;dur=${proxy.toFixed(2)}`,
+    ]
+      .filter(Boolean)
+      .join(", ");
 
     // Return the response with appropriate status code
-    return NextResponse.json(data, { status: response.status });
+    return NextResponse.json(data, {
+      status: response.status,
+      headers: {
+        "Server-Timing": serverTiming,
+        traceparent: response.headers.get("traceparent") ?? traceparent,
+        "X-Trace-Id": span.traceId,
+      },
+    });
   } catch (error) {
-    console.error("Proxy error:", error);
+    recordSpan(span, startedAt, performance.now() - start, 500);
+    console.error("Proxy error:", error, "trace", traceparent);
     return NextResponse.json(
       {
         success: false,
         error: error instanceof Error ? error.message : "Proxy request failed",
       },
-      { status: 500 }
+      { status: 500, headers: { "X-Trace-Id": span.traceId } }
     );
   }
 }